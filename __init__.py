@@ -35,16 +35,27 @@ bl_info = {
 }
 
 import bpy
+import sys
+import time
 
-try:
-    from . import mixamoroot
-except SystemError:
-    import mixamoroot
+# The processing modules and numpy are only imported when an operator first runs, so
+# enabling the addon registers the properties, operators and panel and nothing else
+_mixamoroot = None
 
-if "bpy" in locals():
-    from importlib import reload
-    if "mixamoroot" in locals():
-        reload(mixamoroot)
+def load_mixamoroot():
+    global _mixamoroot
+    if _mixamoroot is None:
+        # Already imported by the previous load of the addon when it is reloaded
+        reloading = __name__ + ".mixamoroot" in sys.modules
+        try:
+            from . import mixamoroot
+        except SystemError:
+            import mixamoroot
+        if reloading:
+            from importlib import reload
+            mixamoroot = reload(mixamoroot)
+        _mixamoroot = mixamoroot
+    return _mixamoroot
 
 class MixamoPropertyGroup(bpy.types.PropertyGroup):
     '''Property container for options and paths of Mixamo Root'''
@@ -84,6 +95,132 @@ class MixamoPropertyGroup(bpy.types.PropertyGroup):
         name="Delete Armatures",
         description="Deletes all but one imported armature in the blend file. This assumes you've imported mixamo armatures for animations all applied to the same model",
         default=False)
+    anim_only: bpy.props.BoolProperty(
+        name="Animation Only",
+        description="With Delete Armatures, keeps the first imported armature and only reads the skeleton animation of every later file onto it, skipping mesh and material import",
+        default=False)
+    stream: bpy.props.BoolProperty(
+        name="Free Memory",
+        description="With Delete Armatures, frees the meshes, materials and images of every deleted armature right after its action is extracted and reports memory use per file, so large batches run in constant memory",
+        default=False)
+    reduce_keys: bpy.props.BoolProperty(
+        name="Reduce Keys",
+        description="Removes the keys that linear interpolation between the remaining keys rebuilds within the tolerances, the kept keys are set to linear",
+        default=False)
+    location_tolerance: bpy.props.FloatProperty(
+        name="Location Tolerance",
+        description="With Reduce Keys, largest location and scale error allowed",
+        default=0.001,
+        min=0.0,
+        precision=4)
+    rotation_tolerance: bpy.props.FloatProperty(
+        name="Rotation Tolerance",
+        description="With Reduce Keys, largest rotation error allowed, in quaternion components (about half the angle in radians)",
+        default=0.001,
+        min=0.0,
+        precision=4)
+    zero_start: bpy.props.BoolProperty(
+        name="Zero Start Frames",
+        description="Moves every imported action so its first key is on frame 0",
+        default=False)
+    resample: bpy.props.BoolProperty(
+        name="Resample",
+        description="Rekeys every imported action on whole frames of the Target FPS, rotations with quaternion slerp and without sign flips, and sets the scene to that rate once the import finishes",
+        default=False)
+    resample_fps: bpy.props.FloatProperty(
+        name="Target FPS",
+        description="With Resample, frame rate the actions are keyed at",
+        default=30.0,
+        min=1.0,
+        max=1000.0)
+    write_report: bpy.props.BoolProperty(
+        name="Write Report",
+        description="Writes the time, memory and key count of every file and stage as a JSON and CSV report next to the Source Directory (next to the blend file when applying animations)",
+        default=False)
+    bulk_mode: bpy.props.BoolProperty(
+        name="Bulk Mode",
+        description="Hides the objects a batch imports once it is done with them (finished clips, meshes of the imported armatures while applying) until it ends, so they are not evaluated again for every file",
+        default=False)
+    workers: bpy.props.IntProperty(
+        name="Workers",
+        description="Number of background blender processes to split the import across. 1 imports every file in this process",
+        default=1,
+        min=1,
+        max=64)
+    incremental: bpy.props.BoolProperty(
+        name="Incremental",
+        description="Only imports files that are new or changed since the last import into this file, changed files replace their previous action",
+        default=False)
+    prune_missing: bpy.props.BoolProperty(
+        name="Remove Missing",
+        description="With Incremental, removes the actions of previously imported files that no longer exist in the Source Directory",
+        default=False)
+    recursive: bpy.props.BoolProperty(
+        name="Include Subfolders",
+        description="Also imports the fbx files in the subfolders of the Source Directory",
+        default=False)
+    prescan: bpy.props.BoolProperty(
+        name="Pre-scan",
+        description="Parses every file on several threads before importing and skips the files without the hip bone, with another name prefix or without animation",
+        default=False)
+    import_order: bpy.props.EnumProperty(
+        name="Order",
+        description="With Pre-scan, order the files are imported in",
+        items=[
+            ('name', "Name", "Imports the files by name"),
+            ('size', "Largest First", "Imports the largest files first, also balances the files across workers by size"),
+            ('frames', "Longest First", "Imports the longest animations first")],
+        default='name')
+    dedup_mode: bpy.props.EnumProperty(
+        name="Duplicates",
+        description="Fingerprints the animation of every file before importing and does not import copies of an earlier file",
+        items=[
+            ('OFF', "Keep Duplicates", "Imports every file"),
+            ('SKIP', "Skip Duplicates", "Does not import copies of an earlier file"),
+            ('LINK', "Link Duplicates", "Does not import copies of an earlier file, lists their names in the mixamo_duplicates property of its action and exports it again under each of them")],
+        default='OFF')
+    dedup_near: bpy.props.BoolProperty(
+        name="Near Duplicates",
+        description="Also treats animations that match after rounding to a few hundredths as copies",
+        default=False)
+    use_cache: bpy.props.BoolProperty(
+        name="Use Cache",
+        description="Rebuilds unchanged files from a cache of processed clips instead of importing them again. The first file is always imported so there is an armature, cached actions are not assigned to an armature",
+        default=False)
+    cache_directory: bpy.props.StringProperty(
+        name="Cache Directory",
+        description="Path to directory for the processed clip cache, defaults to ~/.cache/mixamoroot",
+        maxlen = 256,
+        default = "",
+        subtype='DIR_PATH')
+    cache_size: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="Size limit of the processed clip cache, least recently used clips are removed past it",
+        default=1024,
+        min=1)
+    root_motion_file: bpy.props.StringProperty(
+        name="Root Motion File",
+        description="Path of the root motion sidecar file, with the root bone translation and yaw of every action for the game runtime",
+        maxlen = 1024,
+        default = "",
+        subtype='FILE_PATH')
+    gltf_path: bpy.props.StringProperty(
+        name="glTF Path",
+        description="Path of the glTF file with every action, or the directory for one file per action",
+        maxlen = 1024,
+        default = "",
+        subtype='FILE_PATH')
+    gltf_per_action: bpy.props.BoolProperty(
+        name="One File Per Action",
+        description="Writes one glTF file per action into the glTF Path directory, split across the Workers as background processes",
+        default=False)
+    gltf_format: bpy.props.EnumProperty(
+        name="Format",
+        description="glTF file format",
+        items=[
+            ('GLB', "glTF Binary (.glb)", "Everything in one binary file"),
+            ('GLTF_SEPARATE', "glTF Separate (.gltf + .bin)", "JSON with separate binary buffers")],
+        default='GLB')
     delete_applied_armatures: bpy.props.BoolProperty(
         name="Delete Armatures",
         description="Deletes all armatures for applied animations after the process is complete",
@@ -92,14 +229,43 @@ class MixamoPropertyGroup(bpy.types.PropertyGroup):
         name="Push To NLA",
         description="Pushes all the actions created for the control rig to the NLA",
         default=False)
+    native_retarget: bpy.props.BoolProperty(
+        name="Native Retarget",
+        description="Applies the animations with the built in retarget engine instead of the mixamo addon, bones are matched by name without prefixes",
+        default=False)
+
+class MixamoProgressGroup(bpy.types.PropertyGroup):
+    '''Progress of a running import, kept on the window manager so it is never saved with the file'''
+    running: bpy.props.BoolProperty(default=False)
+    cancel: bpy.props.BoolProperty(default=False)
+    progress: bpy.props.FloatProperty(
+        name="Progress",
+        subtype='PERCENTAGE',
+        min=0.0,
+        max=100.0,
+        default=0.0)
+    status: bpy.props.StringProperty(default="")
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    return "%dm %02ds" % (minutes, seconds) if minutes else "%ds" % seconds
 
 class OBJECT_OT_ImportAnimations(bpy.types.Operator):
     '''Operator for importing animations and inserting root bones'''
     bl_idname = "mixamo.importanim"
     bl_label = "Import Animations"
-    bl_description = "Imports all mixamo animations from the [Source Directory], insert root bones, and merges into a single armature"
+    bl_description = "Imports all mixamo animations from the [Source Directory], insert root bones, and merges into a single armature. Runs one file at a time, Esc or Cancel stops after the current file and keeps the finished clips"
+    # One undo step for the whole batch, the operators it calls push none of their own
+    bl_options = {'UNDO'}
 
-    def execute(self, context):
+    resume: bpy.props.BoolProperty(
+        name="Resume",
+        description="Only imports the files left over from the last cancelled or failed import",
+        default=False,
+        options={'SKIP_SAVE'})
+
+    def import_options(self, context):
+        # Arguments for mixamoroot.iter_all_anims from the panel, None when something is missing
         mixamo = context.scene.mixamo
         source_directory = mixamo.source_directory
         hip_name = mixamo.hip_name
@@ -108,24 +274,121 @@ class OBJECT_OT_ImportAnimations(bpy.types.Operator):
         remove_prefix = mixamo.remove_prefix
         insert_root = mixamo.insert_root
         delete_armatures = mixamo.delete_armatures
+        workers = mixamo.workers
+        anim_only = mixamo.anim_only
+        stream = mixamo.stream
+        incremental = mixamo.incremental
+        prune_missing = mixamo.prune_missing
+        use_cache = mixamo.use_cache
+        cache_directory = mixamo.cache_directory
+        cache_size = mixamo.cache_size
+        reduce_keys = mixamo.reduce_keys
+        location_tolerance = mixamo.location_tolerance
+        rotation_tolerance = mixamo.rotation_tolerance
+        files = None
+        if self.resume:
+            pending = load_mixamoroot().manifest.load_pending(context.scene)
+            if pending is None:
+                self.report({'ERROR_INVALID_INPUT'}, "Error: no unfinished import to resume.")
+                return None
+            source_directory, files = pending
         if source_directory == '':
             self.report({'ERROR_INVALID_INPUT'}, "Error: no Source Directory set.")
-            return{ 'CANCELLED'}
+            return None
         if hip_name == '':
             self.report({'ERROR_INVALID_INPUT'}, "Error: no Hip Bone Name set.")
-            return{ 'CANCELLED'}
+            return None
         if root_name == '':
             self.report({'ERROR_INVALID_INPUT'}, "Error: no Root Bone Name set.")
-            return{ 'CANCELLED'}
+            return None
         if remove_prefix == True:
             self.report({'WARNING'}, "Remove Prefix set to true, armature components will have their mixamo prefix removed.")
         if delete_armatures == True:
             self.report({'WARNING'}, "Delete Armatures set to true, imported animation armatures will be removed.")
-        mixamoroot.get_all_anims(
-            bpy.path.abspath(source_directory),
+        return dict(
+            source_dir=bpy.path.abspath(source_directory),
             root_bone_name=root_name,
             hip_bone_name=hip_name,
-            remove_prefix=remove_prefix, name_prefix=name_prefix, insert_root=insert_root, delete_armatures=delete_armatures)
+            remove_prefix=remove_prefix, name_prefix=name_prefix, insert_root=insert_root, delete_armatures=delete_armatures,
+            files=files, workers=workers,
+            use_cache=use_cache, cache_dir=bpy.path.abspath(cache_directory) if cache_directory else "", cache_size=cache_size,
+            incremental=incremental, prune_missing=prune_missing, anim_only=anim_only, stream=stream,
+            reduce_keys=reduce_keys, location_tolerance=location_tolerance, rotation_tolerance=rotation_tolerance,
+            report=mixamo.write_report, recursive=mixamo.recursive, prescan_files=mixamo.prescan, import_order=mixamo.import_order,
+            resample_fps=mixamo.resample_fps if mixamo.resample else 0, use_bulk=mixamo.bulk_mode,
+            zero_start=mixamo.zero_start, dedup_mode=mixamo.dedup_mode, dedup_near=mixamo.dedup_near)
+
+    # Called from scripts, imports everything before returning
+    def execute(self, context):
+        options = self.import_options(context)
+        if options is None:
+            return{ 'CANCELLED'}
+        load_mixamoroot().get_all_anims(**options)
+        return{ 'FINISHED'}
+
+    # Called from the panel, imports one file per timer tick so the interface stays responsive
+    def invoke(self, context, event):
+        progress = context.window_manager.mixamo_progress
+        if progress.running:
+            self.report({'WARNING'}, "An import is already running.")
+            return{ 'CANCELLED'}
+        options = self.import_options(context)
+        if options is None:
+            return{ 'CANCELLED'}
+        self._anims = load_mixamoroot().iter_all_anims(**options)
+        self._start = time.perf_counter()
+        progress.running = True
+        progress.cancel = False
+        progress.progress = 0.0
+        progress.status = "Starting import"
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return{ 'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        progress = context.window_manager.mixamo_progress
+        if event.type == 'ESC' or progress.cancel:
+            self.finish(context)
+            self.report({'WARNING'}, "Import cancelled, the finished clips are kept. Resume Import imports the remaining files.")
+            # Finished, not cancelled, so the kept clips get their undo step
+            return{ 'FINISHED'}
+        if event.type != 'TIMER':
+            return{ 'PASS_THROUGH'}
+        try:
+            done, total, file = next(self._anims)
+        except StopIteration:
+            self.finish(context)
+            return{ 'FINISHED'}
+        except Exception as e:
+            self.finish(context)
+            self.report({'ERROR'}, "Import failed: %s. Resume Import retries from the failed file." % str(e))
+            return{ 'FINISHED'}
+        elapsed = time.perf_counter() - self._start
+        progress.progress = 100.0 * done / total if total else 100.0
+        progress.status = "%d of %d files, about %s left" % (done, total, format_duration(elapsed / done * (total - done)))
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+        return{ 'RUNNING_MODAL'}
+
+    def finish(self, context):
+        # Closing the generator runs its cleanup, the clips finished so far stay in the file
+        context.window_manager.event_timer_remove(self._timer)
+        self._anims.close()
+        progress = context.window_manager.mixamo_progress
+        progress.running = False
+        progress.cancel = False
+        progress.status = ""
+
+class OBJECT_OT_CancelImport(bpy.types.Operator):
+    '''Operator for stopping a running import'''
+    bl_idname = "mixamo.cancelimport"
+    bl_label = "Cancel"
+    bl_description = "Stops the running import after the current file, the clips imported so far are kept"
+
+    def execute(self, context):
+        context.window_manager.mixamo_progress.cancel = True
         return{ 'FINISHED'}
 
 class OBJECT_OT_ApplyAnimations(bpy.types.Operator):
@@ -133,6 +396,7 @@ class OBJECT_OT_ApplyAnimations(bpy.types.Operator):
     bl_idname = "mixamo.applyanims"
     bl_label = "Apply Animations"
     bl_description = "Applies all the imported mixamo animations, to a single mixamo control rig. ONLY for mixamo control rigs generated with mixamo addon"
+    bl_options = {'UNDO'}
 
     def execute(self, context):
         mixamo = context.scene.mixamo
@@ -140,12 +404,15 @@ class OBJECT_OT_ApplyAnimations(bpy.types.Operator):
         delete_applied_armatures = mixamo.delete_applied_armatures
         control_rig = mixamo_control_rig
         push_nla = mixamo.push_nla
+        native_retarget = mixamo.native_retarget
         if control_rig == '' or control_rig == None or bpy.data.objects[control_rig.name].type != "ARMATURE":
             self.report({'ERROR_INVALID_INPUT'}, "Error: No valid control rig armature selected")
             return{ 'CANCELLED'}
         if delete_applied_armatures == True:
             self.report({'WARNING'}, "Delete Armatures set to true, imported animation armatures will be removed.")
-        mixamoroot.apply_all_anims(delete_applied_armatures=delete_applied_armatures, control_rig=control_rig, push_nla=push_nla)
+        load_mixamoroot().apply_all_anims(delete_applied_armatures=delete_applied_armatures, control_rig=control_rig, push_nla=push_nla,
+                                   native_retarget=native_retarget, name_prefix=mixamo.name_prefix, report=mixamo.write_report,
+                                   source_dir=bpy.path.abspath(mixamo.source_directory) if mixamo.source_directory else None, use_bulk=mixamo.bulk_mode)
         return{ 'FINISHED'}
 
 class OBJECT_OT_AddRootNLA(bpy.types.Operator):
@@ -153,6 +420,7 @@ class OBJECT_OT_AddRootNLA(bpy.types.Operator):
     bl_idname = "mixamo.addrootnla"
     bl_label = "Add Root"
     bl_description = "Adds a root bone to all animation strips in the NLA for the selected armature, iterating through every keyframe and copying the hip position. Sets the Z coordinate to a minimum of 0"
+    bl_options = {'UNDO'}
 
     # Works on the selected armature only
     def execute(self, context):
@@ -166,7 +434,57 @@ class OBJECT_OT_AddRootNLA(bpy.types.Operator):
         if root_name == '':
             self.report({'ERROR_INVALID_INPUT'}, "Error: no Root Bone Name set.")
             return{ 'CANCELLED'}
-        mixamoroot.add_root_bone_nla(root_bone_name=root_name, hip_bone_name=hip_name, name_prefix=name_prefix)
+        load_mixamoroot().add_root_bone_nla(root_bone_name=root_name, hip_bone_name=hip_name, name_prefix=name_prefix,
+                                     reduce_keys=mixamo.reduce_keys, location_tolerance=mixamo.location_tolerance, rotation_tolerance=mixamo.rotation_tolerance)
+        return{ 'FINISHED'}
+
+class OBJECT_OT_ZeroStartFrames(bpy.types.Operator):
+    '''Operator for moving all actions to start on frame 0'''
+    bl_idname = "mixamo.zerostartframes"
+    bl_label = "Zero All Start Frames"
+    bl_description = "Moves every action in the file so its first key is on frame 0, all of them in one pass. NLA strips keep playing the same keys"
+    bl_options = {'UNDO'}
+
+    def execute(self, context):
+        count = load_mixamoroot().zero_start_frames()
+        self.report({'INFO'}, "Moved %d actions." % count)
+        return{ 'FINISHED'}
+
+class OBJECT_OT_ExportRootMotion(bpy.types.Operator):
+    '''Operator for writing the root bone tracks of all actions to a sidecar file'''
+    bl_idname = "mixamo.exportrootmotion"
+    bl_label = "Export Root Motion"
+    bl_description = "Writes the root bone translation, yaw, per frame deltas and distance travelled of every action with a root bone to the [Root Motion File]"
+
+    def execute(self, context):
+        mixamo = context.scene.mixamo
+        root_motion_file = mixamo.root_motion_file
+        if root_motion_file == '':
+            self.report({'ERROR_INVALID_INPUT'}, "Error: no Root Motion File set.")
+            return{ 'CANCELLED'}
+        count = load_mixamoroot().export_root_motion(bpy.path.abspath(root_motion_file), root_bone_name=mixamo.root_name, name_prefix=mixamo.name_prefix)
+        if count == 0:
+            self.report({'WARNING'}, "No actions with a root bone track found.")
+        return{ 'FINISHED'}
+
+class OBJECT_OT_ExportGLTF(bpy.types.Operator):
+    '''Operator for exporting the armature with all its actions to glTF'''
+    bl_idname = "mixamo.exportgltf"
+    bl_label = "Export glTF"
+    bl_description = "Exports the active armature (or the first armature in the scene), its meshes and every action keying its bones to the [glTF Path]"
+
+    def execute(self, context):
+        mixamo = context.scene.mixamo
+        gltf_path = mixamo.gltf_path
+        if gltf_path == '':
+            self.report({'ERROR_INVALID_INPUT'}, "Error: no glTF Path set.")
+            return{ 'CANCELLED'}
+        try:
+            paths = load_mixamoroot().export_gltf(bpy.path.abspath(gltf_path), per_action=mixamo.gltf_per_action, export_format=mixamo.gltf_format, workers=mixamo.workers)
+        except ValueError as e:
+            self.report({'ERROR_INVALID_INPUT'}, "Error: %s." % str(e))
+            return{ 'CANCELLED'}
+        self.report({'INFO'}, "Exported %d glTF files." % len(paths))
         return{ 'FINISHED'}
 
 class MIXAMOCONV_VIEW_3D_PT_mixamoroot(bpy.types.Panel):
@@ -190,21 +508,66 @@ class MIXAMOCONV_VIEW_3D_PT_mixamoroot(bpy.types.Panel):
         row = box.row()
         row.prop(scene.mixamo, "remove_prefix", toggle=True)
         row.prop(scene.mixamo, "delete_armatures", toggle=True)
+        row.prop(scene.mixamo, "anim_only", toggle=True)
+        row = box.row()
+        row.prop(scene.mixamo, "stream", toggle=True)
+        row = box.row()
+        row.prop(scene.mixamo, "zero_start", toggle=True)
+        row.operator("mixamo.zerostartframes")
+        row = box.row()
+        row.prop(scene.mixamo, "resample", toggle=True)
+        row.prop(scene.mixamo, "resample_fps")
+        row = box.row()
+        row.prop(scene.mixamo, "reduce_keys", toggle=True)
+        row = box.row()
+        row.prop(scene.mixamo, "location_tolerance")
+        row.prop(scene.mixamo, "rotation_tolerance")
         row = box.row()
         box.prop(scene.mixamo, "hip_name")
         row = box.row()
         box.prop(scene.mixamo, "root_name")
         row = box.row()
         box.prop(scene.mixamo, "name_prefix")
+        row = box.row()
+        box.prop(scene.mixamo, "workers")
         # Button for conversion of single Selected rig
         box = layout.box()
         box.label(text="Animation Files")
         row = box.row()
         row.prop(scene.mixamo, "source_directory")
-        # button to start batch conversion
+        row = box.row()
+        row.prop(scene.mixamo, "recursive", toggle=True)
+        row.prop(scene.mixamo, "prescan", toggle=True)
+        row.prop(scene.mixamo, "import_order", text="")
+        row = box.row()
+        row.prop(scene.mixamo, "dedup_mode", text="")
+        row.prop(scene.mixamo, "dedup_near", toggle=True)
+        row = box.row()
+        row.prop(scene.mixamo, "incremental", toggle=True)
+        row.prop(scene.mixamo, "prune_missing", toggle=True)
+        row = box.row()
+        row.prop(scene.mixamo, "use_cache", toggle=True)
+        row.prop(scene.mixamo, "cache_size")
+        row = box.row()
+        row.prop(scene.mixamo, "cache_directory")
+        row = box.row()
+        row.prop(scene.mixamo, "write_report", toggle=True)
+        row.prop(scene.mixamo, "bulk_mode", toggle=True)
+        # button to start batch conversion, progress and cancel while it runs
+        progress = context.window_manager.mixamo_progress
         row = box.row()
         row.scale_y = 2.0
-        row.operator("mixamo.importanim")
+        if progress.running:
+            row.prop(progress, "progress", slider=True)
+            row.operator("mixamo.cancelimport")
+            row = box.row()
+            row.label(text=progress.status)
+        else:
+            row.operator("mixamo.importanim")
+            # Left over files of a cancelled or failed import, see mixamoroot.manifest.PENDING_PROPERTY
+            if "mixamo_pending" in scene:
+                row = box.row()
+                row.operator("mixamo.importanim", text="Resume Import").resume = True
         status_row = box.row()
         box = layout.box()
         box.label(text="Animation Helpers")
@@ -216,18 +579,46 @@ class MIXAMOCONV_VIEW_3D_PT_mixamoroot(bpy.types.Panel):
         row.prop(scene.mixamo, "delete_applied_armatures", toggle=True) # todo delete_applied_armatures
         row.prop(scene.mixamo, "push_nla", toggle=True)
         row = box.row()
+        row.prop(scene.mixamo, "native_retarget", toggle=True)
+        row = box.row()
         # box.prop(scene.mixamo, "mixamo.applyanims") # todo
         row.operator("mixamo.applyanims")
         row = box.row()
         row.scale_y = 2.0
         row.operator("mixamo.addrootnla")
         status_row = box.row()
+        # Summary of the last import or apply, kept on the scene by mixamoroot.finish_recording
+        report = scene.get("mixamo_report")
+        if report:
+            box = layout.box()
+            box.label(text="Last Batch")
+            for line in report.splitlines():
+                box.label(text=line)
+        box = layout.box()
+        box.label(text="Root Motion Export")
+        row = box.row()
+        row.prop(scene.mixamo, "root_motion_file")
+        row = box.row()
+        row.operator("mixamo.exportrootmotion")
+        box = layout.box()
+        box.label(text="glTF Export")
+        row = box.row()
+        row.prop(scene.mixamo, "gltf_path")
+        row = box.row()
+        row.prop(scene.mixamo, "gltf_per_action", toggle=True)
+        row.prop(scene.mixamo, "gltf_format", text="")
+        row = box.row()
+        row.operator("mixamo.exportgltf")
         # status_row = box.row()
 
 classes = (
     OBJECT_OT_ImportAnimations,
+    OBJECT_OT_CancelImport,
     OBJECT_OT_ApplyAnimations,
     OBJECT_OT_AddRootNLA,
+    OBJECT_OT_ZeroStartFrames,
+    OBJECT_OT_ExportRootMotion,
+    OBJECT_OT_ExportGLTF,
     MIXAMOCONV_VIEW_3D_PT_mixamoroot,
 )
 
@@ -238,6 +629,8 @@ def register():
                                             name="",
                                             description="The control rig generated by mixamo, used as target for the animation application function")
     bpy.types.Scene.mixamo = bpy.props.PointerProperty(type=MixamoPropertyGroup)
+    bpy.utils.register_class(MixamoProgressGroup)
+    bpy.types.WindowManager.mixamo_progress = bpy.props.PointerProperty(type=MixamoProgressGroup)
     for cls in classes:
         bpy.utils.register_class(cls)
     '''
@@ -250,6 +643,8 @@ def register():
 def unregister():
     for cls in classes:
         bpy.utils.unregister_class(cls)
+    del bpy.types.WindowManager.mixamo_progress
+    bpy.utils.unregister_class(MixamoProgressGroup)
     bpy.utils.unregister_class(MixamoPropertyGroup)    
     '''
     bpy.utils.unregister_class(MixamoPropertyGroup)
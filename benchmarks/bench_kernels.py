@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Benchmarks of the numpy parts of the pipeline, runs with plain python:
+#   python benchmarks/bench_kernels.py --out kernels.json
+import argparse
+import sys
+
+import numpy as np
+
+import common
+import reduce
+import retarget
+import rootmath
+import sidecar
+
+
+def clip_arrays(skeleton, frame_count, seed=0):
+    # The synthetic clip as (bones, frames, ...) arrays, in skeleton order
+    clip = common.synthetic_clip(skeleton, frame_count, seed)
+    rotations = np.stack([clip[name][2] for name, _ in skeleton])
+    locations = np.stack([clip[name][1] for name, _ in skeleton])
+    return clip[skeleton[0][0]][0], rotations, locations
+
+
+def synthetic_plan(skeleton, seed=0):
+    # Control rig with the same bones under their control bone names (Ctrl_ for the ones
+    # without one) and different rest rotations
+    rng = np.random.default_rng(seed)
+    names = [name for name, _ in skeleton]
+    parents = [parent for _, parent in skeleton]
+    source = retarget.Rig(names, parents, rootmath.quat_normalize(rng.normal(size=(len(names), 4))), scale=0.01)
+    control = lambda name: retarget.CONTROL_BONES.get(name.split(':')[-1], retarget.CONTROL_PREFIX + name.split(':')[-1])
+    target_names = [control(name) for name in names]
+    target_parents = [control(parent) if parent else None for parent in parents]
+    target = retarget.Rig(target_names, target_parents, rootmath.quat_normalize(rng.normal(size=(len(names), 4))))
+    return retarget.RetargetPlan(source, target, retarget.map_bones(names, target_names))
+
+
+def kernels(skeleton, frame_count):
+    # name: function of one clip, set up outside of the timing
+    frames, rotations, locations = clip_arrays(skeleton, frame_count)
+    hip_rest = rootmath.quat_normalize(np.array([0.7, 0.7, 0.0, 0.0]))
+    root_quats, _ = rootmath.split_root_rotation(rotations[0], hip_rest)
+    plan = synthetic_plan(skeleton)
+    has_location = np.zeros(len(skeleton), dtype=bool)
+    has_location[0] = True
+    return {
+        'split_root_rotation': lambda: rootmath.split_root_rotation(rotations[0], hip_rest),
+        'quat_continuous': lambda: rootmath.quat_continuous(rotations[0]),
+        'reduce_keys_rotation': lambda: reduce.reduce_keys(frames, rotations[1], 0.001),
+        'reduce_keys_location': lambda: reduce.reduce_keys(frames, locations[0], 0.001),
+        'retarget_apply': lambda: plan.apply(rotations, locations, has_location),
+        'root_records': lambda: sidecar.root_records(locations[0] / 100, root_quats),
+    }
+
+
+def frame_scaling(skeleton, frame_counts, repeat):
+    results = {}
+    for frame_count in frame_counts:
+        for name, function in kernels(skeleton, frame_count).items():
+            results.setdefault(name, []).append({'frames': frame_count, 'seconds': common.best_of(function, repeat)})
+    return results
+
+
+def clip_scaling(skeleton, frame_count, clip_counts, repeat):
+    # The per clip kernels of an import run one after the other over a batch of clips
+    results = []
+    batches = {count: [kernels(skeleton, frame_count) for _ in range(count)] for count in clip_counts}
+    for count in clip_counts:
+        def run():
+            for clip in batches[count]:
+                clip['split_root_rotation']()
+                clip['reduce_keys_location']()
+                clip['retarget_apply']()
+                clip['root_records']()
+        results.append({'clips': count, 'seconds': common.best_of(run, repeat)})
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks the numpy kernels of Mixamo Root on synthetic clips')
+    parser.add_argument('--bones', type=int, default=65, help='Bones of the synthetic skeleton, 65 like mixamo')
+    parser.add_argument('--frames', type=int, nargs='+', default=[30, 120, 480, 1920], help='Frame counts for the frame scaling curve')
+    parser.add_argument('--clip-frames', type=int, default=120, help='Frames per clip for the clip scaling curve')
+    parser.add_argument('--clips', type=int, nargs='+', default=[1, 4, 16, 64], help='Clip counts for the clip scaling curve')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the fastest is kept')
+    parser.add_argument('--out', help='Path of the JSON results, printed when not given')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    skeleton = common.mixamo_skeleton(args.bones)
+    frames = frame_scaling(skeleton, args.frames, args.repeat)
+    clips = clip_scaling(skeleton, args.clip_frames, args.clips, args.repeat)
+    common.write_results(args.out, {
+        'benchmark': 'kernels',
+        'config': vars(args),
+        'frame_scaling': {name: {'points': points, 'exponent': common.fit_exponent([p['frames'] for p in points], [p['seconds'] for p in points])}
+                          for name, points in frames.items()},
+        'clip_scaling': {'points': clips, 'exponent': common.fit_exponent([p['clips'] for p in clips], [p['seconds'] for p in clips])},
+    })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
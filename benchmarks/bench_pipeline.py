@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Benchmark of the import and root insertion pipeline in background blender:
+#   blender -b --factory-startup -P benchmarks/bench_pipeline.py -- --out pipeline.json
+# Synthetic mixamo style clips are exported to fbx once, then imported with get_all_anims
+# for every clip and frame count. The pipeline functions are wrapped with timers, so the
+# stages are measured inside the real import, not in a copy of it.
+import argparse
+import os
+import sys
+import tempfile
+
+import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import common
+import keyframes
+import mixamoroot
+
+
+STAGES = ('get_all_anims', 'import_armature', 'import_animation', 'add_root_bone', 'fixBones', 'scaleAll',
+          'copyHips', 'reduce_action', 'deleteArmature', 'purge_imported')
+
+
+def build_armature(skeleton):
+    data = bpy.data.armatures.new("mixamorig")
+    obj = bpy.data.objects.new("Armature", data)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+    bpy.ops.object.mode_set(mode='EDIT')
+    tails = {}
+    for name, parent in skeleton:
+        bone = data.edit_bones.new(name)
+        bone.head = tails[parent] if parent else (0.0, 0.0, 1.0)
+        bone.tail = np.array(bone.head) + common.bone_direction(name)
+        tails[name] = tuple(bone.tail)
+        if parent:
+            bone.parent = data.edit_bones[parent]
+            bone.use_connect = True
+    bpy.ops.object.mode_set(mode='OBJECT')
+    for pose_bone in obj.pose.bones:
+        pose_bone.rotation_mode = 'QUATERNION'
+    return obj
+
+
+def build_action(name, clip):
+    action = bpy.data.actions.new(name)
+    for bone, (frames, location, rotation, scale) in clip.items():
+        for attribute, values in (('location', location), ('rotation_quaternion', rotation), ('scale', scale)):
+            for index in range(values.shape[1]):
+                fcurve = action.fcurves.new(data_path='pose.bones["%s"].%s' % (bone, attribute), index=index, action_group=bone)
+                keyframes.write_keyframes(fcurve, np.column_stack((frames, values[:, index])))
+    return action
+
+
+def export_clips(directory, skeleton, frame_count, clip_count):
+    # Writes clip_count fbx files of the same synthetic rig, each with its own clip
+    bpy.ops.wm.read_homefile(use_empty=True)
+    armature = build_armature(skeleton)
+    armature.animation_data_create()
+    scene = bpy.context.scene
+    scene.frame_start, scene.frame_end = 1, frame_count
+    files = []
+    for i in range(clip_count):
+        armature.animation_data.action = build_action("Clip_%03d" % i, common.synthetic_clip(skeleton, frame_count, seed=i))
+        filepath = os.path.join(directory, "clip_%03d.fbx" % i)
+        bpy.ops.export_scene.fbx(filepath=filepath, use_selection=True, object_types={'ARMATURE'}, add_leaf_bones=False,
+                                 bake_anim=True, bake_anim_use_all_actions=False, bake_anim_use_nla_strips=False)
+        files.append(os.path.basename(filepath))
+    return files
+
+
+def run_import(stages, directory, files, args, use_bulk=False):
+    bpy.ops.wm.read_homefile(use_empty=True)
+    stages.reset()
+    mixamoroot.get_all_anims(directory, files=files, insert_root=True, delete_armatures=not args.keep_armatures, remove_prefix=args.remove_prefix,
+                             anim_only=args.anim_only, stream=args.stream, reduce_keys=args.reduce_keys, use_bulk=use_bulk)
+    summary = stages.summary()
+    # Process memory with the imported clips still in the file
+    return {'seconds': summary.pop('get_all_anims')['seconds'], 'rss': mixamoroot.memory.rss(), 'stages': summary}
+
+
+def scaling(stages, work_dir, skeleton, frame_count, clip_counts, args):
+    directory = os.path.join(work_dir, "frames_%d" % frame_count)
+    os.makedirs(directory, exist_ok=True)
+    files = export_clips(directory, skeleton, frame_count, max(clip_counts))
+    points = []
+    for count in clip_counts:
+        point = run_import(stages, directory, files[:count], args, args.use_bulk or args.compare_bulk)
+        point.update(clips=count, frames=frame_count, seconds_per_clip=point['seconds'] / count)
+        print("[Mixamo Root] %d clips of %d frames: %.3fs" % (count, frame_count, point['seconds']))
+        if args.compare_bulk:
+            # The same import again without bulk mode, after the bulk run so it can not gain from a warmer start
+            baseline = run_import(stages, directory, files[:count], args, False)
+            point.update(no_bulk_seconds=baseline['seconds'], no_bulk_rss=baseline['rss'], bulk_speedup=baseline['seconds'] / point['seconds'])
+            print("[Mixamo Root] %d clips of %d frames without bulk mode: %.3fs (%.2fx), memory %s vs %s" % (
+                count, frame_count, baseline['seconds'], point['bulk_speedup'], mixamoroot.memory.format_mb(baseline['rss']), mixamoroot.memory.format_mb(point['rss'])))
+        points.append(point)
+    return points
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='blender -b --factory-startup -P benchmarks/bench_pipeline.py --',
+                                     description='Benchmarks the Mixamo Root import pipeline on synthetic fbx clips')
+    parser.add_argument('--bones', type=int, default=65, help='Bones of the synthetic skeleton, 65 like mixamo')
+    parser.add_argument('--clips', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='Clip counts for the clip scaling curve')
+    parser.add_argument('--clip-frames', type=int, default=60, help='Frames per clip for the clip scaling curve')
+    parser.add_argument('--frames', type=int, nargs='+', default=[30, 60, 120, 240], help='Frame counts for the frame scaling curve')
+    parser.add_argument('--frame-clips', type=int, default=4, help='Clips per run for the frame scaling curve')
+    parser.add_argument('--remove-prefix', action='store_true')
+    parser.add_argument('--anim-only', action='store_true')
+    parser.add_argument('--stream', action='store_true')
+    parser.add_argument('--reduce-keys', action='store_true')
+    parser.add_argument('--keep-armatures', action='store_true', help='Keep the armature and mesh of every clip, like importing without Delete Armatures')
+    parser.add_argument('--bulk', dest='use_bulk', action='store_true', help='Run with bulk mode')
+    parser.add_argument('--compare-bulk', action='store_true', help='Run every point with and without bulk mode and report both times and the speedup')
+    parser.add_argument('--out', help='Path of the JSON results, printed when not given')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    stages = common.Stages()
+    for name in STAGES:
+        setattr(mixamoroot, name, stages.wrap(name, getattr(mixamoroot, name)))
+
+    skeleton = common.mixamo_skeleton(args.bones)
+    with tempfile.TemporaryDirectory(prefix="mixamoroot_bench_") as work_dir:
+        clips = scaling(stages, work_dir, skeleton, args.clip_frames, args.clips, args)
+        frames = [scaling(stages, work_dir, skeleton, frame_count, [args.frame_clips], args)[0] for frame_count in args.frames]
+
+    common.write_results(args.out, {
+        'benchmark': 'pipeline',
+        'config': vars(args),
+        'clip_scaling': {'points': clips, 'exponent': common.fit_exponent([p['clips'] for p in clips], [p['seconds'] for p in clips])},
+        'frame_scaling': {'points': frames, 'exponent': common.fit_exponent([p['frames'] for p in frames], [p['seconds'] for p in frames])},
+    })
+    return 0
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    sys.exit(main(argv))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Startup check of the addon in background blender:
+#   blender -b --factory-startup -P benchmarks/bench_startup.py -- --out startup.json
+# Times loading and registering the addon like enabling it does, then the first use that
+# imports the processing modules. Exits with 1 when registering already imported them or
+# numpy, so it can run as a check. Nothing is imported before the measurement, including
+# the numpy based common module.
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "mixamo_root_startup"
+DEFERRED = ('numpy', PACKAGE + '.mixamoroot')
+
+
+def load_addon():
+    # The addon directory as a package, its name may not be a valid module name
+    spec = importlib.util.spec_from_file_location(PACKAGE, os.path.join(ADDON_DIR, "__init__.py"),
+                                                  submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = addon
+    spec.loader.exec_module(addon)
+    return addon
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='blender -b --factory-startup -P benchmarks/bench_startup.py --',
+                                     description='Times loading and registering the Mixamo Root addon and checks it defers its heavy imports')
+    parser.add_argument('--out', help='Path of the JSON results, printed when not given')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    already_loaded = [name for name in DEFERRED if name in sys.modules]
+    modules_before = set(sys.modules)
+
+    start = time.perf_counter()
+    addon = load_addon()
+    loaded = time.perf_counter()
+    addon.register()
+    registered = time.perf_counter()
+    loaded_by_register = sorted(set(sys.modules) - modules_before)
+    eager = [name for name in DEFERRED if name in loaded_by_register]
+
+    addon.load_mixamoroot()
+    first_use = time.perf_counter()
+    addon.unregister()
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import common
+    common.write_results(args.out, {
+        'benchmark': 'startup',
+        'load_seconds': loaded - start,
+        'register_seconds': registered - loaded,
+        'first_use_seconds': first_use - registered,
+        'modules_loaded_by_register': loaded_by_register,
+        'loaded_before_addon': already_loaded,
+        'eager_imports': eager,
+    })
+    print("[Mixamo Root] Startup %.1f ms (load %.1f, register %.1f), first use %.1f ms" % (
+        (registered - start) * 1000, (loaded - start) * 1000, (registered - loaded) * 1000, (first_use - registered) * 1000))
+    if eager:
+        print("[Mixamo Root] ERROR registering the addon imported %s" % ", ".join(eager))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    sys.exit(main(argv))
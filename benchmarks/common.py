@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Shared pieces of the benchmarks: synthetic mixamo style skeletons and clips, stage timers
+# and the JSON results. Only depends on numpy, so the kernel benchmarks run without blender.
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# The addon modules sit one directory up
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+
+FINGERS = ('Thumb', 'Index', 'Middle', 'Ring', 'Pinky')
+
+
+def mixamo_skeleton(bone_count=65, prefix="mixamorig:"):
+    '''Bone names and parents of a mixamo skeleton, [(name, parent or None)] parents first
+
+    The standard mixamo skeleton has 65 bones, smaller counts drop bones from the end
+    (fingers first) and larger counts add a chain of extra bones under the head.
+    '''
+    bones = [('Hips', None), ('Spine', 'Hips'), ('Spine1', 'Spine'), ('Spine2', 'Spine1'),
+             ('Neck', 'Spine2'), ('Head', 'Neck'), ('HeadTop_End', 'Head')]
+    for side in ('Left', 'Right'):
+        bones += [(side + 'UpLeg', 'Hips'), (side + 'Leg', side + 'UpLeg'), (side + 'Foot', side + 'Leg'),
+                  (side + 'ToeBase', side + 'Foot'), (side + 'Toe_End', side + 'ToeBase')]
+    for side in ('Left', 'Right'):
+        bones += [(side + 'Shoulder', 'Spine2'), (side + 'Arm', side + 'Shoulder'),
+                  (side + 'ForeArm', side + 'Arm'), (side + 'Hand', side + 'ForeArm')]
+    for side in ('Left', 'Right'):
+        for finger in FINGERS:
+            parent = side + 'Hand'
+            for joint in range(1, 5):
+                name = '%sHand%s%d' % (side, finger, joint)
+                bones.append((name, parent))
+                parent = name
+    parent = 'HeadTop_End'
+    for i in range(max(0, bone_count - len(bones))):
+        name = 'Extra%d' % i
+        bones.append((name, parent))
+        parent = name
+    bones = bones[:max(1, bone_count)]
+    return [(prefix + name, prefix + parent if parent else None) for name, parent in bones]
+
+
+def bone_direction(name):
+    # Rest direction used when building a synthetic armature, so bone rolls are not all the same
+    if 'Leg' in name or 'Foot' in name or 'Toe' in name:
+        return np.array([0.0, 0.0, -0.1])
+    if 'Left' in name:
+        return np.array([0.1, 0.0, 0.0])
+    if 'Right' in name:
+        return np.array([-0.1, 0.0, 0.0])
+    return np.array([0.0, 0.0, 0.1])
+
+
+def smooth_noise(rng, frames, channels, scale):
+    # Random walk, smoothed, looks more like motion capture than white noise
+    steps = rng.normal(scale=scale, size=(frames, channels))
+    walk = np.cumsum(steps, axis=0)
+    kernel = np.ones(5) / 5
+    return np.stack([np.convolve(walk[:, i], kernel, mode='same') for i in range(channels)], axis=1)
+
+
+def synthetic_clip(skeleton, frame_count, seed=0):
+    '''Baked clip for a skeleton, {bone: (frames, location (N, 3), rotation (N, 4), scale (N, 3))}
+
+    Like a mixamo fbx every bone is keyed on every frame, the hips walk forward in
+    centimetres and every other bone wobbles around its rest pose.
+    '''
+    rng = np.random.default_rng(seed)
+    frames = np.arange(1, frame_count + 1, dtype=np.float64)
+    clip = {}
+    for i, (name, parent) in enumerate(skeleton):
+        rotation = np.concatenate((np.ones((frame_count, 1)), smooth_noise(rng, frame_count, 3, 0.01)), axis=1)
+        rotation /= np.linalg.norm(rotation, axis=1, keepdims=True)
+        location = np.zeros((frame_count, 3))
+        if parent is None:
+            location[:, 1] = 100 + 5 * np.sin(frames / 5)
+            location[:, 2] = frames * 2.5
+            location[:, 0] = smooth_noise(rng, frame_count, 1, 0.5)[:, 0]
+        clip[name] = (frames, location, rotation, np.ones((frame_count, 3)))
+    return clip
+
+
+class Stages:
+    '''Accumulates the time and number of calls of named stages'''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def wrap(self, name, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+        timed.__wrapped__ = function
+        return timed
+
+    def summary(self):
+        return {name: {'seconds': self.seconds[name], 'calls': self.calls[name]} for name in sorted(self.seconds)}
+
+
+def best_of(function, repeat=3):
+    '''Lowest wall time of repeat calls of function, in seconds'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fit_exponent(sizes, seconds):
+    '''Exponent k of seconds ~ sizes ** k from a log-log fit, about 1 for linear and 2 for quadratic'''
+    sizes = np.asarray(sizes, dtype=np.float64)
+    seconds = np.asarray(seconds, dtype=np.float64)
+    usable = (sizes > 0) & (seconds > 0)
+    if np.count_nonzero(usable) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes[usable]), np.log(seconds[usable]), 1)[0])
+
+
+def environment():
+    info = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform()}
+    try:
+        import bpy
+        info['blender'] = bpy.app.version_string
+    except ImportError:
+        pass
+    return info
+
+
+def write_results(filepath, results):
+    results = dict(results, environment=environment(), created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    text = json.dumps(results, indent=2)
+    if filepath:
+        with open(filepath, 'w') as f:
+            f.write(text)
+        print("[Mixamo Root] Wrote benchmark results to %s" % filepath)
+    else:
+        print(text)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Bulk mode of a batch. Undo is handled by the operators: bpy.ops called from python never
+# push undo steps, so the UNDO flag does not remove any, it adds the one memfile step that
+# lets a whole batch be undone. What bulk mode saves is depsgraph evaluation: every mode switch, frame
+# change and action assignment re-evaluates the objects it touches, including the meshes
+# deformed by the armatures. Objects the batch imported and does not need anymore (the clips
+# it is done with, the meshes of a reused rig or of the applied clips) are parked with
+# hide_viewport, which takes them out of evaluation, and are brought back when the batch ends.
+# Objects that were in the scene before the batch are never parked. Off by default, the
+# pipeline benchmark's --compare-bulk shows whether it pays off for a library.
+
+
+class Bulk:
+    '''Objects parked for a batch, restore() brings them back'''
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.parked = []
+
+    def park(self, objects):
+        if not self.enabled:
+            return
+        for obj in objects:
+            if not obj.hide_viewport:
+                obj.hide_viewport = True
+                self.parked.append(obj)
+
+    def restore(self):
+        for obj in self.parked:
+            try:
+                obj.hide_viewport = False
+            except ReferenceError:
+                # Deleted during the batch
+                pass
+        self.parked = []
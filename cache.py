@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# On disk cache of processed clips. Entries are keyed by the content hash of the source
+# .fbx together with the options that change the processed curves, and hold the keyframe
+# arrays of every fcurve of the processed action in a compressed .npz file.
+# Least recently used entries are evicted once the cache grows past its size limit. The
+# size is listed from the directory on the first store and tracked in memory after that,
+# the directory is only listed again to evict.
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+
+log = logging.getLogger(__name__)
+
+# Bump when the processing changes, so stale entries stop matching
+CACHE_VERSION = 1
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "mixamoroot")
+# Eviction goes down to this share of the size limit, so a full cache is not listed again on
+# the next store
+EVICT_RATIO = 0.9
+CURVE_ARRAYS = ('co', 'handle_left', 'handle_right', 'interpolation', 'handle_left_type', 'handle_right_type')
+
+def file_hash(filepath, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ClipCache:
+    '''Size limited store of processed fcurve arrays, keyed by source file and options'''
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_size=1024 * 1024 * 1024):
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.max_size = max_size
+        # Total size of the entries, None until the first store
+        self.size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filepath, **options):
+        content = {'version': CACHE_VERSION, 'file': file_hash(filepath), 'options': options}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        '''Returns the list of cached curves for key, or None on a miss'''
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                curves = []
+                for i, (data_path, index, group) in enumerate(meta['curves']):
+                    curve = {name: data['%d_%s' % (i, name)] for name in CURVE_ARRAYS}
+                    curve.update(data_path=data_path, index=index, group=group)
+                    curves.append(curve)
+        except (OSError, KeyError, ValueError) as e:
+            if os.path.exists(path):
+                log.warning("[Mixamo Root] Ignoring unreadable cache entry %s: %s" % (path, str(e)))
+            return None
+        # Mark as recently used for eviction
+        os.utime(path)
+        return curves
+
+    def store(self, key, curves):
+        '''Stores curves, a list of read_curve dicts with data_path, index and group added'''
+        arrays = {}
+        meta = {'curves': []}
+        for i, curve in enumerate(curves):
+            meta['curves'].append((curve['data_path'], curve['index'], curve['group']))
+            for name in CURVE_ARRAYS:
+                array = curve[name]
+                # Enum indices are tiny, no need to keep them as int32 on disk
+                arrays['%d_%s' % (i, name)] = array.astype(np.uint8) if array.dtype.kind == 'i' else array
+        path = self.path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        else:
+            self.size += os.path.getsize(path) - replaced
+        if self.size > self.max_size:
+            self.evict()
+
+    def entries(self):
+        '''(mtime, size, name) of every entry on disk'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    # Evicted by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self):
+        # Lists the directory again instead of trusting the tracked size, the workers of a
+        # parallel import store into the same cache
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size * EVICT_RATIO:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# The keys of a whole library of clips in flat arrays, so a transform of every clip is one
+# numpy pass instead of a walk over every action's fcurves. The keys of all channels of all
+# clips are concatenated in the keyframes.KEY_ATTRIBUTES arrays (float32 coordinates and
+# handles like blender stores them), channel_offsets gives the keys of every channel and
+# clip_offsets the channels of every clip. Only depends on numpy.
+import numpy as np
+
+try:
+    from . import keyframes
+except ImportError:
+    import keyframes
+
+
+class ClipStore:
+    '''Keys of many clips, built from read_action style curves, see from_clips()'''
+    def __init__(self, names, channels, keys, channel_offsets, clip_offsets):
+        self.names = names                      # clip names
+        self.channels = channels                # (data_path, array_index, group) per channel
+        self.keys = keys                        # KEY_ATTRIBUTES name -> all keys of all channels
+        self.channel_offsets = channel_offsets  # (channels + 1,) into the keys
+        self.clip_offsets = clip_offsets        # (clips + 1,) into the channels
+        self.channel_clip = np.repeat(np.arange(len(names)), np.diff(clip_offsets))
+        self.key_channel = np.repeat(np.arange(len(channels)), np.diff(channel_offsets))
+        self.key_clip = self.channel_clip[self.key_channel]
+
+    @classmethod
+    def from_clips(cls, clips):
+        '''clips: (name, curves) pairs, curves as returned by mixamoroot.read_action'''
+        names, channels, parts = [], [], []
+        channel_counts, key_counts = [], []
+        for name, curves in clips:
+            names.append(name)
+            channel_counts.append(len(curves))
+            for curve in curves:
+                channels.append((curve['data_path'], int(curve['index']), curve['group']))
+                key_counts.append(len(curve['co']))
+                parts.append(curve)
+        keys = {}
+        for name, dtype, size in keyframes.KEY_ATTRIBUTES:
+            shape = (0, size) if size > 1 else (0,)
+            keys[name] = np.concatenate([np.asarray(curve[name], dtype=dtype).reshape((-1,) + shape[1:]) for curve in parts]) if parts else np.empty(shape, dtype=dtype)
+        channel_offsets = np.concatenate(([0], np.cumsum(key_counts, dtype=np.int64)))
+        clip_offsets = np.concatenate(([0], np.cumsum(channel_counts, dtype=np.int64)))
+        return cls(names, channels, keys, channel_offsets, clip_offsets)
+
+    def __len__(self):
+        return len(self.names)
+
+    def curves(self, clip):
+        '''The channels of one clip back in read_action form, the arrays are views into the store'''
+        curves = []
+        for channel in range(self.clip_offsets[clip], self.clip_offsets[clip + 1]):
+            start, end = self.channel_offsets[channel], self.channel_offsets[channel + 1]
+            data_path, index, group = self.channels[channel]
+            curve = {name: self.keys[name][start:end] for name, _, _ in keyframes.KEY_ATTRIBUTES}
+            curve.update(data_path=data_path, index=index, group=group)
+            curves.append(curve)
+        return curves
+
+    def select(self, predicate):
+        '''Boolean mask of the channels for which predicate(data_path, array_index) is true'''
+        return np.fromiter((predicate(data_path, index) for data_path, index, _ in self.channels), dtype=bool, count=len(self.channels))
+
+    def start_frames(self):
+        '''First keyed frame of every clip, nan for clips without keys'''
+        starts = np.full(len(self.names), np.inf)
+        keyed = np.diff(self.channel_offsets) > 0
+        first = self.keys['co'][self.channel_offsets[:-1][keyed], 0]
+        np.minimum.at(starts, self.channel_clip[keyed], first)
+        starts[np.isinf(starts)] = np.nan
+        return starts
+
+    def shift_frames(self, offsets):
+        '''Moves the keys and handles of every clip by its entry in offsets, in frames'''
+        shift = np.asarray(offsets, dtype=np.float32)[self.key_clip]
+        for name in ('co', 'handle_left', 'handle_right'):
+            self.keys[name][:, 0] += shift
+
+    def zero_start_frames(self, start_frame=0):
+        '''Moves every clip so its first key is on start_frame, returns the offsets applied'''
+        offsets = np.nan_to_num(start_frame - self.start_frames())
+        self.shift_frames(offsets)
+        return offsets
+
+    def scale_values(self, mask, factor, pivot=0.0):
+        '''Scales the values and handles of the channels in mask around pivot'''
+        keys = mask[self.key_channel]
+        for name in ('co', 'handle_left', 'handle_right'):
+            values = self.keys[name][keys, 1]
+            self.keys[name][keys, 1] = pivot + (values - pivot) * factor
+
+    def clamp_values(self, mask, low=None, high=None):
+        '''Clamps the values and handles of the channels in mask to [low, high]'''
+        keys = mask[self.key_channel]
+        for name in ('co', 'handle_left', 'handle_right'):
+            self.keys[name][keys, 1] = np.clip(self.keys[name][keys, 1], low, high)
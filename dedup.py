@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Duplicate clip detection before import. Every file's animation is read with the fbxanim
+# reader and fingerprinted three ways:
+#   exact     hash of the bone names and key arrays, the same clip saved under another name
+#   near      hash of every bone's rotation and location at SAMPLES points spread over the
+#             clip, rounded to ROTATION_STEP and LOCATION_STEP, without the bone name prefix.
+#             Clips equal after the rounding match, a value right at a rounding boundary
+#             can still split two near copies
+#   angles    the same for the rotation angle of every bone only. A mirrored clip turns
+#             every bone by the same angles as its left/right counterpart, so the angles
+#             with Left and Right swapped (mirrored) match the angles of the original
+# Exact and near copies can be skipped or linked to the first file, mirrors are reported.
+# Only depends on numpy.
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from . import fbxanim
+except ImportError:
+    import fbxanim
+
+
+MODES = ('OFF', 'SKIP', 'LINK')
+SAMPLES = 32
+ROTATION_STEP = 0.02    # quaternion components
+LOCATION_STEP = 1.0     # fbx units, centimeters in mixamo files
+ANGLE_STEP = 0.02       # radians
+
+_SIDES = re.compile(r'Left|Right')
+
+
+def short_name(name):
+    '''Bone name without its namespace prefix, e.g. mixamorig1:Hips -> Hips'''
+    return name.rpartition(':')[2]
+
+
+def mirror_name(name):
+    return _SIDES.sub(lambda match: 'Right' if match.group(0) == 'Left' else 'Left', name)
+
+
+def sample(frames, values, count=SAMPLES):
+    '''(count, C) samples of (N, C) keys spread evenly over the keyed range'''
+    values = np.asarray(values, dtype=np.float64).reshape(len(frames), -1)
+    times = np.linspace(frames[0], frames[-1], count)
+    return np.column_stack([np.interp(times, frames, values[:, channel]) for channel in range(values.shape[1])])
+
+
+def quantized_hash(parts):
+    digest = hashlib.sha1()
+    for name, values in parts:
+        digest.update(name.encode('utf-8'))
+        digest.update(np.round(values).astype(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint(bones):
+    '''Fingerprints of fbxanim.read_animation output, a dict of hex digests'''
+    exact = hashlib.sha1()
+    for name in sorted(bones):
+        exact.update(name.encode('utf-8'))
+        for values in bones[name]:
+            exact.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+    near, angles = [], {}
+    for name in sorted(bones, key=short_name):
+        frames, location, rotation, _ = bones[name]
+        # The same rotation either sign, w >= 0 so both copies round the same way
+        rotation = rotation * np.where(rotation[:, :1] < 0, -1.0, 1.0)
+        near.append((short_name(name), np.concatenate(([len(frames)], (sample(frames, rotation) / ROTATION_STEP).ravel(),
+                                                         (sample(frames, location) / LOCATION_STEP).ravel()))))
+        angle = 2.0 * np.arccos(np.clip(rotation[:, 0], 0.0, 1.0))
+        angles[short_name(name)] = np.concatenate(([len(frames)], sample(frames, angle)[:, 0] / ANGLE_STEP))
+    return {
+        'exact': exact.hexdigest(),
+        'near': quantized_hash(near),
+        'angles': quantized_hash(sorted(angles.items())),
+        'mirrored': quantized_hash(sorted((mirror_name(name), values) for name, values in angles.items())),
+    }
+
+
+def fingerprint_file(filepath, fps=30.0):
+    '''Fingerprints of a binary fbx file, None when its animation can not be read'''
+    try:
+        return fingerprint(fbxanim.read_animation(filepath, fps))
+    except (fbxanim.FBXError, ValueError, IndexError, OSError):
+        return None
+
+
+def scan(source_dir, files, fps=30.0, threads=0):
+    '''Fingerprints of files on a thread pool, file -> fingerprint or None'''
+    with ThreadPoolExecutor(max_workers=threads or None) as pool:
+        return dict(zip(files, pool.map(lambda file: fingerprint_file(source_dir + "/" + file, fps), files)))
+
+
+def find_duplicates(files, fingerprints, near=False):
+    '''Duplicates of earlier files and mirrors, in the order of files
+
+    Returns duplicates, file -> (first file, 'exact' or 'near'), and mirrors, a list of
+    (file, file it mirrors). Files without a fingerprint are never duplicates.
+    '''
+    first = {}
+    duplicates, mirrors = {}, []
+    angles = {}
+    for file in files:
+        prints = fingerprints.get(file)
+        if prints is None:
+            continue
+        for kind in ('exact', 'near') if near else ('exact',):
+            original = first.get((kind, prints[kind]))
+            if original is not None:
+                duplicates[file] = (original, kind)
+                break
+        if file in duplicates:
+            continue
+        for kind in ('exact', 'near'):
+            first.setdefault((kind, prints[kind]), file)
+        # Symmetric clips are their own mirror, only other files count
+        original = angles.get(prints['mirrored'])
+        if original is not None and prints['angles'] != prints['mirrored']:
+            mirrors.append((file, original))
+        angles.setdefault(prints['angles'], file)
+    return duplicates, mirrors
+
+
+def write_report(filepath, source_dir, mode, duplicates, mirrors):
+    with open(filepath, 'w') as f:
+        json.dump({'source_dir': source_dir, 'mode': mode,
+                   'duplicates': [{'file': file, 'original': original, 'kind': kind} for file, (original, kind) in duplicates.items()],
+                   'mirrors': [{'file': file, 'mirrors': original} for file, original in mirrors]}, f, indent=2)
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Minimal binary FBX reader for the skeleton and animation curves of mixamo files.
+# Nothing here touches meshes, materials or textures, array properties are only decompressed
+# when they are read, and the module only depends on numpy so it also works outside Blender.
+#
+# read_animation reproduces what the blender fbx importer (default settings) writes to the
+# pose bones of an imported armature: for every animated bone the local transform of each
+# key time is built from its Lcl Translation/Rotation/Scaling curves, pre/post rotation and
+# pivots, then the bind pose of the bone (relative to its parent) is removed from it.
+# Bone orientation correction and bind pose compensation of the importer are not applied,
+# mixamo files import without either.
+import struct
+import zlib
+import numpy as np
+
+try:
+    from . import rootmath
+except ImportError:
+    import rootmath
+
+
+FBX_KTIME = 46186158000  # FBX time units per second
+BINARY_MAGIC = b'Kaydara FBX Binary  \x00'
+# The importer's default animation offset, in frames
+ANIM_OFFSET = 1.0
+
+_SCALAR_TYPES = {
+    b'Y': struct.Struct('<h'),
+    b'C': struct.Struct('<?'),
+    b'I': struct.Struct('<i'),
+    b'F': struct.Struct('<f'),
+    b'D': struct.Struct('<d'),
+    b'L': struct.Struct('<q'),
+}
+_ARRAY_TYPES = {
+    b'f': np.float32,
+    b'd': np.float64,
+    b'l': np.int64,
+    b'i': np.int32,
+    b'b': np.uint8,
+}
+_ARRAY_HEADER = struct.Struct('<III')
+_LENGTH = struct.Struct('<I')
+_EULER_ORDERS = ('XYZ', 'XZY', 'YZX', 'YXZ', 'ZXY', 'ZYX')
+_CHANNELS = {b'd|X': 0, b'd|Y': 1, b'd|Z': 2}
+_LCL_PROPERTIES = (b'Lcl Translation', b'Lcl Rotation', b'Lcl Scaling')
+
+
+class FBXError(Exception):
+    pass
+
+
+class LazyArray:
+    '''An array property, decompressed and converted on first access'''
+    __slots__ = ('dtype', 'length', 'encoding', 'raw', '_value')
+
+    def __init__(self, dtype, length, encoding, raw):
+        self.dtype = dtype
+        self.length = length
+        self.encoding = encoding
+        self.raw = raw
+        self._value = None
+
+    def decode(self):
+        if self._value is None:
+            try:
+                raw = zlib.decompress(self.raw) if self.encoding == 1 else bytes(self.raw)
+                self._value = np.frombuffer(raw, dtype=self.dtype, count=self.length)
+            except (zlib.error, ValueError) as e:
+                raise FBXError("Corrupt array property: %s" % str(e))
+        return self._value
+
+
+class FBXElem:
+    __slots__ = ('id', 'props', 'children')
+
+    def __init__(self, id, props, children):
+        self.id = id
+        self.props = props
+        self.children = children
+
+    def find(self, id):
+        for child in self.children:
+            if child.id == id:
+                return child
+        return None
+
+    def find_all(self, id):
+        return [child for child in self.children if child.id == id]
+
+    def array(self, index=0):
+        prop = self.props[index]
+        return prop.decode() if isinstance(prop, LazyArray) else np.asarray(prop)
+
+
+def _read_props(data, offset, count):
+    props = []
+    for _ in range(count):
+        code = data[offset:offset + 1]
+        offset += 1
+        if code in _SCALAR_TYPES:
+            unpacker = _SCALAR_TYPES[code]
+            props.append(unpacker.unpack_from(data, offset)[0])
+            offset += unpacker.size
+        elif code in _ARRAY_TYPES:
+            length, encoding, size = _ARRAY_HEADER.unpack_from(data, offset)
+            offset += _ARRAY_HEADER.size
+            props.append(LazyArray(_ARRAY_TYPES[code], length, encoding, data[offset:offset + size]))
+            offset += size
+        elif code in (b'S', b'R'):
+            size = _LENGTH.unpack_from(data, offset)[0]
+            offset += _LENGTH.size
+            props.append(bytes(data[offset:offset + size]))
+            offset += size
+        else:
+            raise FBXError("Unknown property type %r at offset %d" % (bytes(code), offset - 1))
+    return props, offset
+
+
+def _read_elem(data, offset, header):
+    end, prop_count, _ = header.unpack_from(data, offset)
+    offset += header.size
+    name_length = data[offset]
+    offset += 1
+    if end == 0:
+        # Null record closing a list of children
+        return None, offset
+    name = bytes(data[offset:offset + name_length])
+    offset += name_length
+    props, offset = _read_props(data, offset, prop_count)
+    children = []
+    while offset < end:
+        child, offset = _read_elem(data, offset, header)
+        if child is None:
+            break
+        children.append(child)
+    return FBXElem(name, props, children), end
+
+
+def parse(filepath):
+    '''Parses a binary FBX file into a root FBXElem, returns (root, version)'''
+    with open(filepath, 'rb') as f:
+        data = memoryview(f.read())
+    if bytes(data[:len(BINARY_MAGIC)]) != BINARY_MAGIC:
+        raise FBXError("%s is not a binary FBX file" % filepath)
+    children = []
+    try:
+        version = struct.unpack_from('<I', data, 23)[0]
+        header = struct.Struct('<QQQ') if version >= 7500 else struct.Struct('<III')
+        offset = 27
+        while offset + header.size < len(data):
+            elem, offset = _read_elem(data, offset, header)
+            if elem is None:
+                break
+            children.append(elem)
+    except (struct.error, IndexError) as e:
+        # Truncated file, a record reaches past the end of the data
+        raise FBXError("%s is truncated or corrupt: %s" % (filepath, str(e)))
+    return FBXElem(b'', [], children), version
+
+
+def object_name(elem):
+    # Object names are stored as b'Name\x00\x01Class'
+    return elem.props[1].split(b'\x00\x01')[0].decode('utf-8', 'replace')
+
+
+def properties70(elem):
+    '''Maps the property names of an object's Properties70 block to their values'''
+    props = elem.find(b'Properties70')
+    if props is None:
+        return {}
+    return {p.props[0]: p.props[4:] for p in props.children if p.props}
+
+
+def _euler_matrix(degrees, order='XYZ'):
+    # (N, 3) euler angles in degrees to (N, 3, 3), same convention as mathutils Euler.to_matrix
+    radians = np.radians(np.asarray(degrees, dtype=np.float64).reshape(-1, 3))
+    c, s = np.cos(radians), np.sin(radians)
+    n = len(radians)
+    axes = []
+    for axis in range(3):
+        m = np.zeros((n, 3, 3))
+        a, b = [i for i in range(3) if i != axis]
+        m[:, axis, axis] = 1
+        m[:, a, a] = c[:, axis]
+        m[:, b, b] = c[:, axis]
+        m[:, a, b] = -s[:, axis] if axis != 1 else s[:, axis]
+        m[:, b, a] = s[:, axis] if axis != 1 else -s[:, axis]
+        axes.append(m)
+    # Order 'XYZ' applies X first, so the matrix is Z @ Y @ X
+    first, second, third = ('XYZ'.index(a) for a in order)
+    return axes[third] @ axes[second] @ axes[first]
+
+
+def _translation(vectors):
+    vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 3)
+    m = np.tile(np.eye(4), (len(vectors), 1, 1))
+    m[:, :3, 3] = vectors
+    return m
+
+
+def _rotation(matrices):
+    m = np.tile(np.eye(4), (len(matrices), 1, 1))
+    m[:, :3, :3] = matrices
+    return m
+
+
+def _scale(vectors):
+    vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 3)
+    m = np.tile(np.eye(4), (len(vectors), 1, 1))
+    m[:, 0, 0], m[:, 1, 1], m[:, 2, 2] = vectors.T
+    return m
+
+
+def local_matrices(props, translation, rotation, scaling):
+    '''(N, 4, 4) local transforms of a model for (N, 3) Lcl translation/rotation/scaling values
+
+    Same composition as the importer: T * Roff * Rp * Rpre * R * Rpost^-1 * Rp^-1 * Soff * Sp * S * Sp^-1
+    '''
+    def vector(name):
+        return np.asarray(props.get(name, (0.0, 0.0, 0.0))[:3], dtype=np.float64)
+
+    if props.get(b'RotationActive', (0,))[0]:
+        pre_rotation = _rotation(_euler_matrix(vector(b'PreRotation')))
+        post_rotation = _rotation(_euler_matrix(vector(b'PostRotation')))
+        order = _EULER_ORDERS[int(props.get(b'RotationOrder', (0,))[0])]
+    else:
+        pre_rotation = post_rotation = np.eye(4)[None]
+        order = 'XYZ'
+    rotation_offset = _translation(vector(b'RotationOffset'))
+    rotation_pivot = _translation(vector(b'RotationPivot'))
+    scaling_offset = _translation(vector(b'ScalingOffset'))
+    scaling_pivot = _translation(vector(b'ScalingPivot'))
+    return (_translation(translation) @ rotation_offset @ rotation_pivot @ pre_rotation
+            @ _rotation(_euler_matrix(rotation, order)) @ np.linalg.inv(post_rotation) @ np.linalg.inv(rotation_pivot)
+            @ scaling_offset @ scaling_pivot @ _scale(scaling) @ np.linalg.inv(scaling_pivot))
+
+
+def _matrix(values):
+    # FBX matrices are stored column by column
+    return np.asarray(values, dtype=np.float64).reshape(4, 4).T
+
+
+class Skeleton:
+    '''Models, bind poses and animation curve connections of a parsed FBX file'''
+
+    def __init__(self, root):
+        objects = root.find(b'Objects')
+        connections = root.find(b'Connections')
+        if objects is None or connections is None:
+            raise FBXError("No Objects or Connections section")
+        self.models = {}
+        self.curve_nodes = {}
+        self.curves = {}
+        stacks, layers, clusters, poses = {}, {}, {}, []
+        for elem in objects.children:
+            if elem.id == b'Model':
+                self.models[elem.props[0]] = elem
+            elif elem.id == b'AnimationCurveNode':
+                self.curve_nodes[elem.props[0]] = elem
+            elif elem.id == b'AnimationCurve':
+                self.curves[elem.props[0]] = elem
+            elif elem.id == b'AnimationStack':
+                stacks[elem.props[0]] = elem
+            elif elem.id == b'AnimationLayer':
+                layers[elem.props[0]] = elem
+            elif elem.id == b'Deformer' and len(elem.props) > 2 and elem.props[2] == b'Cluster':
+                clusters[elem.props[0]] = elem
+            elif elem.id == b'Pose' and len(elem.props) > 2 and elem.props[2] == b'BindPose':
+                poses.append(elem)
+
+        self.parents = {}
+        self.model_nodes = {}   # model id -> {b'Lcl Rotation': curve node id, ...}
+        self.node_curves = {}   # curve node id -> {channel: curve id}
+        layer_stack, node_layer, cluster_bone = {}, {}, {}
+        for c in connections.children:
+            kind, child, parent = c.props[0], c.props[1], c.props[2]
+            if kind == b'OO':
+                if child in self.models and parent in self.models:
+                    self.parents[child] = parent
+                elif child in layers and parent in stacks:
+                    layer_stack[child] = parent
+                elif child in self.curve_nodes and parent in layers:
+                    node_layer[child] = parent
+                elif child in self.models and parent in clusters:
+                    cluster_bone[child] = parent
+            elif kind == b'OP':
+                prop = c.props[3]
+                if child in self.curves and parent in self.curve_nodes and prop in _CHANNELS:
+                    self.node_curves.setdefault(parent, {})[_CHANNELS[prop]] = child
+                elif child in self.curve_nodes and parent in self.models and prop in _LCL_PROPERTIES:
+                    self.model_nodes.setdefault(parent, {})[prop] = child
+
+        # Only keep the curves of the first take, mixamo files only have the one
+        if stacks and layer_stack:
+            first_stack = next(iter(stacks))
+            first_layer = next((layer for layer, stack in layer_stack.items() if stack == first_stack), None)
+            if first_layer is not None:
+                for nodes in self.model_nodes.values():
+                    for prop, node in list(nodes.items()):
+                        if node in node_layer and node_layer[node] != first_layer:
+                            del nodes[prop]
+
+        self.props = {model_id: properties70(model) for model_id, model in self.models.items()}
+        # Global bind matrices, from skin clusters first like the importer, then the bind pose
+        self.bind_globals = {}
+        for pose in poses:
+            for pose_node in pose.find_all(b'PoseNode'):
+                node, matrix = pose_node.find(b'Node'), pose_node.find(b'Matrix')
+                if node is not None and matrix is not None:
+                    self.bind_globals.setdefault(node.props[0], _matrix(matrix.array()))
+        for model_id, cluster_id in cluster_bone.items():
+            link = clusters[cluster_id].find(b'TransformLink')
+            if link is not None:
+                self.bind_globals[model_id] = _matrix(link.array())
+
+    def name(self, model_id):
+        return object_name(self.models[model_id])
+
+    def is_bone(self, model_id):
+        return self.models[model_id].props[2] == b'LimbNode'
+
+    def rest_matrix(self, model_id):
+        props = self.props[model_id]
+        values = [np.asarray(props.get(name, default)[:3], dtype=np.float64) for name, default in
+                  ((b'Lcl Translation', (0, 0, 0)), (b'Lcl Rotation', (0, 0, 0)), (b'Lcl Scaling', (1, 1, 1)))]
+        return local_matrices(props, *values)[0]
+
+    def bind_global(self, model_id):
+        if model_id not in self.bind_globals:
+            parent = self.parents.get(model_id)
+            parent_matrix = self.bind_global(parent) if parent is not None else np.eye(4)
+            self.bind_globals[model_id] = parent_matrix @ self.rest_matrix(model_id)
+        return self.bind_globals[model_id]
+
+    def bind_local(self, model_id):
+        parent = self.parents.get(model_id)
+        if parent is None:
+            return self.bind_global(model_id)
+        return np.linalg.inv(self.bind_global(parent)) @ self.bind_global(model_id)
+
+    def key_times(self, model_id):
+        '''Sorted union of the key times of every animation curve of a model'''
+        times = [self.curves[curve].find(b'KeyTime').array()
+                 for node in self.model_nodes.get(model_id, {}).values()
+                 for curve in self.node_curves.get(node, {}).values()]
+        if not times:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(times))
+
+    def sample(self, model_id, prop, times, default):
+        '''Evaluates the three channels of one Lcl property at times, linear between keys like the importer'''
+        values = np.tile(np.asarray(default, dtype=np.float64), (len(times), 1))
+        node = self.model_nodes.get(model_id, {}).get(prop)
+        for channel, curve_id in self.node_curves.get(node, {}).items():
+            curve = self.curves[curve_id]
+            key_times = curve.find(b'KeyTime').array()
+            key_values = curve.find(b'KeyValueFloat').array()
+            values[:, channel] = np.interp(times, key_times, key_values)
+        return values
+
+
+def read_animation(filepath, fps, anim_offset=ANIM_OFFSET):
+    '''Reads the pose bone animation of a binary FBX file
+
+    Returns a dict mapping bone names to (frames, location, rotation_quaternion, scale) with
+    shapes (N,), (N, 3), (N, 4) and (N, 3), in the bone local space the importer keys them in.
+    '''
+    root, _ = parse(filepath)
+    return skeleton_animation(Skeleton(root), fps, anim_offset)
+
+
+def skeleton_animation(skeleton, fps, anim_offset=ANIM_OFFSET):
+    '''read_animation of an already parsed file'''
+    bones = {}
+    for model_id in skeleton.models:
+        if not skeleton.is_bone(model_id) or not skeleton.model_nodes.get(model_id):
+            continue
+        times = skeleton.key_times(model_id)
+        if not len(times):
+            continue
+        props = skeleton.props[model_id]
+        translation = skeleton.sample(model_id, b'Lcl Translation', times, props.get(b'Lcl Translation', (0, 0, 0))[:3])
+        rotation = skeleton.sample(model_id, b'Lcl Rotation', times, props.get(b'Lcl Rotation', (0, 0, 0))[:3])
+        scaling = skeleton.sample(model_id, b'Lcl Scaling', times, props.get(b'Lcl Scaling', (1, 1, 1))[:3])
+
+        # Remove the rest pose (in parent space) from every key
+        basis = np.linalg.inv(skeleton.bind_local(model_id)) @ local_matrices(props, translation, rotation, scaling)
+        location = basis[:, :3, 3]
+        scale = np.linalg.norm(basis[:, :3, :3], axis=1)
+        quaternion = rootmath.matrix_to_quat(basis[:, :3, :3] / scale[:, None, :])
+        # The importer keeps each key in the hemisphere of the previous one, starting from identity
+        quaternion = rootmath.quat_continuous(quaternion)
+
+        frames = times.astype(np.float64) * fps / FBX_KTIME + anim_offset
+        bones[skeleton.name(model_id)] = (frames, location, quaternion, scale)
+    return bones
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# glTF export of an armature, its meshes and its actions for the game engine, either one
+# combined file with every action as an animation, or one file per action. For per action
+# files the armature, meshes and actions are written to a base .blend once, and background
+# blender processes (blender -b -P gltfexport.py -- ...) each load it once and export their
+# share of the actions. Clips linked by dedup as copies of an action are exported again
+# under their own names, see manifest.export_names. The file names are all chosen before
+# exporting, names that clean to the same file name get a numbered suffix.
+import bpy
+import os
+import sys
+import argparse
+import logging
+import tempfile
+
+try:
+    from . import manifest, parallel
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import manifest
+    import parallel
+
+
+log = logging.getLogger(__name__)
+
+FORMATS = ('GLB', 'GLTF_SEPARATE')
+
+def animation_options(all_actions):
+    # The exporter replaced export_nla_strips with export_animation_mode in blender 3.6
+    properties = bpy.ops.export_scene.gltf.get_rna_type().properties.keys()
+    if 'export_animation_mode' in properties:
+        return {'export_animation_mode': 'NLA_TRACKS' if all_actions else 'ACTIVE_ACTIONS'}
+    return {'export_nla_strips': all_actions}
+
+def export_objects(armature):
+    # The armature and everything parented to it, e.g. the skinned meshes
+    objects = [armature]
+    for obj in objects:
+        objects.extend(obj.children)
+    return objects
+
+def select_only(objects):
+    view_layer = bpy.context.view_layer
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for obj in view_layer.objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    view_layer.objects.active = objects[0]
+
+def export_files(directory, actions, export_format='GLB'):
+    '''(name, action, path) of every per action file, no two with the same path'''
+    extension = '.glb' if export_format == 'GLB' else '.gltf'
+    files, used = [], set()
+    for name, action in manifest.export_names(actions):
+        stem = base = bpy.path.clean_name(name)
+        number = 1
+        # Compared without case, for case insensitive file systems
+        while stem.lower() in used:
+            number += 1
+            stem = "%s_%d" % (base, number)
+        if stem != base:
+            log.warning("[Mixamo Root] %s would overwrite the file of another action, exported as %s" % (name, stem + extension))
+        used.add(stem.lower())
+        files.append((name, action, os.path.join(directory, stem + extension)))
+    return files
+
+def export_combined(filepath, armature, actions, export_format='GLB'):
+    # Every action goes on its own NLA track for the export, the exporter writes each track as
+    # an animation named after it. Tracks already holding one of the actions are reused, the
+    # linked copies of an action get tracks of their own
+    animation_data = armature.animation_data or armature.animation_data_create()
+    active = animation_data.action
+    on_tracks = {strip.action for track in animation_data.nla_tracks for strip in track.strips}
+    animations = manifest.export_names(actions)
+    added = []
+    try:
+        animation_data.action = None
+        for name, action in animations:
+            if name == action.name and action in on_tracks:
+                continue
+            track = animation_data.nla_tracks.new()
+            track.name = name
+            track.strips.new(name, int(action.frame_range[0]), action)
+            added.append(track)
+        select_only(export_objects(armature))
+        bpy.ops.export_scene.gltf(filepath=filepath, export_format=export_format, use_selection=True, **animation_options(True))
+    finally:
+        for track in added:
+            animation_data.nla_tracks.remove(track)
+        animation_data.action = active
+    print("[Mixamo Root] Exported %d actions as %d animations to %s" % (len(actions), len(animations), filepath))
+    return [filepath]
+
+def export_actions(armature, files, export_format='GLB'):
+    # The (name, action, path) files of export_files from the already loaded armature and meshes, the active action is swapped between exports
+    animation_data = armature.animation_data or armature.animation_data_create()
+    active = animation_data.action
+    select_only(export_objects(armature))
+    try:
+        for name, action, path in files:
+            animation_data.action = action
+            bpy.ops.export_scene.gltf(filepath=path, export_format=export_format, use_selection=True, **animation_options(False))
+            print("[Mixamo Root] Exported %s to %s" % (name, path))
+    finally:
+        animation_data.action = active
+    return [path for _, _, path in files]
+
+def export_per_action(directory, armature, actions, export_format='GLB', workers=1):
+    os.makedirs(directory, exist_ok=True)
+    files = export_files(directory, actions, export_format)
+    if workers <= 1 or len(files) <= 1:
+        return export_actions(armature, files, export_format)
+    with tempfile.TemporaryDirectory(prefix="mixamoroot_gltf_") as work_dir:
+        base = os.path.join(work_dir, "base.blend")
+        # Objects are written with their armature, meshes, materials and images
+        bpy.data.libraries.write(base, set(export_objects(armature)) | set(actions), path_remap='ABSOLUTE', fake_user=True)
+        # Every worker gets its files with the paths chosen here
+        shards = parallel.split_files([(action.name, path) for _, action, path in files], workers)
+        print("[Mixamo Root] Exporting %d files with %d workers" % (len(files), len(shards)))
+        parallel.run_workers(os.path.abspath(__file__), [['--base', base, '--armature', armature.name, '--format', export_format,
+                                                          '--actions'] + [name for name, _ in shard] + ['--paths'] + [path for _, path in shard]
+                                                         for shard in shards],
+                             work_dir, name="gltf")
+    return [path for _, _, path in files]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='blender -b --factory-startup -P gltfexport.py --',
+                                     description='Exports actions of an armature saved in a base .blend file to the given glTF files')
+    parser.add_argument('--base', required=True, help='Path of the .blend file with the armature, its meshes and the actions')
+    parser.add_argument('--armature', required=True, help='Name of the armature object to export')
+    parser.add_argument('--format', choices=FORMATS, default='GLB')
+    parser.add_argument('--actions', nargs='+', required=True, help='Names of the actions to export')
+    parser.add_argument('--paths', nargs='+', required=True, help='File to export each action to, in the order of --actions')
+    args = parser.parse_args(argv)
+    if len(args.paths) != len(args.actions):
+        parser.error("--paths needs one file per action")
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    try:
+        bpy.ops.wm.read_homefile(use_empty=True)
+        with bpy.data.libraries.load(args.base, link=False) as (data_from, data_to):
+            data_to.objects = list(data_from.objects)
+            data_to.actions = list(set(args.actions))
+        for obj in data_to.objects:
+            bpy.context.scene.collection.objects.link(obj)
+        files = [(os.path.splitext(os.path.basename(path))[0], bpy.data.actions[name], path) for name, path in zip(args.actions, args.paths)]
+        export_actions(bpy.data.objects[args.armature], files, args.format)
+    except Exception:
+        log.exception("[Mixamo Root] ERROR glTF export from %s failed" % args.base)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[sys.argv.index('--') + 1:]))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Wall time, memory and key counts of a batch, per file and per stage. A stage costs two
+# clock and two memory readings, so recording stays on for every batch. stage() and file()
+# do nothing when no batch is being recorded, e.g. when the pipeline functions are called
+# on their own. Stages can nest, each one records its exclusive time and memory, the part
+# not spent in the stages inside it, so the stages of a file add up to at most its time.
+import csv
+import contextlib
+import functools
+import json
+import os
+import time
+from collections import OrderedDict
+
+try:
+    from . import memory
+except ImportError:
+    import memory
+
+
+# Scene property with the summary of the last batch, shown in the panel
+REPORT_PROPERTY = "mixamo_report"
+
+# Recorders of the batches in progress, the last one started records. A batch started while
+# another one waits between its steps (applying during a modal import) records on its own
+# and hands back to the other one when it stops
+_recorders = []
+
+
+def _rss():
+    value = memory.rss()
+    return 0 if value is None else value
+
+
+class Recorder:
+    '''Measurements of one batch, see start()'''
+    def __init__(self, name):
+        self.name = name
+        self.files = []
+        self.current = None
+        # [seconds, rss_delta] of the stages nested in each open stage, innermost last
+        self.open_stages = []
+        # Stages outside of any file, e.g. a worker pool or the manifest
+        self.batch_stages = OrderedDict()
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        self.start_rss = _rss()
+        self.seconds = 0.0
+        self.rss_delta = 0
+
+    @staticmethod
+    def add(stages, name, seconds, rss_delta):
+        stage = stages.setdefault(name, {'seconds': 0.0, 'rss_delta': 0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['rss_delta'] += rss_delta
+        stage['calls'] += 1
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stages = self.current['stages'] if self.current else self.batch_stages
+        nested = [0.0, 0]
+        self.open_stages.append(nested)
+        start_rss = _rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds, rss_delta = time.perf_counter() - start, _rss() - start_rss
+            self.open_stages.pop()
+            self.add(stages, name, seconds - nested[0], rss_delta - nested[1])
+            if self.open_stages:
+                self.open_stages[-1][0] += seconds
+                self.open_stages[-1][1] += rss_delta
+
+    @contextlib.contextmanager
+    def file(self, name):
+        record = {'file': name, 'seconds': 0.0, 'rss_delta': 0, 'keys': 0, 'stages': OrderedDict()}
+        self.files.append(record)
+        self.current = record
+        start_rss = _rss()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['rss_delta'] = _rss() - start_rss
+            self.current = None
+
+    def count_keys(self, action):
+        # len() of every keyframe_points collection, no key data is read
+        if self.current is not None and action is not None:
+            self.current['keys'] += sum(len(fcurve.keyframe_points) for fcurve in action.fcurves)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start_time
+        self.rss_delta = _rss() - self.start_rss
+
+    def totals(self):
+        '''Stages summed over all files and the batch, slowest first'''
+        totals = OrderedDict()
+        for stages in [self.batch_stages] + [record['stages'] for record in self.files]:
+            for name, stage in stages.items():
+                total = totals.setdefault(name, {'seconds': 0.0, 'rss_delta': 0, 'calls': 0})
+                for key in total:
+                    total[key] += stage[key]
+        return OrderedDict(sorted(totals.items(), key=lambda item: -item[1]['seconds']))
+
+    def summary(self, stage_count=5):
+        '''A few lines for the panel and the log'''
+        keys = sum(record['keys'] for record in self.files)
+        lines = ["%s: %d files in %.2fs, %d keys, memory %+.1f MB" % (
+            self.name, len(self.files), self.seconds, keys, self.rss_delta / memory.MB)]
+        for name, total in list(self.totals().items())[:stage_count]:
+            lines.append("%s: %.2fs (%d calls) %+.1f MB" % (name, total['seconds'], total['calls'], total['rss_delta'] / memory.MB))
+        return lines
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': self.seconds,
+            'rss_delta': self.rss_delta,
+            'peak_rss': memory.peak_rss(),
+            'totals': self.totals(),
+            'batch_stages': self.batch_stages,
+            'files': self.files,
+        }
+
+    def write(self, path_base):
+        '''Writes path_base.json with everything and path_base.csv with one row per file and stage'''
+        with open(path_base + '.json', 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        with open(path_base + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['file', 'stage', 'seconds', 'rss_delta_mb', 'calls', 'keys'])
+            for name, stage in self.batch_stages.items():
+                writer.writerow(['', name, '%.6f' % stage['seconds'], '%.3f' % (stage['rss_delta'] / memory.MB), stage['calls'], ''])
+            for record in self.files:
+                writer.writerow([record['file'], '', '%.6f' % record['seconds'], '%.3f' % (record['rss_delta'] / memory.MB), 1, record['keys']])
+                for name, stage in record['stages'].items():
+                    writer.writerow([record['file'], name, '%.6f' % stage['seconds'], '%.3f' % (stage['rss_delta'] / memory.MB), stage['calls'], ''])
+        return path_base + '.json', path_base + '.csv'
+
+
+def start(name):
+    '''Starts recording a batch, stage() and file() record into it until it stops'''
+    recorder = Recorder(name)
+    _recorders.append(recorder)
+    return recorder
+
+
+def stop(recorder=None):
+    '''Stops recording a batch, the last one started by default, the batch before it records again'''
+    if recorder is None:
+        recorder = _recorders[-1] if _recorders else None
+    if recorder in _recorders:
+        _recorders.remove(recorder)
+    if recorder:
+        recorder.finish()
+    return recorder
+
+
+def active():
+    return _recorders[-1] if _recorders else None
+
+
+def stage(name):
+    recorder = active()
+    return recorder.stage(name) if recorder else contextlib.nullcontext()
+
+
+def file(name):
+    recorder = active()
+    return recorder.file(name) if recorder else contextlib.nullcontext()
+
+
+def timed(name=None):
+    '''Decorator recording every call of a function as a stage, named after the function by default'''
+    def decorator(function):
+        stage_name = name or function.__name__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = active()
+            if recorder is None:
+                return function(*args, **kwargs)
+            with recorder.stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_keys(action):
+    recorder = active()
+    if recorder:
+        recorder.count_keys(action)
+
+
+def report_path(source_dir, name):
+    '''Path base of a report next to source_dir, e.g. /clips/walks -> /clips/walks_import_report'''
+    source_dir = os.path.normpath(source_dir)
+    return os.path.join(os.path.dirname(source_dir), "%s_%s_report" % (os.path.basename(source_dir), name))
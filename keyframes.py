@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Bulk fcurve keyframe access. Everything here goes through foreach_get/foreach_set
+# on the keyframe_points collection, so a whole curve is moved in one call instead of
+# one python round trip per key. Blender stores keyframe coordinates as float32, using
+# the same dtype here lets foreach_get/foreach_set copy the buffer directly.
+import numpy as np
+
+
+# Index of 'LINEAR' in the keyframe interpolation enum, as foreach_get/foreach_set use it
+INTERPOLATION_LINEAR = 1
+
+
+def read_keyframes(fcurve):
+    '''Returns the keyframes of an fcurve as an (N, 2) float32 array of (frame, value)'''
+    points = fcurve.keyframe_points
+    co = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get('co', co)
+    return co.reshape(-1, 2)
+
+
+def read_handles(fcurve):
+    '''Returns the left and right bezier handles of an fcurve as two (N, 2) float32 arrays'''
+    points = fcurve.keyframe_points
+    left = np.empty(len(points) * 2, dtype=np.float32)
+    right = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get('handle_left', left)
+    points.foreach_get('handle_right', right)
+    return left.reshape(-1, 2), right.reshape(-1, 2)
+
+
+def resize_keyframes(fcurve, count):
+    '''Grows or shrinks the keyframe_points of an fcurve to exactly count points'''
+    points = fcurve.keyframe_points
+    current = len(points)
+    if count > current:
+        # New points get the same defaults as keyframe_points.insert (bezier, auto clamped)
+        points.add(count - current)
+    else:
+        for _ in range(current - count):
+            points.remove(points[-1], fast=True)
+
+
+def write_keyframes(fcurve, co, interpolation=None):
+    '''Replaces all keyframes of an fcurve with the (N, 2) array of (frame, value) in co
+
+    Keys that already exist keep their interpolation and handle types, only their
+    coordinates change, which is what keyframe_points.insert does for an existing frame.
+    interpolation, an enum index as read by read_curve, is set on every key when given.
+    '''
+    co = np.ascontiguousarray(co, dtype=np.float32).reshape(-1, 2)
+    resize_keyframes(fcurve, len(co))
+    fcurve.keyframe_points.foreach_set('co', co.ravel())
+    if interpolation is not None:
+        fcurve.keyframe_points.foreach_set('interpolation', np.full(len(co), interpolation, dtype=np.int32))
+    # Sorts the keys and recalculates the auto handles, same as insert does per key
+    fcurve.update()
+
+
+def write_values(fcurve, values):
+    '''Replaces only the values of the existing keyframes of an fcurve'''
+    co = read_keyframes(fcurve)
+    co[:, 1] = values
+    fcurve.keyframe_points.foreach_set('co', co.ravel())
+    fcurve.update()
+
+
+def scale_values(fcurve, factor, pivot=0.0):
+    '''Scales the keyframe values and bezier handles of an fcurve around pivot
+
+    Same result as a graph editor resize on the value axis with the 2D cursor as pivot.
+    '''
+    points = fcurve.keyframe_points
+    co = read_keyframes(fcurve)
+    left, right = read_handles(fcurve)
+    for array in (co, left, right):
+        array[:, 1] = pivot + (array[:, 1] - pivot) * factor
+    points.foreach_set('co', co.ravel())
+    points.foreach_set('handle_left', left.ravel())
+    points.foreach_set('handle_right', right.ravel())
+    fcurve.update()
+
+
+# Everything needed to rebuild a keyframe exactly, with the buffer dtype and values per key.
+# Enum properties go through foreach_get/foreach_set as their integer index.
+KEY_ATTRIBUTES = (
+    ('co', np.float32, 2),
+    ('handle_left', np.float32, 2),
+    ('handle_right', np.float32, 2),
+    ('interpolation', np.int32, 1),
+    ('handle_left_type', np.int32, 1),
+    ('handle_right_type', np.int32, 1),
+)
+
+
+def read_curve(fcurve):
+    '''Returns the keyframes of an fcurve as a dict of arrays, one entry per KEY_ATTRIBUTES'''
+    points = fcurve.keyframe_points
+    curve = {}
+    for name, dtype, size in KEY_ATTRIBUTES:
+        buffer = np.empty(len(points) * size, dtype=dtype)
+        points.foreach_get(name, buffer)
+        curve[name] = buffer.reshape(-1, size) if size > 1 else buffer
+    return curve
+
+
+def write_curve(fcurve, curve):
+    '''Replaces all keyframes of an fcurve with the arrays returned by read_curve'''
+    resize_keyframes(fcurve, len(curve['co']))
+    points = fcurve.keyframe_points
+    for name, dtype, size in KEY_ATTRIBUTES:
+        points.foreach_set(name, np.ascontiguousarray(curve[name], dtype=dtype).ravel())
+    fcurve.update()
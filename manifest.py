@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Manifest of the files imported into a .blend, used to only import new or modified files.
+# The manifest is stored as a JSON string custom property on the scene, so it is saved with
+# the file, and maps the normalized path of every imported file to its size, modification
+# time, the options it was processed with and the name of the action it produced. With dedup
+# it also keeps the fingerprints of the file, and files skipped as a copy of another get an
+# entry without an action that names the file they copy.
+import os
+import json
+
+
+MANIFEST_PROPERTY = "mixamo_manifest"
+
+def load(scene):
+    return json.loads(scene.get(MANIFEST_PROPERTY, "{}"))
+
+def save(scene, entries):
+    scene[MANIFEST_PROPERTY] = json.dumps(entries, sort_keys=True)
+
+def key(source_dir, file):
+    return os.path.normpath(os.path.join(source_dir, file))
+
+def entry(filepath, options, action_name=None, fingerprint=None, duplicate_of=None):
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'options': options, 'action': action_name,
+            'fingerprint': fingerprint, 'duplicate_of': duplicate_of}
+
+def add_duplicates(entries, source_dir, options, duplicates, fingerprints):
+    '''Entries of the files dedup skipped, duplicates maps them to (file they copy, kind)'''
+    for file, (original, _) in duplicates.items():
+        entries[key(source_dir, file)] = entry(os.path.join(source_dir, file), options, None, fingerprints.get(file), key(source_dir, original))
+
+def in_directory(path, directory):
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Another drive, or a relative and an absolute path
+        return False
+
+def is_current(file_entry, filepath, options):
+    stat = os.stat(filepath)
+    return file_entry['size'] == stat.st_size and file_entry['mtime'] == stat.st_mtime and file_entry['options'] == options
+
+def plan(source_dir, files, entries, options):
+    '''Sorts files into new, changed and unchanged, and finds manifest entries whose file is gone
+
+    Returns (new, changed, unchanged, removed), the first three are lists of file names
+    from files, removed is a list of manifest keys in source_dir or below whose file no longer exists.
+    '''
+    new, changed, unchanged = [], [], []
+    for file in files:
+        file_entry = entries.get(key(source_dir, file))
+        if file_entry is None:
+            new.append(file)
+        elif is_current(file_entry, os.path.join(source_dir, file), options):
+            unchanged.append(file)
+        else:
+            changed.append(file)
+    present = {key(source_dir, file) for file in files}
+    directory = os.path.normpath(source_dir)
+    # Entries in subdirectories count too, a recursive import lists their files as well
+    removed = [path for path in entries
+               if in_directory(path, directory) and path not in present and not os.path.exists(path)]
+    # A skipped copy is checked again once the file it copies changed or is gone
+    stale = {key(source_dir, file) for file in changed} | set(removed)
+    for file in list(unchanged):
+        original = entries[key(source_dir, file)].get('duplicate_of')
+        if original and (original in stale or original not in entries):
+            unchanged.remove(file)
+            changed.append(file)
+    return new, changed, unchanged, removed
+
+# Every imported action keeps the file it came from, so its name can be found after blender
+# renamed it, e.g. when the actions of worker processes are appended into one file
+SOURCE_PROPERTY = "mixamo_source"
+
+def tag_source(action, file):
+    action[SOURCE_PROPERTY] = file
+
+def source_actions(actions):
+    '''Maps the source file of every tagged action to the action's name'''
+    return {action[SOURCE_PROPERTY]: action.name for action in actions if SOURCE_PROPERTY in action}
+
+# Files linked as copies of an action's file are not imported, the action stands for them
+# and the exporters write it once more under the name each of them would have had
+DUPLICATES_PROPERTY = "mixamo_duplicates"
+
+def link_duplicates(action, files):
+    action[DUPLICATES_PROPERTY] = json.dumps(json.loads(action.get(DUPLICATES_PROPERTY, "[]")) + list(files))
+
+def duplicate_names(action):
+    '''Names the files linked to an action would have given their actions'''
+    return [os.path.splitext(os.path.basename(file))[0] for file in json.loads(action.get(DUPLICATES_PROPERTY, "[]"))]
+
+def export_names(actions):
+    '''(name, action) of every animation to export: each action, then the copies linked to it'''
+    return [(name, action) for action in actions for name in [action.name] + duplicate_names(action)]
+
+# Files of an import that was cancelled or interrupted, so it can be resumed later
+PENDING_PROPERTY = "mixamo_pending"
+
+def save_pending(scene, source_dir, files):
+    scene[PENDING_PROPERTY] = json.dumps({'source_dir': source_dir, 'files': list(files)})
+
+def load_pending(scene):
+    '''Returns (source_dir, files) of the unfinished import, or None'''
+    pending = json.loads(scene.get(PENDING_PROPERTY, "null"))
+    if not pending or not pending['files']:
+        return None
+    return pending['source_dir'], pending['files']
+
+def clear_pending(scene):
+    if PENDING_PROPERTY in scene:
+        del scene[PENDING_PROPERTY]
@@ -22,17 +22,59 @@
 # Bone Renaming Modifications, File Handling, And Addon By: Richard Perry
 import bpy
 import os
+import sys
+import argparse
+import functools
 import logging
 from pathlib import Path
 from mathutils import Quaternion
-import math
 import numpy as np
 
+try:
+    from . import bulk, cache, clipstore, dedup, fbxanim, gltfexport, instrument, keyframes, manifest, memory, parallel, prescan, reduce, resample, retarget, rigcontext, rootmath, sidecar
+except ImportError:
+    # Running as a script (blender -b -P mixamoroot.py), the sibling modules sit next to this file
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import bulk
+    import cache
+    import clipstore
+    import dedup
+    import fbxanim
+    import gltfexport
+    import instrument
+    import keyframes
+    import manifest
+    import memory
+    import parallel
+    import prescan
+    import reduce
+    import resample
+    import retarget
+    import rigcontext
+    import rootmath
+    import sidecar
+
 
 log = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=None)
+def prefix_mapping(names, name_prefix):
+    # Renames that remove name_prefix, built once per rig layout (a tuple of its bone names)
+    return {name: name.replace(name_prefix, "") for name in names if name_prefix in name}
+
+def rename_fcurves(actions, mapping):
+    # Applies bone renames to the pose bone data paths of the given actions only
+    paths = {'pose.bones["%s"]' % old: 'pose.bones["%s"]' % new for old, new in mapping.items()}
+    for action in actions:
+        for fcurve in action.fcurves:
+            bone_path, end, rest = fcurve.data_path.partition('"]')
+            new_path = paths.get(bone_path + end)
+            if new_path:
+                fcurve.data_path = new_path + rest
+
 # in future remove_prefix should be renamed to rename prefix and a target prefix should be specifiable via ui
-def fixBones(remove_prefix=False, name_prefix="mixamorig:"):
+@instrument.timed()
+def fixBones(remove_prefix=False, name_prefix="mixamorig:", actions=None):
     bpy.ops.object.mode_set(mode = 'OBJECT')
         
     if not bpy.ops.object:
@@ -42,181 +84,108 @@ def fixBones(remove_prefix=False, name_prefix="mixamorig:"):
     bpy.context.object.show_in_front = True
 
     if remove_prefix:
+        # Only the action(s) just imported need renaming, earlier ones were renamed on their own import
+        if actions is None:
+            animation_data = bpy.context.object.animation_data
+            actions = [animation_data.action] if animation_data and animation_data.action else []
         for rig in bpy.context.selected_objects:
             if rig.type == 'ARMATURE':
+                mapping = prefix_mapping(tuple(bone.name for bone in rig.pose.bones), name_prefix)
+                for bone in rig.pose.bones:
+                    if bone.name in mapping:
+                        bone.name = mapping[bone.name]
+                # Renaming a bone renames the matching vertex groups too, this catches any left over
                 for mesh in rig.children:
                     for vg in mesh.vertex_groups:
-                        new_name = vg.name
-                        new_name = new_name.replace(name_prefix,"")
-                        rig.pose.bones[vg.name].name = new_name
-                        vg.name = new_name
-                for bone in rig.pose.bones:
-                    bone.name = bone.name.replace(name_prefix,"")
-        for action in bpy.data.actions:
-            fc = action.fcurves
-            for f in fc:
-                f.data_path = f.data_path.replace(name_prefix,"")
+                        if vg.name in mapping:
+                            vg.name = mapping[vg.name]
+                rename_fcurves(actions, mapping)
         
-def scaleAll():
-    bpy.ops.object.mode_set(mode='OBJECT')
+def scale_locations(action, factor=0.01, axes=(0, 1, 2)):
+    # Scales the location fcurves of an action directly, no graph editor or area needed
+    for curve in action.fcurves:
+        if curve.data_path.endswith('location') and curve.array_index in axes:
+            keyframes.scale_values(curve, factor)
 
-    prev_context=bpy.context.area.type
-        
-    bpy.ops.object.mode_set(mode='POSE')
-    bpy.ops.pose.select_all(action='SELECT')
-    bpy.context.area.type = 'GRAPH_EDITOR'
-    bpy.context.space_data.dopesheet.filter_text = "Location"
-    bpy.context.space_data.pivot_point = 'CURSOR'
-    bpy.context.space_data.dopesheet.use_filter_invert = False
-        
-    bpy.ops.anim.channels_select_all(action='SELECT')   
-        
-    bpy.ops.transform.resize(value=(1, 0.01, 1), orient_type='GLOBAL',
-    orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
-    orient_matrix_type='GLOBAL',
-    constraint_axis=(False, True, False),
-    mirror=True, use_proportional_edit=False,
-    proportional_edit_falloff='SMOOTH',
-    proportional_size=1,
-    use_proportional_connected=False,
-    use_proportional_projected=False)
+@instrument.timed()
+def scaleAll(factor=0.01, axes=(0, 1, 2)):
+    armature = bpy.context.object
+    if armature.animation_data and armature.animation_data.action:
+        scale_locations(armature.animation_data.action, factor, axes)
 
 
 def euler_to_quat(*angles):
-    import math
-    half_angles = [a/2 for a in angles]
-    c1, s1 = math.cos(half_angles[0]), math.sin(half_angles[0])
-    c2, s2 = math.cos(half_angles[1]), math.sin(half_angles[1])
-    c3, s3 = math.cos(half_angles[2]), math.sin(half_angles[2])
-    w = c1 * c2 * c3 - s1 * s2 * s3
-    x = c1 * s2 * c3 + s1 * c2 * s3
-    y = c1 * c2 * s3 - s1 * s2 * c3
-    z = s1 * c2 * c3 + c1 * s2 * s3
-    return Quaternion((w, x, y, z))
+    return Quaternion(rootmath.euler_to_quat(angles))
 
 
 def decompose_quaternion(q):
     q.normalize()
-    w = np.sqrt(1 + q[0]) / np.sqrt(2)
-    x = q[1] / (np.sqrt(2) * w)
-    y = q[2] / (np.sqrt(2) * w)
-    z = q[3] / (np.sqrt(2) * w)
-    return Quaternion(np.array([w, x, y, z])).normalized()
+    return Quaternion(rootmath.decompose_quaternion(q))
 
+@instrument.timed()
 def copyHips(root_bone_name="Root", hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:"):
     bpy.ops.object.mode_set(mode = 'POSE')
-    bpy.context.area.ui_type = 'FCURVES'
-    #SELECT OUR ROOT MOTION BONE 
-    bpy.ops.pose.select_all(action='DESELECT')
-    print(name_prefix, '!')
-    bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-    # SET FRAME TO ZERO
-    bpy.ops.graph.cursor_set(frame=0.0, value=0.0)
-    #ADD NEW KEYFRAME
-    bpy.ops.anim.keyframe_insert_menu(type='Location')
-    #SELECT ONLY HIPS AND LOCTAIUON GRAPH DATA
-    bpy.ops.pose.select_all(action='DESELECT')
-    bpy.context.object.pose.bones[hip_bone_name].bone.select = True        
-    bpy.context.area.ui_type = 'DOPESHEET'
-    bpy.context.space_data.dopesheet.filter_text = "Location"
-    bpy.context.area.ui_type = 'FCURVES'
-    #COPY THE LOCATION VALUES OF THE HIPS AND DELETE THEM         
-    #bpy.ops.graph.copy()
-    bpy.ops.graph.select_all(action='DESELECT')
-    
-    myFcurves = bpy.context.object.animation_data.action.fcurves
-    hip_bone_fcurve = f'pose.bones["{hip_bone_name}"].location'
-    root_bone_fcurve = f'pose.bones["{name_prefix}{root_bone_name}"].location'
+    # SET FRAME TO ZERO, setting it re-evaluates every animated object even when it already is
+    if bpy.context.scene.frame_current != 0:
+        bpy.context.scene.frame_current = 0
+
+    # Paths and hip rest rotation are looked up once per armature, fcurves once per action
+    armature = bpy.context.object
+    rig = rigcontext.rig_context(armature, hip_bone_name, name_prefix + root_bone_name)
+    curves = rigcontext.FCurveIndex(armature.animation_data.action)
+
+    # Add the root bone location tracks, keyframe_insert_menu used to create these, and clear them out
+    root_location = [curves.ensure(rig.root_location, index, rig.root_bone_name) for index in range(3)]
+    for curve in root_location:
+        keyframes.resize_keyframes(curve, 0)
 
-    bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-    
-    # Clear out root bone fcurve
-    for curve in myFcurves:
-        if str(curve.data_path) == root_bone_fcurve:
-            for key in curve.keyframe_points:
-                curve.keyframe_points.remove(key)
-    
     # copy x and z keyframes to root bone
-    for curve in myFcurves:
-        if str(curve.data_path) == hip_bone_fcurve and curve.array_index in [0, 2]:  # x and z hip locations
-            for root_curve in myFcurves:
-                if str(root_curve.data_path) == root_bone_fcurve and root_curve.array_index == curve.array_index:
-                    for key in curve.keyframe_points:
-                        root_curve.keyframe_points.insert(frame=key.co[0], value=key.co[1] * 100)
-     
-    # Remove xz tracks from hip bone
-    for curve in myFcurves:
-        if str(curve.data_path)==hip_bone_fcurve:
-            if curve.array_index != 1:  # Keep y
-                myFcurves.remove(curve)
+    for index in (0, 2):  # x and z hip locations
+        curve = curves.get(rig.hip_location, index)
+        if curve is not None:
+            co = keyframes.read_keyframes(curve)
+            co[:, 1] *= 100
+            keyframes.write_keyframes(root_location[index], co)
 
-    # Get the fcurves for the root bone's location
-    fcurves = [fcurve for fcurve in myFcurves if fcurve.data_path == 'pose.bones["{}"].location'.format(name_prefix + root_bone_name) and fcurve.array_index in range(3)]
+    # Remove xz tracks from hip bone
+    for curve in curves.find_all(rig.hip_location, 3):
+        if curve.array_index != 1:  # Keep y
+            curves.remove(curve)
 
     # Set the minimum Y value of the root bone to 0
-    z_fcurve = fcurves[1]
-    for keyframe in z_fcurve.keyframe_points:
-        if keyframe.co.y < 0:
-            keyframe.co.y = 0
-    
+    values = keyframes.read_keyframes(root_location[1])[:, 1]
+    if (values < 0).any():
+        keyframes.write_values(root_location[1], np.maximum(values, 0))
+
     # Looks like we're eliminating floating hips ?
-    hips_fcurves = [hips_fcurve for hips_fcurve in myFcurves if hips_fcurve.data_path == 'pose.bones["{}"].location'.format(hip_bone_name) and hips_fcurve.array_index in range(3)]
-    for keyframe in hips_fcurves[0].keyframe_points:
-        if keyframe.co.y > 0:
-            keyframe.co.y = 0
-            #keyframe.co.y = keyframe.co.y / 2
-    
-    # Get quaternion keyframes
-    hip_quats = {}
-    for curve in myFcurves:
-        hip_bone_fcurve = f'pose.bones["{hip_bone_name}"].rotation_quaternion'
-        if str(curve.data_path)==hip_bone_fcurve:
-            for key in curve.keyframe_points:
-                frame, quat_component = key.co
-                if int(round(frame)) not in hip_quats:  # convert float to int
-                    hip_quats[int(round(frame))] = [0] * 4
-                hip_quats[int(round(frame))][curve.array_index] = quat_component
-    hip_quats = {f: Quaternion(q) for f, q in hip_quats.items()}
-
-    ## Local hip rotation in local frame
-    hip_rot = bpy.context.object.pose.bones[hip_bone_name].bone.matrix_local.to_quaternion()
-
-    ## Convert keyframes to root bone frame
-    ## hip_local @ hip_rot = hip_root_frame
-    hip_quats = {f: q @ hip_rot for f, q in hip_quats.items()}
-    
-    ## Pull out y-axis component of rotation for root bone
-    root_quats = {f: Quaternion((q.w, 0, q.y, 0)).normalized() for f, q in hip_quats.items()}
-    for f in root_quats:
-        root_quats[f].normalize()
-    
-    ## Subtract rotation from root bone from first frame, so root pone still points forward on clips
-    ## where the hips are angled (e.g. strafe).  Leave this component on the hips
-    first_frame = min(hip_quats.keys())
-    hip_y_rot = root_quats[first_frame]
-    for f, q in root_quats.items():
-        root_quats[f] = hip_y_rot.inverted() @ root_quats[f]
-    
-    # hip_quat_root_frame = root_quat (Y) @ remainder (XZ)
-    remainder = {f: root_quats[f].inverted() @ q for f, q in hip_quats.items()}
-   
-    # convert back to hip frame 
-    remainder = {f: q @ hip_rot.inverted() for f, q in remainder.items()}
+    hips_y = curves.get(rig.hip_location, 1)
+    if hips_y is not None:
+        values = keyframes.read_keyframes(hips_y)[:, 1]
+        if (values > 0).any():
+            keyframes.write_values(hips_y, np.minimum(values, 0))
+
+    # Get quaternion keyframes, one (w, x, y, z) row per whole frame
+    hip_rot_curves = curves.find_all(rig.hip_rotation, 4)
+    hip_keys = [keyframes.read_keyframes(curve) for curve in hip_rot_curves]
+    key_frames = [np.rint(co[:, 0]) for co in hip_keys]  # convert float to int
+    frames = np.unique(np.concatenate(key_frames)) if key_frames else np.empty(0)
+    hip_quats = np.zeros((len(frames), 4))
+    for curve, co, rounded in zip(hip_rot_curves, hip_keys, key_frames):
+        hip_quats[np.searchsorted(frames, rounded), curve.array_index] = co[:, 1]
+
+    ## Split the hips into a root yaw track and the remaining hip rotation, around the hip rest rotation
+    root_track, hip_track = rootmath.split_root_rotation(hip_quats, rig.hip_rest)
 
     # add rot tracks to root and set keyframes
     for x in range(4):
-        curve = myFcurves.new(data_path=f'pose.bones["{name_prefix}{root_bone_name}"].rotation_quaternion', index=x, action_group=name_prefix + root_bone_name)
-        for f, k in root_quats.items():
-            curve.keyframe_points.insert(frame=f, value=k[x])
-  
+        curve = curves.ensure(rig.root_rotation, x, rig.root_bone_name)
+        keyframes.write_keyframes(curve, np.column_stack((frames, root_track[:, x])))
+
     # set hips keyframes
-    for curve in myFcurves:
-        if str(curve.data_path) != f'pose.bones["{hip_bone_name}"].rotation_quaternion':
-            continue
-        for f, k in remainder.items():
-            curve.keyframe_points.insert(frame=f, value=k[curve.array_index])
-  
-  
+    for curve in hip_rot_curves:
+        keyframes.write_keyframes(curve, np.column_stack((frames, hip_track[:, curve.array_index])))
+
+
 def fix_bones_nla(remove_prefix=False, name_prefix="mixamorig:"):
     bpy.ops.object.mode_set(mode = 'OBJECT')
         
@@ -226,136 +195,116 @@ def fix_bones_nla(remove_prefix=False, name_prefix="mixamorig:"):
     bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
     bpy.context.object.show_in_front = True
 
-def scale_all_nla(armature):
-    bpy.ops.object.mode_set(mode='OBJECT')
+def scale_all_nla(armature, factor=0.01, axes=(0, 1, 2)):
+    # Strips can share an action, only scale each one once
+    actions = {strip.action for track in armature.animation_data.nla_tracks for strip in track.strips if strip.action}
+    for action in actions:
+        scale_locations(action, factor, axes)
 
-    # prev_context=bpy.context.area.type
+@instrument.timed()
+def reduce_action(action, location_tolerance=0.001, rotation_tolerance=0.001):
+    # Removes the keys of every property that linear interpolation between the remaining
+    # keys rebuilds within the tolerance, the kept keys are set to LINEAR
+    properties = {}
+    for fcurve in action.fcurves:
+        properties.setdefault(fcurve.data_path, []).append(fcurve)
+    before = after = 0
+    for data_path, fcurves in properties.items():
+        tolerance = rotation_tolerance if data_path.rpartition('.')[2].startswith('rotation') else location_tolerance
+        curves = [keyframes.read_keyframes(fcurve) for fcurve in fcurves]
+        frames = curves[0][:, 0]
+        # The channels of a property keyed on the same frames keep their keys together
+        if all(len(co) == len(frames) and np.array_equal(co[:, 0], frames) for co in curves):
+            keep = reduce.reduce_keys(frames, np.column_stack([co[:, 1] for co in curves]), tolerance)
+            masks = [keep] * len(curves)
+        else:
+            masks = [reduce.reduce_keys(co[:, 0], co[:, 1], tolerance) for co in curves]
+        for fcurve, co, keep in zip(fcurves, curves, masks):
+            keyframes.write_keyframes(fcurve, co[keep], interpolation=keyframes.INTERPOLATION_LINEAR)
+            before += len(co)
+            after += int(np.count_nonzero(keep))
+    print("[Mixamo Root] Reduced %s from %d to %d keys (%.1f%%)" % (action.name, before, after, 100.0 * after / before if before else 100.0))
+    return before, after
 
-    for track in [x for x in armature.animation_data.nla_tracks]:
-        bpy.context.active_nla_track = track
-        for strip in track.strips:
-            bpy.context.active_nla_strip = strip
-            print(bpy.context.active_nla_strip)
+@instrument.timed()
+def resample_action(action, target_fps, source_fps=None):
+    # Rekeys every fcurve with more than one key on whole frames of target_fps, quaternion
+    # rotations with slerp and made continuous, everything else linearly. The tracks of all
+    # bones sharing their key frames are resampled together, the new keys are set to LINEAR
+    if source_fps is None:
+        render = bpy.context.scene.render
+        source_fps = render.fps / render.fps_base
+    properties = {}
+    for fcurve in action.fcurves:
+        properties.setdefault(fcurve.data_path, []).append(fcurve)
+    curves = {fcurve: keyframes.read_keyframes(fcurve) for fcurve in action.fcurves}
+    curves = {fcurve: co for fcurve, co in curves.items() if len(co) > 1}
+    if not curves:
+        return 0
+    start = min(co[0, 0] for co in curves.values())
+    end = max(co[-1, 0] for co in curves.values())
+    new_frames, sample_frames = resample.frame_grid(start, end, source_fps, target_fps)
 
-        
-    bpy.ops.object.mode_set(mode='POSE')
-    bpy.ops.pose.select_all(action='SELECT')
-    bpy.context.area.type = 'GRAPH_EDITOR'
-    bpy.context.space_data.dopesheet.filter_text = "Location"
-    bpy.context.space_data.pivot_point = 'CURSOR'
-    bpy.context.space_data.dopesheet.use_filter_invert = False
-    
-    bpy.ops.anim.channels_select_all(action='SELECT')   
-        
-    bpy.ops.transform.resize(value=(1, 0.01, 1), orient_type='GLOBAL',
-    orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
-    orient_matrix_type='GLOBAL',
-    constraint_axis=(False, True, False),
-    mirror=True, use_proportional_edit=False,
-    proportional_edit_falloff='SMOOTH',
-    proportional_size=1,
-    use_proportional_connected=False,
-    use_proportional_projected=False)
+    # Batches of tracks keyed on the same frames: frames bytes -> (frames, [(fcurves, values)])
+    quaternion_batches, value_batches = {}, {}
+    for data_path, fcurves in properties.items():
+        fcurves = sorted((fcurve for fcurve in fcurves if fcurve in curves), key=lambda fcurve: fcurve.array_index)
+        frames = curves[fcurves[0]][:, 0] if fcurves else None
+        if data_path.endswith('rotation_quaternion') and len(fcurves) == 4 and all(np.array_equal(curves[fcurve][:, 0], frames) for fcurve in fcurves):
+            batch = quaternion_batches.setdefault(frames.tobytes(), (frames, []))
+            batch[1].append((fcurves, np.column_stack([curves[fcurve][:, 1] for fcurve in fcurves])))
+        else:
+            for fcurve in fcurves:
+                co = curves[fcurve]
+                batch = value_batches.setdefault(co[:, 0].tobytes(), (co[:, 0], []))
+                batch[1].append(([fcurve], co[:, 1]))
 
+    for frames, tracks in quaternion_batches.values():
+        quats = resample.slerp_tracks(frames, np.stack([values for _, values in tracks]), sample_frames)
+        for (fcurves, _), track in zip(tracks, quats):
+            for index, fcurve in enumerate(fcurves):
+                keyframes.write_keyframes(fcurve, np.column_stack((new_frames, track[:, index])), interpolation=keyframes.INTERPOLATION_LINEAR)
+    for frames, tracks in value_batches.values():
+        values = resample.lerp_tracks(frames, np.stack([values for _, values in tracks]), sample_frames)
+        for (fcurves, _), track in zip(tracks, values):
+            keyframes.write_keyframes(fcurves[0], np.column_stack((new_frames, track)), interpolation=keyframes.INTERPOLATION_LINEAR)
+    print("[Mixamo Root] Resampled %s from %g to %g fps, %d frames" % (action.name, source_fps, target_fps, len(new_frames)))
+    return len(new_frames)
+
+def move_hip_location(action, hip_bone_name, root_bone_name):
+    # Moves the hip location fcurves of an action onto the root bone, keys and handles in bulk
+    curves = rigcontext.FCurveIndex(action)
+    hip_path = rigcontext.bone_path(hip_bone_name, 'location')
+    root_path = rigcontext.bone_path(root_bone_name, 'location')
+    hip_curves = curves.find_all(hip_path, 3)
+    for hip_curve in hip_curves:
+        index = hip_curve.array_index
+        root_curve = curves.ensure(root_path, index, root_bone_name)
+        curve = keyframes.read_curve(hip_curve)
+        # set z of root to min 0 (not negative)
+        if index == 2:
+            curve['co'][:, 1] = np.maximum(curve['co'][:, 1], 0)
+        keyframes.write_curve(root_curve, curve)
+        curves.remove(hip_curve)
+    return len(hip_curves)
+
+@instrument.timed()
 def copy_hips_nla(root_bone_name="Root", hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:"):
     hip_bone_name="Ctrl_Hips"
-    bpy.ops.object.mode_set(mode='POSE')
-    previous_context = bpy.context.area.ui_type
-    bpy.ops.pose.select_all(action='DESELECT')
-    while False:
-        #SELECT OUR ROOT MOTION BONE 
-        # bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-
-        # bpy.ops.nla.tweakmode_enter()
-        # bpy.context.area.ui_type = 'FCURVES'
-        
-        # # SET FRAME TO ZERO
-        # bpy.ops.graph.cursor_set(frame=0.0, value=0.0)
-        # #ADD NEW KEYFRAME
-        # bpy.ops.anim.keyframe_insert_menu(type='Location')
-        # #SELECT ONLY HIPS AND LOCTAIUON GRAPH DATA
-        # bpy.ops.pose.select_all(action='DESELECT')
-        # bpy.context.object.pose.bones[hip_bone_name].bone.select = True        
-        # bpy.context.area.ui_type = 'DOPESHEET'
-        # bpy.context.space_data.dopesheet.filter_text = "Location"
-        # bpy.context.area.ui_type = 'FCURVES'
-        # #COPY THE LOCATION VALUES OF THE HIPS AND DELETE THEM         
-        # bpy.ops.graph.copy()
-        # bpy.ops.graph.select_all(action='DESELECT')
-            
-        # myFcurves = bpy.context.object.animation_data.action.fcurves
-                
-        # for i in myFcurves:
-        #     hip_bone_fcurve = 'pose.bones["'+hip_bone_name+'"].location'
-        #     if str(i.data_path)==hip_bone_fcurve:
-        #         myFcurves.remove(i)
-                    
-        # bpy.ops.pose.select_all(action='DESELECT')
-        # bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-        # bpy.ops.graph.paste()
-
-        # for animation data in object
-        # for 
-        pass
-
-    for track in bpy.context.object.animation_data.nla_tracks:
-        bpy.context.object.animation_data.nla_tracks.active = track
+    armature = bpy.context.object
+    processed = set()
+    for track in armature.animation_data.nla_tracks:
         for strip in track.strips:
-            bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-            bpy.context.area.ui_type = 'NLA_EDITOR'
-            bpy.ops.nla.tweakmode_enter()
-            bpy.context.area.ui_type = 'FCURVES'
-            hip_curves = [fc for fc in strip.fcurves if hip_bone_name in fc.data_path and fc.data_path.startswith('location')]
-            
-            # Copy Hips to root
-            ## Insert keyframe for root bone
-            start_frame = strip.action.frame_range[0]
-            # frame sets the x axis cursor (determines the frame, and value the y axis cursor, which is the amplitude of the curve)
-            bpy.ops.graph.cursor_set(frame=start_frame, value=0.0)
-            bpy.ops.anim.keyframe_insert_menu(type='Location')
-            bpy.ops.pose.select_all(action='DESELECT')
-
-            ## Copy Location fcruves
-            bpy.context.object.pose.bones[hip_bone_name].bone.select = True        
-            bpy.context.area.ui_type = 'DOPESHEET'
-            bpy.context.space_data.dopesheet.filter_text = "Location"
-            bpy.context.area.ui_type = 'FCURVES'
-            bpy.ops.graph.copy()
-            bpy.ops.graph.select_all(action='DESELECT')
-
-            ## We want to delete the hips locations
-            allFcurves = strip.fcurves
-            for fc in hip_curves:
-                allFcurves.remove(fc)
-
-            ## Paste location fcurves to the root bone
-            bpy.ops.pose.select_all(action='DESELECT')
-            bpy.context.object.pose.bones[name_prefix + root_bone_name].bone.select = True
-            bpy.ops.graph.paste()
-
-
-            loc_fcurves = [fc for fc in strip.fcurves if root_bone_name in fc.data_path and fc.data_path.startswith('location')]
-            
-            # Update Root Bone
-            # set z of root to min 0 (not negative).
-            for fc in loc_fcurves:
-                # Z axis location curve
-                if fc.array_index == 2:
-                    for kp in fc.keyframe_points:
-                        kp.co.z = min(0, abs(kp.co.z))
-                        
-            # Delete rotation curves for x(0) and y(1) axis. Should we delet Z rotation too? 
-            # rot_fcurves = [fc for fc in strip.fcurves if root_bone_name in fc.data_path and fc.data_path.startswith('rotation') and (fc.array_index == 0 or fc.array_index == 1)]
-            # for fc in rot_fcurves:
-            #     strip.fcurves.remove(fc)
-            # while(rot_fcurves):
-            #     fc = rot_fcurves.pop()
-            #     strip.fcurves.remove(fc)
-            bpy.context.area.ui_type = 'NLA_EDITOR'
-            bpy.ops.nla.tweakmode_exit()
-            bpy.context.area.ui_type = previous_context
-    bpy.ops.object.mode_set(mode='OBJECT')
+            # Strips can share an action, it only needs its hips moved once
+            if strip.action is None or strip.action in processed:
+                continue
+            processed.add(strip.action)
+            if not move_hip_location(strip.action, hip_bone_name, name_prefix + root_bone_name):
+                log.warning("[Mixamo Root] No %s location keys in action %s" % (hip_bone_name, strip.action.name))
+    print("[Mixamo Root] Added root motion to %d NLA actions" % len(processed))
+    return processed
     
+@instrument.timed()
 def deleteArmature(imported_objects=set()):
     armature = None
     if bpy.context.selected_objects:
@@ -367,17 +316,37 @@ def deleteArmature(imported_objects=set()):
         bpy.ops.object.select_all(action='DESELECT')
         for obj in imported_objects:
             bpy.data.objects[obj.name].select_set(True)
+            if obj.type == 'ARMATURE':
+                rigcontext.forget(obj)
         
     bpy.ops.object.delete(use_global=False, confirm=False)
     if bpy.context.selected_objects:
         bpy.context.view_layer.objects.active = armature
 
+# Datablocks an fbx import creates besides the objects and the action, in an order where
+# removing the earlier ones releases the users of the later ones
+IMPORTED_DATA = ('meshes', 'armatures', 'materials', 'node_groups', 'textures', 'images')
+
+def snapshot_data():
+    return {name: set(getattr(bpy.data, name)) for name in IMPORTED_DATA}
+
+@instrument.timed()
+def purge_imported(before):
+    # Frees the datablocks created since the snapshot that nothing uses anymore, instead of
+    # leaving them as orphans until the file is saved and reloaded. Actions are never touched.
+    removed = 0
+    for name in IMPORTED_DATA:
+        collection = getattr(bpy.data, name)
+        for block in [block for block in collection if block not in before[name] and block.users == 0]:
+            collection.remove(block)
+            removed += 1
+    return removed
+
 def import_armature(filepath, root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:",  insert_root=False, delete_armatures=False):
     old_objs = set(bpy.context.scene.objects)
     if insert_root:
         bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
-        bpy.ops.import_scene.fbx(filepath = filepath)#,  automatic_bone_orientation=True)
-    else:
+    with instrument.stage("import_scene.fbx"):
         bpy.ops.import_scene.fbx(filepath = filepath)#,  automatic_bone_orientation=True)
     
     imported_objects = set(bpy.context.scene.objects) - old_objs
@@ -387,18 +356,129 @@ def import_armature(filepath, root_bone_name="Root", hip_bone_name="mixamorig:Hi
     
     if insert_root:
         add_root_bone(root_bone_name, hip_bone_name, remove_prefix, name_prefix)
-    
+    return imported_actions[0]
+
+def import_animation(filepath, armature, root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:",  insert_root=False):
+    # Fast path for files after the first: only the animation curves are read from the fbx,
+    # no mesh, material or armature is created, and the action is built for the given armature
+    render = bpy.context.scene.render
+    with instrument.stage("read_animation"):
+        bones = fbxanim.read_animation(filepath, render.fps / render.fps_base)
+    print("[Mixamo Root] Now reading animation: " + str(filepath))
+
+    # Key the same interpolation the importer gave the armature's own action
+    interpolation = None
+    reference = armature.animation_data.action if armature.animation_data else None
+    if reference and reference.fcurves and len(reference.fcurves[0].keyframe_points):
+        interpolation = keyframes.read_curve(reference.fcurves[0])['interpolation'][0]
+
+    action = bpy.data.actions.new(Path(filepath).resolve().stem)
+    pose_bones = armature.pose.bones
+    for bone_name, (frames, location, rotation, scale) in bones.items():
+        # The armature's bones may already have had their prefix removed
+        if bone_name not in pose_bones and remove_prefix and bone_name.replace(name_prefix, "") in pose_bones:
+            bone_name = bone_name.replace(name_prefix, "")
+        for attribute, values in (('location', location), ('rotation_quaternion', rotation), ('scale', scale)):
+            for index in range(values.shape[1]):
+                fcurve = action.fcurves.new(data_path=f'pose.bones["{bone_name}"].{attribute}', index=index, action_group=bone_name)
+                keyframes.write_keyframes(fcurve, np.column_stack((frames, values[:, index])), interpolation)
+
+    if not armature.animation_data:
+        armature.animation_data_create()
+    armature.animation_data.action = action
+    bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.select_all(action='DESELECT')
+    armature.select_set(True)
+    bpy.context.view_layer.objects.active = armature
+    if insert_root:
+        insert_root_motion(root_bone_name, hip_bone_name, remove_prefix, name_prefix)
+    return action
+
+def read_action(action):
+    # All fcurves of an action as keyframe arrays, in the form stored by the clip cache
+    curves = []
+    for fcurve in action.fcurves:
+        curve = keyframes.read_curve(fcurve)
+        curve.update(data_path=fcurve.data_path, index=fcurve.array_index, group=fcurve.group.name if fcurve.group else '')
+        curves.append(curve)
+    return curves
+
+def load_clip_store(actions):
+    # The keys of all the actions in one clip store, in the order of actions
+    return clipstore.ClipStore.from_clips([(action.name, read_action(action)) for action in actions])
+
+@instrument.timed()
+def save_clip_store(store, actions, clips=None):
+    # Writes the keys of the store back over the fcurves of the actions it was loaded from, only the given clips when set
+    for clip in (range(len(actions)) if clips is None else clips):
+        fcurves = rigcontext.FCurveIndex(actions[clip])
+        for curve in store.curves(clip):
+            keyframes.write_curve(fcurves.ensure(curve['data_path'], curve['index'], curve['group']), curve)
+
+def action_strips():
+    # NLA strips of every object by the action they play
+    strips = {}
+    for obj in bpy.data.objects:
+        if obj.animation_data:
+            for track in obj.animation_data.nla_tracks:
+                for strip in track.strips:
+                    if strip.action:
+                        strips.setdefault(strip.action, []).append(strip)
+    return strips
+
+def shift_strip_range(strip, offset):
+    # Moves the part of the action a strip plays by offset frames, so it plays the same keys after
+    # they were moved. Blender clamps the action start to the end, the leading side moves first
+    if offset > 0:
+        strip.action_frame_end += offset
+        strip.action_frame_start += offset
+    else:
+        strip.action_frame_start += offset
+        strip.action_frame_end += offset
+
+@instrument.timed()
+def zero_start_frames(actions=None, start_frame=0):
+    # Moves every action so its first key is on start_frame, all of them in one pass over a clip store.
+    # The NLA strips playing a moved action keep playing the same keys
+    actions = list(bpy.data.actions if actions is None else actions)
+    store = load_clip_store(actions)
+    offsets = store.zero_start_frames(start_frame)
+    moved = np.flatnonzero(offsets)
+    save_clip_store(store, actions, moved)
+    strips = action_strips()
+    for clip in moved:
+        for strip in strips.get(actions[clip], ()):
+            shift_strip_range(strip, float(offsets[clip]))
+    print("[Mixamo Root] Moved %d of %d actions to start on frame %d" % (len(moved), len(actions), start_frame))
+    return len(moved)
+
+@instrument.timed()
+def build_action(name, curves):
+    # Rebuilds an action from read_action output without going through the fbx importer
+    action = bpy.data.actions.new(name)
+    for curve in curves:
+        fcurve = action.fcurves.new(data_path=curve['data_path'], index=int(curve['index']), action_group=curve['group'])
+        keyframes.write_curve(fcurve, curve)
+    # Not assigned to any armature, keep it when the file is saved
+    action.use_fake_user = True
+    return action
     
 def add_root_bone(root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:"):
-    armature = bpy.context.selected_objects[0]
-    bpy.ops.object.mode_set(mode='EDIT')
+    armature = next(obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE')
+    bpy.context.view_layer.objects.active = armature
+    with instrument.stage("add_root_bone"):
+        bpy.ops.object.mode_set(mode='EDIT')
 
-    root_bone = armature.data.edit_bones.new(name_prefix + root_bone_name)
-    root_bone.tail.z = .3
+        root_bone = armature.data.edit_bones.new(name_prefix + root_bone_name)
+        root_bone.tail.z = .3
 
-    armature.data.edit_bones[hip_bone_name].parent = armature.data.edit_bones[name_prefix + root_bone_name]
-    bpy.ops.object.mode_set(mode='OBJECT')
+        armature.data.edit_bones[hip_bone_name].parent = armature.data.edit_bones[name_prefix + root_bone_name]
+        bpy.ops.object.mode_set(mode='OBJECT')
 
+    insert_root_motion(root_bone_name, hip_bone_name, remove_prefix, name_prefix)
+
+def insert_root_motion(root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:"):
+    # Moves the hip motion of the active armature's action to its (already added) root bone
     fixBones(remove_prefix=remove_prefix, name_prefix=name_prefix)
     scaleAll()
     if remove_prefix:
@@ -406,7 +486,7 @@ def add_root_bone(root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_
         name_prefix = ''
     copyHips(root_bone_name=root_bone_name, hip_bone_name=hip_bone_name, name_prefix=name_prefix)
 
-def add_root_bone_nla(root_bone_name="Root", hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:"):#remove_prefix=False, name_prefix="mixamorig:"):
+def add_root_bone_nla(root_bone_name="Root", hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:", reduce_keys=False, location_tolerance=0.001, rotation_tolerance=0.001):#remove_prefix=False, name_prefix="mixamorig:"):
     armature = bpy.context.selected_objects[0]
     bpy.ops.object.mode_set(mode='EDIT')
 
@@ -419,8 +499,12 @@ def add_root_bone_nla(root_bone_name="Root", hip_bone_name="mixamorig:Hips", nam
 
     # fix_bones_nla(remove_prefix=remove_prefix, name_prefix=name_prefix)
     # scale_all_nla()
-    copy_hips_nla(root_bone_name=root_bone_name, hip_bone_name=hip_bone_name, name_prefix=name_prefix)
+    actions = copy_hips_nla(root_bone_name=root_bone_name, hip_bone_name=hip_bone_name, name_prefix=name_prefix)
+    if reduce_keys:
+        for action in actions:
+            reduce_action(action, location_tolerance, rotation_tolerance)
 
+@instrument.timed()
 def push(obj, action, track_name=None, start_frame=0):
     # Simulate push :
     # * add a track
@@ -434,59 +518,619 @@ def push(obj, action, track_name=None, start_frame=0):
     strip = new_track.strips.new(action.name, start_frame, action)
     obj.animation_data.action = None
 
-def get_all_anims(source_dir, root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:",  insert_root=False, delete_armatures=False):
-    files = os.listdir(source_dir)
-    files = [f for f in files if f.endswith('.fbx')]
-    num_files = len(files)
-    current_context = bpy.context.area.ui_type
-    old_objs = set(bpy.context.scene.objects)
+def cli_options(root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:",  insert_root=False, delete_armatures=False, use_cache=False, cache_dir="", cache_size=1024, anim_only=False, stream=False, reduce_keys=False, location_tolerance=0.001, rotation_tolerance=0.001, resample_fps=0, use_bulk=False):
+    # Command line arguments reproducing these options, used to start worker processes
+    options = ['--root-name', root_bone_name, '--hip-name', hip_bone_name, '--name-prefix', name_prefix]
+    if remove_prefix:
+        options.append('--remove-prefix')
+    if insert_root:
+        options.append('--insert-root')
+    if delete_armatures:
+        options.append('--delete-armatures')
+    if use_cache:
+        options += ['--use-cache', '--cache-size', str(cache_size)]
+        if cache_dir:
+            options += ['--cache-dir', cache_dir]
+    if anim_only:
+        options.append('--anim-only')
+    if stream:
+        options.append('--stream')
+    if reduce_keys:
+        options += ['--reduce-keys', '--location-tolerance', repr(location_tolerance), '--rotation-tolerance', repr(rotation_tolerance)]
+    if resample_fps:
+        options += ['--resample-fps', repr(resample_fps)]
+    if use_bulk:
+        options.append('--bulk')
+    return options
+
+def remove_action(name):
+    action = bpy.data.actions.get(name) if name else None
+    if action:
+        bpy.data.actions.remove(action)
+
+def finish_recording(recorder, report_base=None):
+    # Ends the recorded batch, keeps its summary on the scene for the panel and writes the report files
+    instrument.stop(recorder)
+    lines = recorder.summary()
+    for line in lines:
+        print("[Mixamo Root] " + line)
+    bpy.context.scene[instrument.REPORT_PROPERTY] = "\n".join(lines)
+    if report_base:
+        try:
+            paths = recorder.write(report_base)
+        except OSError as e:
+            log.warning("[Mixamo Root] Could not write the report %s: %s" % (report_base, str(e)))
+        else:
+            print("[Mixamo Root] Wrote report to %s and %s" % paths)
+
+def iter_all_anims(source_dir, root_bone_name="Root", hip_bone_name="mixamorig:Hips", remove_prefix=False, name_prefix="mixamorig:",  insert_root=False, delete_armatures=False, files=None, workers=1, use_cache=False, cache_dir="", cache_size=1024, incremental=False, prune_missing=False, anim_only=False, stream=False, reduce_keys=False, location_tolerance=0.001, rotation_tolerance=0.001, report=False, recursive=False, prescan_files=False, import_order='name', scan_threads=0, resample_fps=0, use_bulk=False, zero_start=False, dedup_mode='OFF', dedup_near=False):
+    # Generator doing the work of get_all_anims one file at a time, it yields (done, total, file)
+    # after every file so the caller can stop between files. Stopping early (close()) keeps the
+    # finished clips, the remaining files are kept on the scene to resume with
+    scene = bpy.context.scene
+    # No area when running in background mode
+    current_context = bpy.context.area.ui_type if bpy.context.area else None
+    recorder = instrument.start("import")
+    # Only objects the batch imports are parked, the user's own objects are never hidden
+    parked = bulk.Bulk(use_bulk)
+    actions_before = set(bpy.data.actions)
+    try:
+        if files is None:
+            files = prescan.discover(source_dir, recursive)
+        weights = None
+        fingerprints = {}
+        if prescan_files:
+            # Rejects the files that would fail or import nothing before anything is imported
+            render = scene.render
+            with instrument.stage("prescan"):
+                # The dedup fingerprints come from the same parse
+                scanned = prescan.scan(source_dir, files, hip_bone_name, name_prefix, render.fps / render.fps_base, scan_threads, dedup_mode != 'OFF')
+            rejected = [entry for entry in scanned if entry['error']]
+            for entry in rejected:
+                log.warning("[Mixamo Root] Skipping %s: %s" % (entry['file'], entry['error']))
+            accepted = prescan.order([entry for entry in scanned if not entry['error']], import_order)
+            files = [entry['file'] for entry in accepted]
+            weights = {entry['file']: entry['size'] for entry in accepted}
+            fingerprints = {entry['file']: entry['fingerprint'] for entry in accepted if 'fingerprint' in entry}
+            print("[Mixamo Root] Pre-scan accepted %d of %d files" % (len(files), len(scanned)))
+            if report:
+                prescan.write(instrument.report_path(source_dir, "prescan") + ".json", source_dir, scanned)
+        # Everything that changes the processed curves of a file
+        options = dict(root_bone_name=root_bone_name, hip_bone_name=hip_bone_name, name_prefix=name_prefix, remove_prefix=remove_prefix, insert_root=insert_root)
+        if reduce_keys:
+            options.update(location_tolerance=location_tolerance, rotation_tolerance=rotation_tolerance)
+        if resample_fps:
+            options.update(resample_fps=resample_fps)
+
+        entries = None
+        # Files imported by earlier batches, the first copies new files are checked against by dedup
+        known = []
+        if incremental:
+            entries = manifest.load(bpy.context.scene)
+            new, changed, unchanged, removed = manifest.plan(source_dir, files, entries, options)
+            print("[Mixamo Root] %d new, %d changed, %d unchanged, %d removed files" % (len(new), len(changed), len(unchanged), len(removed)))
+            # Changed files replace their old action instead of adding a duplicate
+            for file in changed:
+                remove_action(entries.pop(manifest.key(source_dir, file))['action'])
+            if prune_missing:
+                for key in removed:
+                    remove_action(entries.pop(key)['action'])
+            pending = set(new + changed)
+            known = [f for f in unchanged if not entries[manifest.key(source_dir, f)].get('duplicate_of')]
+            files = [f for f in files if f in pending]
+            manifest.save(bpy.context.scene, entries)
+
+        duplicates = {}
+        file_actions = {}
+        if dedup_mode != 'OFF' and files:
+            # Copies of an earlier file in the batch or of a file imported before are not imported,
+            # with LINK their names go on its action
+            render = scene.render
+            with instrument.stage("dedup"):
+                for file in known:
+                    file_entry = entries[manifest.key(source_dir, file)]
+                    if file_entry.get('fingerprint'):
+                        fingerprints.setdefault(file, file_entry['fingerprint'])
+                    file_actions[file] = file_entry['action']
+                candidates = known + files
+                fingerprints.update(dedup.scan(source_dir, [f for f in candidates if f not in fingerprints], render.fps / render.fps_base, scan_threads))
+                duplicates, mirrors = dedup.find_duplicates(candidates, fingerprints, dedup_near)
+                # Known files that copy each other were imported already
+                known_files = set(known)
+                duplicates = {file: match for file, match in duplicates.items() if file not in known_files}
+                mirrors = [(file, original) for file, original in mirrors if file not in known_files]
+            for file, (original, kind) in duplicates.items():
+                print("[Mixamo Root] %s is %s copy of %s, %s" % (file, "an exact" if kind == 'exact' else "a near", original, "linked" if dedup_mode == 'LINK' else "skipped"))
+            for file, original in mirrors:
+                print("[Mixamo Root] %s mirrors %s" % (file, original))
+            files = [f for f in files if f not in duplicates]
+            print("[Mixamo Root] Dedup removed %d of %d files" % (len(duplicates), len(files) + len(duplicates)))
+            if report:
+                dedup.write_report(instrument.report_path(source_dir, "dedup") + ".json", source_dir, dedup_mode, duplicates, mirrors)
+
+        if workers > 1 and len(files) > 1:
+            cli = cli_options(root_bone_name, hip_bone_name, remove_prefix, name_prefix, insert_root, delete_armatures, use_cache, cache_dir, cache_size, anim_only, stream,
+                              reduce_keys, location_tolerance, rotation_tolerance, resample_fps, use_bulk)
+            with instrument.stage("workers"):
+                parallel.convert_sharded(source_dir, files, workers, cli, os.path.abspath(__file__), keep_all_objects=not delete_armatures,
+                                         weights=[weights[file] for file in files] if weights else None)
+            # The appended actions may have been renamed, e.g. a/Walk.fbx and b/Walk.fbx
+            file_actions.update(manifest.source_actions(action for action in bpy.data.actions if action not in actions_before))
+            if entries is not None:
+                for file in files:
+                    entries[manifest.key(source_dir, file)] = manifest.entry(source_dir+"/"+file, options, file_actions.get(file), fingerprints.get(file))
+                manifest.add_duplicates(entries, source_dir, options, duplicates, fingerprints)
+                manifest.save(bpy.context.scene, entries)
+            if dedup_mode == 'LINK':
+                link_duplicates(duplicates, file_actions)
+            if zero_start:
+                zero_start_frames([action for action in bpy.data.actions if action not in actions_before])
+            if resample_fps:
+                set_scene_fps(scene, resample_fps)
+            yield len(files), len(files), None
+            return
+
+        clip_cache = None
+        keys = {}
+        cached = set()
+        if use_cache:
+            clip_cache = cache.ClipCache(cache_dir, cache_size * 1024 * 1024)
+            keys = {file: clip_cache.key(source_dir+"/"+file, **options) for file in files}
+            # The first file is always imported, so the batch has an armature to go with the cached actions
+            cached = {file for file in files[1:] if keys[file] in clip_cache}
+            print("[Mixamo Root] %d of %d files found in cache" % (len(cached), len(files)))
+
+        num_files = len(files) - len(cached)
+        manifest.save_pending(scene, source_dir, files)
+        old_objs = set(bpy.context.scene.objects)
+        # With anim_only, the first imported armature is kept and later files only read their animation onto it
+        rig = None
     
-    for file in files:
-        print("file: " + str(file))
-        if not file.endswith('.DS_Store') and file.endswith('.fbx'):
-            try:
-                filepath = source_dir+"/"+file
-                import_armature(filepath, root_bone_name, hip_bone_name, remove_prefix, name_prefix, insert_root, delete_armatures)
-                imported_objects = set(bpy.context.scene.objects) - old_objs
-                if delete_armatures and num_files > 1:
-                    deleteArmature(imported_objects)
-                    num_files -= 1
-            except Exception as e:
-                raise
-                log.error("[Mixamo Root] ERROR get_all_anims raised %s when processing %s" % (str(e), file))
-                return -1
-    bpy.context.area.ui_type = current_context
-    bpy.context.scene.frame_start = 0
-    bpy.ops.object.mode_set(mode='OBJECT')
+        for done, file in enumerate(files, 1):
+            print("file: " + str(file))
+            if not file.endswith('.DS_Store') and file.lower().endswith('.fbx'):
+                try:
+                    with instrument.file(file):
+                        filepath = source_dir+"/"+file
+                        action = None
+                        if file in cached:
+                            with instrument.stage("cache_load"):
+                                curves = clip_cache.load(keys[file])
+                            if curves is not None:
+                                action = build_action(Path(filepath).resolve().stem, curves)
+                            else:
+                                # Evicted since the batch started, import it after all
+                                num_files += 1
+                        if action is None and rig is not None:
+                            try:
+                                action = import_animation(filepath, rig, root_bone_name, hip_bone_name, remove_prefix, name_prefix, insert_root)
+                            except fbxanim.FBXError as e:
+                                log.warning("[Mixamo Root] Importing %s in full, could not read its animation: %s" % (file, str(e)))
+                            else:
+                                if resample_fps:
+                                    resample_action(action, resample_fps)
+                                if reduce_keys:
+                                    reduce_action(action, location_tolerance, rotation_tolerance)
+                                if clip_cache:
+                                    with instrument.stage("cache_store"):
+                                        clip_cache.store(keys[file], read_action(action))
+                        if action is None:
+                            before = snapshot_data() if stream else None
+                            action = import_armature(filepath, root_bone_name, hip_bone_name, remove_prefix, name_prefix, insert_root, delete_armatures)
+                            imported_rss = memory.rss() if stream else None
+                            if resample_fps:
+                                resample_action(action, resample_fps)
+                            if reduce_keys:
+                                reduce_action(action, location_tolerance, rotation_tolerance)
+                            if clip_cache:
+                                with instrument.stage("cache_store"):
+                                    clip_cache.store(keys[file], read_action(action))
+                            imported_objects = set(bpy.context.scene.objects) - old_objs
+                            if anim_only and delete_armatures and rig is None:
+                                rig = next((obj for obj in imported_objects if obj.type == 'ARMATURE'), None)
+                                old_objs = set(bpy.context.scene.objects)
+                                # The rig gets every later action, its meshes would be deformed again for each
+                                parked.park(obj for obj in imported_objects if obj is not rig)
+                            elif delete_armatures and (num_files > 1 or rig is not None):
+                                deleteArmature(imported_objects)
+                                num_files -= 1
+                                if stream:
+                                    removed = purge_imported(before)
+                                    print("[Mixamo Root] Freed %d datablocks of %s, memory after import %s, after purge %s, peak %s" % (
+                                        removed, file, memory.format_mb(imported_rss), memory.format_mb(memory.rss()), memory.format_mb(memory.peak_rss())))
+                            else:
+                                # Kept as is, later files do not need it evaluated
+                                parked.park(imported_objects)
+                        instrument.count_keys(action)
+                        manifest.tag_source(action, file)
+                        file_actions[file] = action.name
+                        if entries is not None:
+                            entries[manifest.key(source_dir, file)] = manifest.entry(filepath, options, action.name, fingerprints.get(file))
+                            manifest.save(bpy.context.scene, entries)
+                except Exception as e:
+                    raise
+                    log.error("[Mixamo Root] ERROR get_all_anims raised %s when processing %s" % (str(e), file))
+                    return -1
+            manifest.save_pending(scene, source_dir, files[done:])
+            yield done, len(files), file
+        if dedup_mode == 'LINK':
+            link_duplicates(duplicates, file_actions)
+        if entries is not None and duplicates:
+            manifest.add_duplicates(entries, source_dir, options, duplicates, fingerprints)
+            manifest.save(bpy.context.scene, entries)
+        if zero_start:
+            zero_start_frames([action for action in bpy.data.actions if action not in actions_before])
+        if resample_fps:
+            set_scene_fps(scene, resample_fps)
+        manifest.clear_pending(scene)
+    finally:
+        if current_context:
+            bpy.context.area.ui_type = current_context
+        bpy.context.scene.frame_start = 0
+        rigcontext.clear()
+        parked.restore()
+        if bpy.context.object:
+            bpy.ops.object.mode_set(mode='OBJECT')
+        finish_recording(recorder, instrument.report_path(source_dir, "import") if report else None)
 
-def apply_all_anims(delete_applied_armatures=False, control_rig=None, push_nla=False):
-    if control_rig and control_rig.type == 'ARMATURE':
-        bpy.ops.object.mode_set(mode='OBJECT')
+def set_scene_fps(scene, fps):
+    # The actions of a finished batch are keyed at this rate, the scene plays and exports them
+    # at it. A failed or cancelled batch leaves the scene rate alone
+    scene.render.fps, scene.render.fps_base = round(fps), round(fps) / fps
+
+def link_duplicates(duplicates, file_actions):
+    # Records the files skipped as copies on the action of the file they copy, as a JSON list
+    # of file names in its mixamo_duplicates property, so one action stands for all of them.
+    # The root motion and glTF exports write the action again under each of their names
+    linked = {}
+    for file, (original, _) in duplicates.items():
+        action = bpy.data.actions.get(file_actions.get(original) or "")
+        if action is not None:
+            linked.setdefault(action, []).append(file)
+    for action, files in linked.items():
+        manifest.link_duplicates(action, files)
+    return len(linked)
+
+def get_all_anims(*args, **kwargs):
+    # Imports all files in one go, takes the arguments of iter_all_anims
+    for _ in iter_all_anims(*args, **kwargs):
+        pass
+
+def root_track(action, root_bone_name):
+    # Root bone location and rotation of an action on every frame of its range, None without root keys.
+    # The root is keyed on every frame or LINEAR after reduction, so interpolating the keys is exact
+    paths = {'pose.bones["%s"].location' % root_bone_name: 'location', 'pose.bones["%s"].rotation_quaternion' % root_bone_name: 'rotation'}
+    curves = {(paths[fc.data_path], fc.array_index): keyframes.read_keyframes(fc) for fc in action.fcurves if fc.data_path in paths}
+    if not any(prop == 'location' for prop, _ in curves):
+        return None
+    start, end = action.frame_range
+    frames = np.arange(round(start), round(end) + 1, dtype=np.float64)
+    location = np.zeros((len(frames), 3))
+    rotation = np.tile(rootmath.IDENTITY, (len(frames), 1))
+    for (prop, index), co in curves.items():
+        if len(co):
+            (location if prop == 'location' else rotation)[:, index] = np.interp(frames, co[:, 0], co[:, 1])
+    return frames[0], location, rotation
+
+@instrument.timed()
+def export_root_motion(filepath, root_bone_name="Root", name_prefix="mixamorig:", actions=None):
+    # Writes the root track of every action that has one to a root motion sidecar file, the
+    # copies linked to an action get the same track under their own names
+    render = bpy.context.scene.render
+    fps = render.fps / render.fps_base
+    tracks = []
+    for action in (bpy.data.actions if actions is None else actions):
+        # The root keeps the prefix unless it was removed with the rest of the rig
+        track = root_track(action, name_prefix + root_bone_name) or root_track(action, root_bone_name)
+        if track is None:
+            continue
+        start_frame, location, rotation = track
+        records = sidecar.root_records(location, rotation)
+        tracks.extend((name, start_frame, fps, records) for name in [action.name] + manifest.duplicate_names(action))
+    sidecar.write(filepath, tracks)
+    print("[Mixamo Root] Wrote the root motion of %d actions to %s" % (len(tracks), filepath))
+    return len(tracks)
+
+def armature_actions(armature):
+    # Actions keying at least one bone of the armature
+    bone_paths = {'pose.bones["%s"]' % bone.name for bone in armature.data.bones}
+    return [action for action in bpy.data.actions if any(fcurve.data_path.rsplit('.', 1)[0] in bone_paths for fcurve in action.fcurves)]
+
+@instrument.timed()
+def export_gltf(filepath, armature=None, actions=None, per_action=False, export_format='GLB', workers=1):
+    # Writes the armature, its meshes and its actions to one glTF file, or with per_action one
+    # file per action into the directory filepath, split across workers background processes
+    if armature is None:
+        active = bpy.context.view_layer.objects.active
+        armatures = [obj for obj in bpy.context.scene.objects if obj.type == 'ARMATURE']
+        armature = active if active is not None and active.type == 'ARMATURE' else next(iter(armatures), None)
+    if armature is None:
+        raise ValueError("No armature to export")
+    if actions is None:
+        actions = armature_actions(armature)
+    if per_action:
+        return gltfexport.export_per_action(filepath, armature, actions, export_format, workers)
+    return gltfexport.export_combined(filepath, armature, actions, export_format)
+
+def rig_rest(obj):
+    # Rest pose of an armature object for the retarget engine
+    bones = obj.data.bones
+    world = obj.matrix_world.to_3x3().normalized()
+    rest = rootmath.matrix_to_quat(np.array([world @ bone.matrix_local.to_3x3() for bone in bones]))
+    parents = [bone.parent.name if bone.parent else None for bone in bones]
+    return retarget.Rig([bone.name for bone in bones], parents, rest, scale=np.mean(obj.matrix_world.to_scale()))
+
+def retarget_plan(source, control_rig, name_prefix="mixamorig:"):
+    source_rig = rig_rest(source)
+    target_rig = rig_rest(control_rig)
+    mapping = retarget.map_bones(source_rig.names, target_rig.names, source_prefix=name_prefix)
+    missing = [control for control in retarget.CONTROL_BONES.values() if control not in mapping]
+    print("[Mixamo Root] Retargeting onto %d control bones, the other %d bones of the control rig are not keyed" % (len(mapping), len(target_rig) - len(mapping)))
+    if missing:
+        print("[Mixamo Root] Control bones without a source or not in the control rig: %s" % ", ".join(missing))
+    return retarget.RetargetPlan(source_rig, target_rig, mapping)
+
+def sample_action(action, rig):
+    # Rotation and location of every bone of a rig over the union of the action's key frames,
+    # curves keyed on other frames are linearly interpolated
+    curves = {}
+    for fcurve in action.fcurves:
+        bone, _, prop = fcurve.data_path.partition('"].')
+        if prop in ('rotation_quaternion', 'location') and bone.startswith('pose.bones["'):
+            curves[(bone[len('pose.bones["'):], prop, fcurve.array_index)] = keyframes.read_keyframes(fcurve)
+    if not curves:
+        return np.zeros(0), None, None, None
+    frames = np.unique(np.concatenate([co[:, 0] for co in curves.values()]))
+
+    rotations = np.tile(rootmath.IDENTITY, (len(rig), len(frames), 1))
+    locations = np.zeros((len(rig), len(frames), 3))
+    has_location = np.zeros(len(rig), dtype=bool)
+    for (bone, prop, index), co in curves.items():
+        if bone not in rig.index or not len(co):
+            continue
+        bone = rig.index[bone]
+        values = co[:, 1] if len(co) == len(frames) and np.array_equal(co[:, 0], frames) else np.interp(frames, co[:, 0], co[:, 1])
+        if prop == 'location':
+            locations[bone, :, index] = values
+            has_location[bone] = True
+        else:
+            rotations[bone, :, index] = values
+    return frames, rotations, locations, has_location
+
+@instrument.timed()
+def retarget_action(action, plan, control_rig, action_name):
+    # Builds the control rig version of an action with the native retarget engine
+    frames, rotations, locations, has_location = sample_action(action, plan.source)
+    target_action = bpy.data.actions.new(action_name)
+    if not len(frames):
+        return target_action
+    rotations, locations, rotated, located = plan.apply(rotations, locations, has_location)
+
+    for bone, bone_name in enumerate(plan.target.names):
+        pose_bone = control_rig.pose.bones.get(bone_name)
+        if pose_bone is None:
+            continue
+        channels = []
+        if rotated[bone]:
+            if pose_bone.rotation_mode == 'QUATERNION':
+                channels.append(('rotation_quaternion', rotations[bone]))
+            elif pose_bone.rotation_mode == 'XYZ':
+                channels.append(('rotation_euler', np.unwrap(rootmath.quat_to_euler(rotations[bone]), axis=0)))
+            else:
+                log.warning("[Mixamo Root] Rotation mode %s of %s is not supported by the native retarget, skipped" % (pose_bone.rotation_mode, bone_name))
+        if located[bone]:
+            channels.append(('location', locations[bone]))
+        for prop, values in channels:
+            data_path = 'pose.bones["%s"].%s' % (bone_name, prop)
+            for index in range(values.shape[1]):
+                fcurve = target_action.fcurves.new(data_path=data_path, index=index, action_group=bone_name)
+                keyframes.write_keyframes(fcurve, np.column_stack((frames, values[:, index])))
+    return target_action
 
-        imported_objects = set(bpy.context.scene.objects)
-        imported_armatures = [x for x in imported_objects if x.type == 'ARMATURE' and x.name != control_rig.name]
+@instrument.timed()
+def operator_retarget(obj, control_rig):
+    # Applies the action of an imported armature to the control rig with the mixamo addon
+    bpy.context.scene.mix_source_armature = obj
+    bpy.context.view_layer.objects.active = control_rig
 
-        for obj in imported_armatures:
-            action_name = obj.animation_data.action.name
-            bpy.context.scene.mix_source_armature = obj
-            bpy.context.view_layer.objects.active = control_rig
+    bpy.ops.mr.import_anim_to_rig()
+
+    bpy.context.view_layer.objects.active = control_rig
+    return control_rig.animation_data.action
+
+def compare_actions(reference, action, tolerance=1e-3):
+    # Largest difference per fcurve between two actions on the reference's key frames, for
+    # the fcurves both actions have. Returns {(data_path, index): error} of those over tolerance
+    fcurves = {(fc.data_path, fc.array_index): fc for fc in action.fcurves}
+    values = {}
+    for fcurve in reference.fcurves:
+        other = fcurves.get((fcurve.data_path, fcurve.array_index))
+        if other is None:
+            continue
+        co = keyframes.read_keyframes(fcurve)
+        other_co = keyframes.read_keyframes(other)
+        if len(co) and len(other_co):
+            values[(fcurve.data_path, fcurve.array_index)] = (co[:, 1], np.interp(co[:, 0], other_co[:, 0], other_co[:, 1]))
 
-            bpy.ops.mr.import_anim_to_rig()
+    errors = {}
+    for (data_path, index), (expected, actual) in values.items():
+        if data_path.endswith('rotation_quaternion'):
+            # q and -q are the same rotation, compare with the sign the reference uses
+            parts = [values.get((data_path, i)) for i in range(4)]
+            if all(part is not None and len(part[0]) == len(expected) for part in parts):
+                dot = sum(part[0] * part[1] for part in parts)
+                actual = np.where(dot < 0, -actual, actual)
+        error = float(np.max(np.abs(expected - actual)))
+        if error > tolerance:
+            errors[(data_path, index)] = error
+    return errors
 
-            bpy.context.view_layer.objects.active = control_rig
-            selected_action = control_rig.animation_data.action
-            selected_action.name = 'ctrl_' + action_name
-            # created_actions.append(selected_action)
+def apply_all_anims(delete_applied_armatures=False, control_rig=None, push_nla=False, native_retarget=False, name_prefix="mixamorig:", check_tolerance=None, report=False, source_dir=None, use_bulk=False):
+    recorder = instrument.start("apply")
+    parked = bulk.Bulk(use_bulk)
+    # Clips whose native retarget is outside check_tolerance of the operator's
+    mismatched = []
+    try:
+        if control_rig and control_rig.type == 'ARMATURE':
+            bpy.ops.object.mode_set(mode='OBJECT')
 
-            if push_nla:
-                push(control_rig, selected_action, None, int(selected_action.frame_start))
+            imported_objects = set(bpy.context.scene.objects)
+            imported_armatures = [x for x in imported_objects if x.type == 'ARMATURE' and x.name != control_rig.name]
+            # The meshes of the imported clips are never needed to retarget, without them baking
+            # does not deform them on every frame. The control rig's meshes stay as they are
+            parked.park(x for x in imported_objects if x.type == 'MESH' and x.parent in imported_armatures)
 
-            if delete_applied_armatures:
-                bpy.context.view_layer.objects.active = control_rig
-                deleteArmature(set([obj]))
+            # The mapping and rest corrections are the same for every clip of the same rig layout
+            plans = {}
+            for obj in imported_armatures:
+                action_name = obj.animation_data.action.name
+                with instrument.file(action_name):
+                    if native_retarget:
+                        layout = tuple(bone.name for bone in obj.data.bones)
+                        if layout not in plans:
+                            plans[layout] = retarget_plan(obj, control_rig, name_prefix)
+                        selected_action = retarget_action(obj.animation_data.action, plans[layout], control_rig, 'ctrl_' + action_name)
+                        if check_tolerance is not None:
+                            reference = operator_retarget(obj, control_rig)
+                            errors = compare_actions(reference, selected_action, check_tolerance)
+                            for (data_path, index), error in sorted(errors.items()):
+                                log.warning("[Mixamo Root] %s: %s[%d] differs from the operator by %.5f" % (action_name, data_path, index, error))
+                            print("[Mixamo Root] %s: %d fcurves outside a tolerance of %g" % (action_name, len(errors), check_tolerance))
+                            keyed = {(fc.data_path, fc.array_index) for fc in selected_action.fcurves}
+                            missing = [fc for fc in reference.fcurves if (fc.data_path, fc.array_index) not in keyed]
+                            if missing:
+                                print("[Mixamo Root] %s: %d operator fcurves are not keyed by the native retarget (IK controls and fingers)" % (action_name, len(missing)))
+                            if errors:
+                                mismatched.append(action_name)
+                            bpy.data.actions.remove(reference)
+                        if control_rig.animation_data is None:
+                            control_rig.animation_data_create()
+                        control_rig.animation_data.action = selected_action
+                    else:
+                        selected_action = operator_retarget(obj, control_rig)
+                        selected_action.name = 'ctrl_' + action_name
+                    # created_actions.append(selected_action)
+                    instrument.count_keys(selected_action)
+
+                    if push_nla:
+                        push(control_rig, selected_action, None, int(selected_action.frame_start))
+
+                    if delete_applied_armatures:
+                        bpy.context.view_layer.objects.active = control_rig
+                        deleteArmature(set([obj]))
+    finally:
+        parked.restore()
+        # Next to the source directory when known, otherwise next to the blend file
+        report_base = None
+        if report and source_dir:
+            report_base = instrument.report_path(source_dir, "apply")
+        elif report and bpy.data.filepath:
+            report_base = os.path.splitext(bpy.data.filepath)[0] + "_apply_report"
+        finish_recording(recorder, report_base)
+    return mismatched
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='blender -b [base.blend] -P mixamoroot.py --',
+        description='Imports every mixamo animation in a directory, optionally inserts root bones, and saves the result')
+    parser.add_argument('--src', required=True, help='Path to directory containing mixamo animation files (.fbx)')
+    parser.add_argument('--out', required=True, help='Path of the .blend file to save the result to')
+    parser.add_argument('--hip-name', default='mixamorig:Hips', help='Name to identify the hip bone if not mixamorig:Hips')
+    parser.add_argument('--root-name', default='Root', help='Name to save the root bone, default is Root')
+    parser.add_argument('--name-prefix', default='mixamorig:', help="Prefix of mixamo armature components, if not default of 'mixamorig:'")
+    parser.add_argument('--remove-prefix', action='store_true', help='Remove prefix from armature component names')
+    parser.add_argument('--insert-root', action='store_true', help='Insert a root bone aligned with the hips')
+    parser.add_argument('--delete-armatures', action='store_true', help='Delete all but one imported armature')
+    parser.add_argument('--reduce-keys', action='store_true', help='Remove the keys that linear interpolation rebuilds within the tolerances, the kept keys are set to linear')
+    parser.add_argument('--location-tolerance', type=float, default=0.001, help='With --reduce-keys, largest location and scale error allowed')
+    parser.add_argument('--rotation-tolerance', type=float, default=0.001, help='With --reduce-keys, largest rotation error allowed, in quaternion components (about half the angle in radians)')
+    parser.add_argument('--zero-start-frames', action='store_true', help='Move every imported action so it starts on frame 0')
+    parser.add_argument('--resample-fps', type=float, default=0, help='Rekey every action on whole frames of this rate with quaternion slerp, and set the scene to it')
+    parser.add_argument('--root-motion', metavar='PATH', help='Also write the root bone track of every action to a root motion sidecar file')
+    parser.add_argument('--gltf', metavar='PATH', help='Also export the armature, its meshes and its actions to a glTF file, or with --gltf-per-action to a directory')
+    parser.add_argument('--gltf-per-action', action='store_true', help='With --gltf, write one file per action, split across --workers background processes')
+    parser.add_argument('--gltf-format', choices=gltfexport.FORMATS, default='GLB', help='With --gltf, binary .glb or .gltf with separate buffers')
+    parser.add_argument('--bulk', dest='use_bulk', action='store_true', help='Hide the imported objects the batch is done with until it ends, so they are not evaluated again for every file')
+    parser.add_argument('--report', action='store_true', help='Write the timing, memory and key count report of every batch as JSON and CSV next to the source directory')
+    parser.add_argument('--control-rig', help='Name of a mixamo control rig in the opened file to apply all animations to')
+    parser.add_argument('--delete-applied-armatures', action='store_true', help='Delete the armatures of applied animations')
+    parser.add_argument('--push-nla', action='store_true', help='Push the actions created for the control rig to the NLA')
+    parser.add_argument('--native-retarget', action='store_true', help='Apply animations to the control rig with the built in retarget engine instead of the mixamo addon')
+    parser.add_argument('--check-retarget', type=float, metavar='TOLERANCE', help='With --native-retarget, also run the mixamo addon, report fcurves that differ by more than TOLERANCE and exit with 1 when any do')
+    parser.add_argument('--workers', type=int, default=1, help='Number of background blender processes to split the files across')
+    parser.add_argument('--files', nargs='+', help='Only import these files from the source directory')
+    parser.add_argument('--recursive', action='store_true', help='Also import the files in the subdirectories of the source directory')
+    parser.add_argument('--prescan', action='store_true', help='Parse every file before importing and skip the ones without a hip bone, with another name prefix or without animation')
+    parser.add_argument('--order', choices=prescan.ORDERS, default='name', help='With --prescan, import by name, largest file first or longest clip first')
+    parser.add_argument('--scan-threads', type=int, default=0, help='With --prescan or --dedup, threads parsing the files, defaults to the number of cpus plus four')
+    parser.add_argument('--dedup', choices=('skip', 'link'), help='Fingerprint the animation of every file and do not import copies of an earlier file, with link their names are recorded on its action')
+    parser.add_argument('--dedup-near', action='store_true', help='With --dedup, also treat clips that match after rounding to a few hundredths as copies')
+    parser.add_argument('--resume', action='store_true', help='Only import the files left over from a cancelled or failed import of the same source directory into the opened file')
+    parser.add_argument('--empty-scene', action='store_true', help='Start from an empty scene instead of the opened file')
+    parser.add_argument('--anim-only', action='store_true', help='With --delete-armatures, only read the animation of files after the first instead of importing them in full')
+    parser.add_argument('--stream', action='store_true', help='With --delete-armatures, free the meshes, materials and images of every deleted armature right away and report memory per file')
+    parser.add_argument('--incremental', action='store_true', help='Only import files that are new or changed since the last import into the opened file')
+    parser.add_argument('--prune-missing', action='store_true', help='With --incremental, remove the actions of files that no longer exist')
+    parser.add_argument('--use-cache', action='store_true', help='Rebuild unchanged files from the processed clip cache instead of importing them')
+    parser.add_argument('--cache-dir', default='', help='Directory of the processed clip cache, defaults to ~/.cache/mixamoroot')
+    parser.add_argument('--cache-size', type=int, default=1024, help='Size limit of the processed clip cache in MB')
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    try:
+        if args.empty_scene:
+            bpy.ops.wm.read_homefile(use_empty=True)
+        files = args.files
+        mismatched = []
+        if args.resume:
+            pending = manifest.load_pending(bpy.context.scene)
+            if pending and os.path.normpath(pending[0]) == os.path.normpath(os.path.abspath(args.src)):
+                files = pending[1]
+            else:
+                print("[Mixamo Root] Nothing to resume for %s" % args.src)
+                files = []
+        get_all_anims(
+            os.path.abspath(args.src),
+            root_bone_name=args.root_name,
+            hip_bone_name=args.hip_name,
+            remove_prefix=args.remove_prefix, name_prefix=args.name_prefix, insert_root=args.insert_root, delete_armatures=args.delete_armatures,
+            files=files, workers=args.workers,
+            use_cache=args.use_cache, cache_dir=args.cache_dir, cache_size=args.cache_size,
+            incremental=args.incremental, prune_missing=args.prune_missing, anim_only=args.anim_only, stream=args.stream,
+            reduce_keys=args.reduce_keys, location_tolerance=args.location_tolerance, rotation_tolerance=args.rotation_tolerance,
+            report=args.report, recursive=args.recursive, prescan_files=args.prescan, import_order=args.order, scan_threads=args.scan_threads,
+            resample_fps=args.resample_fps, use_bulk=args.use_bulk, zero_start=args.zero_start_frames,
+            dedup_mode=args.dedup.upper() if args.dedup else 'OFF', dedup_near=args.dedup_near)
+        if args.control_rig:
+            control_rig = bpy.data.objects.get(args.control_rig)
+            if control_rig is None or control_rig.type != 'ARMATURE':
+                raise ValueError("No control rig armature named '%s'" % args.control_rig)
+            mismatched = apply_all_anims(delete_applied_armatures=args.delete_applied_armatures, control_rig=control_rig, push_nla=args.push_nla,
+                            native_retarget=args.native_retarget, name_prefix=args.name_prefix, check_tolerance=args.check_retarget,
+                            report=args.report, source_dir=os.path.abspath(args.src), use_bulk=args.use_bulk)
+        if args.root_motion:
+            export_root_motion(os.path.abspath(args.root_motion), root_bone_name=args.root_name, name_prefix=args.name_prefix)
+        if args.gltf:
+            armature = bpy.data.objects[args.control_rig] if args.control_rig else None
+            export_gltf(os.path.abspath(args.gltf), armature=armature, per_action=args.gltf_per_action, export_format=args.gltf_format, workers=args.workers)
+        # Actions of deleted armatures have no users left and would not be saved otherwise
+        for action in bpy.data.actions:
+            action.use_fake_user = True
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.out))
+    except Exception:
+        log.exception("[Mixamo Root] ERROR batch conversion of %s failed" % args.src)
+        return 1
+    if mismatched:
+        # --check-retarget is a check, the result is saved but the run fails
+        log.error("[Mixamo Root] ERROR the native retarget of %d clips differs from the operator by more than %g: %s" % (
+            len(mismatched), args.check_retarget, ", ".join(mismatched)))
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    dir_path = "" # If using script in place please set this before running.
-    get_all_anims(r"C:\Users\matts\Downloads", insert_root=True)
-    print("[Mixamo Root] Run as plugin, or copy script in text editor while setting parameter defaults.")
+    if '--' in sys.argv:
+        sys.exit(main(sys.argv[sys.argv.index('--') + 1:]))
+    print("[Mixamo Root] Run as plugin, or in background mode with: blender -b -P mixamoroot.py -- --src DIR --out FILE.blend [--insert-root ...]")
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Sharded conversion: the file list is split across background blender processes that each
+# run the command line mode of mixamoroot.py on their share and save a shard .blend, the
+# shards are then appended into the current file.
+import bpy
+import os
+import logging
+import subprocess
+import tempfile
+
+
+log = logging.getLogger(__name__)
+
+def split_files(files, workers, weights=None):
+    # Contiguous shards, so the last shard ends with the last file like the serial order does.
+    # With weights (e.g. file sizes from the pre-scan) every file goes to the lightest shard
+    # instead, heaviest first, so the workers finish at about the same time
+    count = max(1, min(workers, len(files)))
+    if weights is not None:
+        shards = [[] for _ in range(count)]
+        loads = [0] * count
+        for weight, file in sorted(zip(weights, files), key=lambda item: -item[0]):
+            lightest = loads.index(min(loads))
+            shards[lightest].append(file)
+            loads[lightest] += weight
+        return shards
+    size, extra = divmod(len(files), count)
+    shards = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(files[start:end])
+        start = end
+    return shards
+
+def run_workers(script, argument_lists, work_dir, name="worker"):
+    # One background blender per argument list running script, raises with the log of the first failure
+    processes = []
+    for i, arguments in enumerate(argument_lists):
+        log_path = os.path.join(work_dir, "%s_%d.log" % (name, i))
+        command = [bpy.app.binary_path, '-b', '--factory-startup', '-P', script, '--'] + list(arguments)
+        with open(log_path, 'w') as log_file:
+            process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
+        processes.append((process, log_path))
+
+    failed = [log_path for process, log_path in processes if process.wait() != 0]
+    if failed:
+        with open(failed[0]) as log_file:
+            tail = log_file.read()[-2000:]
+        raise RuntimeError("%d of %d workers failed, first failure:\n%s" % (len(failed), len(processes), tail))
+
+def run_shards(source_dir, shards, options, script, work_dir):
+    shard_paths = [os.path.join(work_dir, "shard_%d.blend" % i) for i in range(len(shards))]
+    for i, shard in enumerate(shards):
+        print("[Mixamo Root] Starting worker %d with %d files" % (i, len(shard)))
+    run_workers(script, [['--empty-scene', '--src', source_dir, '--out', shard_path] + list(options) + ['--files'] + list(shard)
+                         for shard, shard_path in zip(shards, shard_paths)], work_dir, name="shard")
+    missing = [path for path in shard_paths if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError("Workers did not write %s" % ", ".join(missing))
+    return shard_paths
+
+def merge_shards(shard_paths, keep_all_objects=True):
+    scene = bpy.context.scene
+    last = len(shard_paths) - 1
+    for i, path in enumerate(shard_paths):
+        with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+            data_to.actions = list(data_from.actions)
+            # With delete_armatures only the armature of the last file survives the serial
+            # path, which is the one left in the last shard
+            if keep_all_objects or i == last:
+                data_to.objects = list(data_from.objects)
+        for obj in data_to.objects:
+            if obj is not None:
+                scene.collection.objects.link(obj)
+
+def convert_sharded(source_dir, files, workers, options, script, keep_all_objects=True, weights=None):
+    shards = split_files(files, workers, weights)
+    with tempfile.TemporaryDirectory(prefix="mixamoroot_") as work_dir:
+        shard_paths = run_shards(source_dir, shards, options, script, work_dir)
+        merge_shards(shard_paths, keep_all_objects)
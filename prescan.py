@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Pre-scan of a source directory before anything is imported. Every file is parsed with the
+# fbxanim reader on a thread pool (the array properties are only decompressed when read, so
+# meshes are skipped), its skeleton and animation are summarized in a manifest entry, and
+# files that would fail or produce nothing (not a binary fbx, no hip bone, another prefix,
+# no animation) are rejected up front. Only depends on numpy.
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . import dedup, fbxanim
+except ImportError:
+    import dedup
+    import fbxanim
+
+
+ORDERS = ('name', 'size', 'frames')
+
+
+def discover(source_dir, recursive=False):
+    '''Sorted .fbx files of source_dir, as paths relative to it with / separators'''
+    if not recursive:
+        return sorted(f for f in os.listdir(source_dir) if f.lower().endswith('.fbx') and os.path.isfile(os.path.join(source_dir, f)))
+    files = []
+    for directory, subdirectories, names in os.walk(source_dir):
+        subdirectories.sort()
+        relative = os.path.relpath(directory, source_dir)
+        for name in sorted(names):
+            if name.lower().endswith('.fbx'):
+                files.append(name if relative == '.' else os.path.join(relative, name).replace(os.sep, '/'))
+    return files
+
+
+def detect_prefix(names):
+    '''Most common namespace prefix of the bone names (e.g. "mixamorig:"), '' when there is none'''
+    prefixes = Counter(name[:name.rindex(':') + 1] for name in names if ':' in name)
+    return prefixes.most_common(1)[0][0] if prefixes else ''
+
+
+def scan_file(source_dir, file, hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:", fps=30.0, fingerprint=False):
+    '''Manifest entry of one file, entry['error'] says why it is rejected, None when it is fine
+
+    With fingerprint, entry['fingerprint'] also holds the dedup fingerprints of the animation,
+    computed from the same parse.
+    '''
+    filepath = os.path.join(source_dir, file)
+    entry = {'file': file, 'size': 0, 'mtime': None, 'version': None, 'bones': [], 'prefix': '',
+             'animated_bones': 0, 'frame_start': None, 'frame_end': None, 'error': None}
+    try:
+        stat = os.stat(filepath)
+        entry['size'], entry['mtime'] = stat.st_size, stat.st_mtime
+    except OSError as e:
+        # Deleted or made unreadable since the directory was listed
+        entry['error'] = "unreadable file: %s" % str(e)
+        return entry
+    try:
+        root, entry['version'] = fbxanim.parse(filepath)
+        skeleton = fbxanim.Skeleton(root)
+        bones = [model_id for model_id in skeleton.models if skeleton.is_bone(model_id)]
+        entry['bones'] = [skeleton.name(model_id) for model_id in bones]
+        entry['prefix'] = detect_prefix(entry['bones'])
+        start = end = None
+        for model_id in bones:
+            times = skeleton.key_times(model_id)
+            if len(times):
+                entry['animated_bones'] += 1
+                start = times[0] if start is None else min(start, times[0])
+                end = times[-1] if end is None else max(end, times[-1])
+        if fingerprint:
+            entry['fingerprint'] = dedup.fingerprint(fbxanim.skeleton_animation(skeleton, fps))
+    except OSError as e:
+        entry['error'] = "unreadable file: %s" % str(e)
+        return entry
+    except (fbxanim.FBXError, IndexError, ValueError) as e:
+        entry['error'] = "unreadable fbx: %s" % str(e)
+        return entry
+
+    if start is not None:
+        # Same frames as the importer keys, see fbxanim.read_animation
+        entry['frame_start'] = float(start * fps / fbxanim.FBX_KTIME + fbxanim.ANIM_OFFSET)
+        entry['frame_end'] = float(end * fps / fbxanim.FBX_KTIME + fbxanim.ANIM_OFFSET)
+    if not entry['bones']:
+        entry['error'] = "no armature"
+    elif hip_bone_name not in entry['bones']:
+        if entry['prefix'] != name_prefix:
+            entry['error'] = "bones use the prefix '%s' instead of '%s'" % (entry['prefix'], name_prefix)
+        else:
+            entry['error'] = "no hip bone named '%s'" % hip_bone_name
+    elif start is None or end <= start:
+        entry['error'] = "no animation"
+    return entry
+
+
+def scan(source_dir, files, hip_bone_name="mixamorig:Hips", name_prefix="mixamorig:", fps=30.0, threads=0, fingerprints=False):
+    '''Scans files on a thread pool, returns their manifest entries in the order of files'''
+    threads = threads or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda file: scan_file(source_dir, file, hip_bone_name, name_prefix, fps, fingerprints), files))
+
+
+def order(entries, by='name'):
+    '''Entries sorted for importing: by name, largest file first or longest clip first'''
+    if by == 'size':
+        return sorted(entries, key=lambda entry: -entry['size'])
+    if by == 'frames':
+        return sorted(entries, key=lambda entry: -((entry['frame_end'] or 0) - (entry['frame_start'] or 0)))
+    return sorted(entries, key=lambda entry: entry['file'])
+
+
+def write(filepath, source_dir, entries):
+    with open(filepath, 'w') as f:
+        json.dump({'source_dir': source_dir, 'files': entries}, f, indent=2)
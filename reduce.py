@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Error bounded keyframe reduction for baked curves. Keys are dropped as long as linear
+# interpolation between the keys that are left stays within a tolerance of every original
+# key, so the reduced curves have to be keyed LINEAR. Only depends on numpy.
+import numpy as np
+
+
+def reduce_keys(frames, values, tolerance):
+    '''Picks the keys to keep of a baked track
+
+    frames is an (N,) array of increasing key frames and values an (N,) or (N, C) array,
+    the channels of one property (e.g. the 4 of a quaternion) are reduced together so
+    they keep their keys on the same frames. Returns an (N,) bool array of the keys to
+    keep, the first and last keys are always kept.
+
+    Works like Ramer-Douglas-Peucker, but splits every segment that is still over the
+    tolerance in the same pass, so it takes a few whole array passes instead of one
+    python call per split.
+    '''
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(frames), -1)
+    count = len(frames)
+    keep = np.zeros(count, dtype=bool)
+    if count <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    points = np.arange(count)
+
+    while True:
+        kept = np.flatnonzero(keep)
+        # Segment of every key, between kept[segment] and kept[segment + 1]
+        segment = np.clip(np.searchsorted(kept, points, side='right') - 1, 0, len(kept) - 2)
+        left = kept[segment]
+        right = kept[segment + 1]
+        t = (frames - frames[left]) / (frames[right] - frames[left])
+        approx = values[left] + t[:, None] * (values[right] - values[left])
+        error = np.max(np.abs(values - approx), axis=1)
+        error[keep] = 0.0
+
+        over = np.flatnonzero(error > tolerance)
+        if not len(over):
+            return keep
+        # Keep the worst key of every segment that is over the tolerance
+        order = np.lexsort((error[over], segment[over]))
+        worst = over[order]
+        last = np.append(segment[worst][1:] != segment[worst][:-1], True)
+        keep[worst[last]] = True
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Resampling of keyed tracks to another frame rate. Tracks sharing their key frames are
+# stacked and resampled in one pass: plain channels are interpolated linearly, quaternions
+# are made continuous and interpolated with slerp, so every bone of a clip costs a few numpy
+# calls together. Only depends on numpy.
+import numpy as np
+
+try:
+    from . import rootmath
+except ImportError:
+    import rootmath
+
+
+def frame_grid(start, end, source_fps, target_fps):
+    '''Whole frames of the target rate covering [start, end], and the source frames they sample
+
+    The clip keeps its start frame, later frames are stretched by target_fps / source_fps.
+    The last frame is clamped to end when the duration is not a whole number of target frames.
+    '''
+    ratio = target_fps / source_fps
+    count = int(np.ceil((end - start) * ratio - 1e-6)) + 1
+    new_frames = start + np.arange(count, dtype=np.float64)
+    return new_frames, np.minimum(start + np.arange(count) / ratio, end)
+
+
+def segments(frames, sample_frames):
+    '''Key index before every sample frame and the fraction of the way to the next key'''
+    if len(frames) < 2:
+        return np.zeros(len(sample_frames), dtype=np.intp), np.zeros(len(sample_frames))
+    index = np.clip(np.searchsorted(frames, sample_frames, side='right') - 1, 0, len(frames) - 2)
+    t = (sample_frames - frames[index]) / (frames[index + 1] - frames[index])
+    return index, np.clip(t, 0.0, 1.0)
+
+
+def lerp_tracks(frames, values, sample_frames):
+    '''Samples (..., K) tracks keyed on frames (K,) at sample_frames, linear between keys'''
+    values = np.asarray(values, dtype=np.float64)
+    index, t = segments(frames, sample_frames)
+    if len(frames) < 2:
+        return values[..., index]
+    return values[..., index] + (values[..., index + 1] - values[..., index]) * t
+
+
+def slerp(a, b, t):
+    '''Spherical interpolation of (..., 4) unit quaternions, nlerp where they are almost equal'''
+    dot = np.sum(a * b, axis=-1)
+    b = np.where(dot[..., None] < 0, -b, b)
+    angle = np.arccos(np.clip(np.abs(dot), 0.0, 1.0))
+    sin = np.sin(angle)
+    small = sin < 1e-6
+    safe = np.where(small, 1.0, sin)
+    wa = np.where(small, 1.0 - t, np.sin((1.0 - t) * angle) / safe)
+    wb = np.where(small, t, np.sin(t * angle) / safe)
+    return rootmath.quat_normalize(wa[..., None] * a + wb[..., None] * b)
+
+
+def slerp_tracks(frames, quats, sample_frames):
+    '''Samples (..., K, 4) quaternion tracks keyed on frames (K,) at sample_frames with slerp
+
+    The keys are normalized and made continuous first and so is the result, so neighbouring
+    keys never take the long way around.
+    '''
+    quats = rootmath.quat_continuous(rootmath.quat_normalize(quats))
+    index, t = segments(frames, sample_frames)
+    if len(frames) < 2:
+        return quats[..., index, :]
+    t = np.broadcast_to(t, quats.shape[:-2] + t.shape)
+    return rootmath.quat_continuous(slerp(quats[..., index, :], quats[..., index + 1, :], t))
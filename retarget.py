@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Retargeting of mixamo clips onto a control rig without the mixamo addon's operator.
+# The bone mapping and the rest pose corrections are worked out once per pair of rigs,
+# every clip is then moved across as whole (bones, frames, 4) arrays. Only numpy is
+# needed, the blender side (reading rests and fcurves) is in mixamoroot.py.
+#
+# Rotations are transferred in world space: each target bone gets the same rotation away
+# from its rest pose as the source bone it is mapped to, whatever the bone rolls and rest
+# orientations of the two rigs are. Target bones without a source follow their parent and
+# are not keyed.
+import numpy as np
+
+try:
+    from . import rootmath
+except ImportError:
+    import rootmath
+
+
+CONTROL_PREFIX = "Ctrl_"
+
+# Mixamo bone (without its prefix) -> the control bone of the mixamo addon's control rig that
+# drives it. The deform bones of the control rig follow these through constraints, keys on
+# them would be overridden, so only control bones are keyed. Limbs are keyed on their FK
+# controls, the IK controls, poles and foot roll helpers are left alone (use the rig in FK
+# mode), as are the fingers, which have no control bones.
+CONTROL_BONES = {
+    'Hips': 'Ctrl_Hips',
+    'Spine': 'Ctrl_Spine',
+    'Spine1': 'Ctrl_Spine1',
+    'Spine2': 'Ctrl_Spine2',
+    'Neck': 'Ctrl_Neck',
+    'Head': 'Ctrl_Head',
+    'LeftShoulder': 'Ctrl_Shoulder_Left',
+    'LeftArm': 'Ctrl_Arm_FK_Left',
+    'LeftForeArm': 'Ctrl_ForeArm_FK_Left',
+    'LeftHand': 'Ctrl_Hand_FK_Left',
+    'LeftUpLeg': 'Ctrl_UpLeg_FK_Left',
+    'LeftLeg': 'Ctrl_Leg_FK_Left',
+    'LeftFoot': 'Ctrl_Foot_FK_Left',
+    'LeftToeBase': 'Ctrl_Toe_FK_Left',
+    'RightShoulder': 'Ctrl_Shoulder_Right',
+    'RightArm': 'Ctrl_Arm_FK_Right',
+    'RightForeArm': 'Ctrl_ForeArm_FK_Right',
+    'RightHand': 'Ctrl_Hand_FK_Right',
+    'RightUpLeg': 'Ctrl_UpLeg_FK_Right',
+    'RightLeg': 'Ctrl_Leg_FK_Right',
+    'RightFoot': 'Ctrl_Foot_FK_Right',
+    'RightToeBase': 'Ctrl_Toe_FK_Right',
+}
+
+
+def map_bones(source_names, target_names, source_prefix="mixamorig:", table=CONTROL_BONES):
+    '''Returns {target bone: source bone} for the control bones of table that both rigs have'''
+    sources = {}
+    for name in source_names:
+        if source_prefix and name.startswith(source_prefix):
+            sources.setdefault(name[len(source_prefix):], name)
+    targets = set(target_names)
+    return {control: sources[bone] for bone, control in table.items() if bone in sources and control in targets}
+
+
+class Rig:
+    '''Rest pose of an armature
+
+    names and parents (parent name or None) in any order, rest is a (B, 4) array of the
+    world space rest rotation of each bone (object rotation @ bone.matrix_local) and scale
+    the uniform scale of the armature object.
+    '''
+    def __init__(self, names, parents, rest, scale=1.0):
+        rest = np.asarray(rest, dtype=np.float64).reshape(-1, 4)
+        position = {name: i for i, name in enumerate(names)}
+        # Parents before children, so a single pass can accumulate down the hierarchy
+        depth = {}
+        def level(name):
+            if name not in depth:
+                parent = parents[position[name]]
+                depth[name] = 0 if parent is None or parent not in position else level(parent) + 1
+            return depth[name]
+        order = sorted(range(len(names)), key=lambda i: level(names[i]))
+
+        self.names = [names[i] for i in order]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.parents = np.array([self.index.get(parents[i], -1) if parents[i] is not None else -1 for i in order], dtype=np.int64)
+        self.rest = rootmath.quat_normalize(rest[order])
+        self.scale = float(scale)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class RetargetPlan:
+    '''Source to target bone mapping and rest corrections, built once and applied to every clip'''
+    def __init__(self, source, target, mapping):
+        self.source = source
+        self.target = target
+        self.mapping = {name: bone for name, bone in mapping.items() if name in target.index and bone in source.index}
+        self.source_of = np.array([source.index[self.mapping[name]] if name in self.mapping else -1 for name in target.names], dtype=np.int64)
+        self.mapped = self.source_of >= 0
+        self.source_rest_inverse = rootmath.quat_inverse(source.rest)
+        self.target_rest_inverse = rootmath.quat_inverse(target.rest)
+
+    def source_world(self, rotations):
+        # Rotation of every source bone away from its rest pose, in world space
+        local = rootmath.quat_multiply(rootmath.quat_multiply(self.source.rest[:, None], rotations), self.source_rest_inverse[:, None])
+        world = np.empty_like(local)
+        for bone, parent in enumerate(self.source.parents):
+            world[bone] = local[bone] if parent < 0 else rootmath.quat_multiply(world[parent], local[bone])
+        return world
+
+    def target_world(self, source_world):
+        # Mapped target bones copy their source, the rest follow their parent
+        frames = source_world.shape[1]
+        world = np.empty((len(self.target), frames, 4))
+        parent_world = np.empty_like(world)
+        for bone, parent in enumerate(self.target.parents):
+            parent_world[bone] = rootmath.IDENTITY if parent < 0 else world[parent]
+            source = self.source_of[bone]
+            world[bone] = source_world[source] if source >= 0 else parent_world[bone]
+        return world, parent_world
+
+    def apply(self, rotations, locations, has_location):
+        '''Retargets one clip
+
+        rotations is the (S, N, 4) rotation_quaternion and locations the (S, N, 3) location
+        of every source bone over N frames, has_location an (S,) bool array of the source
+        bones that have location keys. Returns the (T, N, 4) rotations and (T, N, 3)
+        locations of the target bones, and the (T,) masks of which of them are keyed.
+        '''
+        rotations = np.asarray(rotations, dtype=np.float64)
+        locations = np.asarray(locations, dtype=np.float64)
+        has_location = np.asarray(has_location, dtype=bool)
+
+        source_world = self.source_world(rotations)
+        world, parent_world = self.target_world(source_world)
+
+        # Back into each target bone's local space: rest^-1 @ parent^-1 @ world @ rest
+        parent_inverse = rootmath.quat_inverse(parent_world)
+        to_local = rootmath.quat_multiply(self.target_rest_inverse[:, None], parent_inverse)
+        target_rotations = rootmath.quat_multiply(rootmath.quat_multiply(to_local, world), self.target.rest[:, None])
+        for bone in range(len(self.target)):
+            target_rotations[bone] = rootmath.quat_continuous(target_rotations[bone])
+
+        # Locations are moved as world space offsets, scaled between the two armature objects
+        located = self.mapped & has_location[np.maximum(self.source_of, 0)]
+        target_locations = np.zeros((len(self.target),) + locations.shape[1:])
+        if np.any(located):
+            bones = self.source_of[located]
+            source_parents = self.source.parents[bones]
+            source_parent_world = np.where((source_parents >= 0)[:, None, None], source_world[np.maximum(source_parents, 0)], rootmath.IDENTITY)
+            offset = rootmath.quat_rotate(self.source.rest[bones][:, None], locations[bones])
+            offset = rootmath.quat_rotate(source_parent_world, offset) * self.source.scale
+            target_locations[located] = rootmath.quat_rotate(to_local[located], offset) / self.target.scale
+
+        return target_rotations, target_locations, self.mapped, located
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# What root insertion looks up on an armature for every clip, computed once per armature:
+# bone data paths and the hip rest rotation. RigContexts are kept by armature pointer
+# until forget() or clear(), which the batch calls when armatures are deleted and when it
+# ends, as blender may reuse the memory of a deleted armature for a new one. FCurveIndex
+# replaces the repeated scans of an action's fcurves with one dict per action.
+import numpy as np
+
+_contexts = {}
+
+
+def bone_path(bone_name, attribute):
+    return 'pose.bones["%s"].%s' % (bone_name, attribute)
+
+
+class RigContext:
+    '''Root insertion invariants of one armature with a given hip and root bone'''
+    def __init__(self, armature, hip_bone_name, root_bone_name):
+        bones = armature.data.bones
+        self.hip_bone_name = hip_bone_name
+        self.root_bone_name = root_bone_name
+        self.hip_location = bone_path(hip_bone_name, 'location')
+        self.hip_rotation = bone_path(hip_bone_name, 'rotation_quaternion')
+        self.root_location = bone_path(root_bone_name, 'location')
+        self.root_rotation = bone_path(root_bone_name, 'rotation_quaternion')
+        # Rest rotation of the hips in armature space, (w, x, y, z)
+        self.hip_rest = np.array(bones[hip_bone_name].matrix_local.to_quaternion())
+
+
+def rig_context(armature, hip_bone_name, root_bone_name):
+    key = (armature.as_pointer(), armature.data.as_pointer(), hip_bone_name, root_bone_name)
+    context = _contexts.get(key)
+    if context is None:
+        context = _contexts[key] = RigContext(armature, hip_bone_name, root_bone_name)
+    return context
+
+
+def forget(armature):
+    pointer = armature.as_pointer()
+    for key in [key for key in _contexts if key[0] == pointer]:
+        del _contexts[key]
+
+
+def clear():
+    _contexts.clear()
+
+
+class FCurveIndex:
+    '''The fcurves of an action by (data_path, array_index), built in one pass and kept up to date by new() and remove()'''
+    def __init__(self, action):
+        self.fcurves = action.fcurves
+        self.index = {(fcurve.data_path, fcurve.array_index): fcurve for fcurve in self.fcurves}
+
+    def get(self, data_path, array_index):
+        return self.index.get((data_path, array_index))
+
+    def find_all(self, data_path, count):
+        '''The fcurves of the first count channels of a property that exist, in channel order'''
+        return [fcurve for fcurve in (self.index.get((data_path, i)) for i in range(count)) if fcurve is not None]
+
+    def ensure(self, data_path, array_index, group):
+        fcurve = self.index.get((data_path, array_index))
+        if fcurve is None:
+            fcurve = self.index[(data_path, array_index)] = self.fcurves.new(data_path=data_path, index=array_index, action_group=group)
+        return fcurve
+
+    def remove(self, fcurve):
+        del self.index[(fcurve.data_path, fcurve.array_index)]
+        self.fcurves.remove(fcurve)
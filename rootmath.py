@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Batched quaternion math for the root motion split. This module only depends on numpy
+# so it can be imported, tested and timed outside of Blender.
+# Quaternions are stored (w, x, y, z) in the last axis, the same order as mathutils and
+# the rotation_quaternion fcurve array indices, and products follow mathutils' a @ b.
+import numpy as np
+
+
+IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+
+
+def quat_multiply(a, b):
+    '''Hamilton product a @ b of two (..., 4) quaternion arrays, broadcast over the leading axes'''
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ), axis=-1)
+
+
+def quat_conjugate(q):
+    q = np.asarray(q, dtype=np.float64)
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def quat_inverse(q):
+    '''Inverse of (..., 4) quaternions, matches Quaternion.inverted() for non unit quaternions too'''
+    q = np.asarray(q, dtype=np.float64)
+    norm_sq = np.sum(q * q, axis=-1, keepdims=True)
+    return quat_conjugate(q) / np.where(norm_sq > 0, norm_sq, 1.0)
+
+
+def quat_normalize(q):
+    '''Normalizes (..., 4) quaternions, zero length quaternions become the identity'''
+    q = np.asarray(q, dtype=np.float64)
+    norm = np.linalg.norm(q, axis=-1, keepdims=True)
+    return np.where(norm > 0, q / np.where(norm > 0, norm, 1.0), IDENTITY)
+
+
+def euler_to_quat(angles):
+    '''Converts (..., 3) angles in radians around Z, X and Y to (..., 4) quaternions, applied as X @ Y @ Z'''
+    half = np.asarray(angles, dtype=np.float64) / 2
+    c1, c2, c3 = np.moveaxis(np.cos(half), -1, 0)
+    s1, s2, s3 = np.moveaxis(np.sin(half), -1, 0)
+    return np.stack((
+        c1 * c2 * c3 - s1 * s2 * s3,
+        c1 * s2 * c3 + s1 * c2 * s3,
+        c1 * c2 * s3 - s1 * s2 * c3,
+        s1 * c2 * c3 + c1 * s2 * s3,
+    ), axis=-1)
+
+
+def decompose_quaternion(q):
+    '''Batched form of the half angle decomposition, takes and returns (..., 4) quaternions'''
+    q = quat_normalize(q)
+    w = np.sqrt(1 + q[..., 0]) / np.sqrt(2)
+    # w is 0 for -identity, a full turn with no axis, which decomposes to the identity
+    xyz = q[..., 1:] / np.where(w > 0, np.sqrt(2) * w, 1.0)[..., None]
+    return quat_normalize(np.concatenate((w[..., None], xyz), axis=-1))
+
+
+def split_root_rotation(hip_quats, hip_rest):
+    '''Splits a hip rotation track into a root yaw track and the remaining hip rotation
+
+    hip_quats is an (N, 4) array of hip pose rotations ordered by frame, hip_rest is the
+    rest rotation of the hip bone in armature space (bone.matrix_local.to_quaternion()).
+    Returns (root_quats, remainder), both (N, 4). The root track only keeps the rotation
+    around the armature Y axis and starts facing forward on the first frame, the yaw of
+    the first frame is left on the hips, so root_quats[i] @ remainder[i] gives back the
+    hip rotation of frame i in the root bone's frame.
+    '''
+    hip_quats = np.asarray(hip_quats, dtype=np.float64).reshape(-1, 4)
+    hip_rest = np.asarray(hip_rest, dtype=np.float64)
+
+    # hip_local @ hip_rest = hip_root_frame
+    hip_root_frame = quat_multiply(hip_quats, hip_rest)
+
+    # Pull out the Y axis component of the rotation for the root bone
+    root_quats = hip_root_frame * np.array([1.0, 0.0, 1.0, 0.0])
+    root_quats = quat_normalize(root_quats)
+
+    # Subtract the first frame's yaw so the root still points forward on clips where the
+    # hips are angled (e.g. strafe)
+    if len(root_quats):
+        root_quats = quat_multiply(quat_inverse(root_quats[0]), root_quats)
+
+    # hip_root_frame = root_quat (Y) @ remainder (XZ), then back to the hip frame
+    remainder = quat_multiply(quat_inverse(root_quats), hip_root_frame)
+    remainder = quat_multiply(remainder, quat_inverse(hip_rest))
+    return root_quats, remainder
+
+
+def matrix_to_quat(matrix):
+    '''Converts (..., 3, 3) rotation matrices (or the rotation part of 4x4 ones) to (..., 4) quaternions'''
+    m = np.asarray(matrix, dtype=np.float64)[..., :3, :3]
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+    trace = m00 + m11 + m22
+    # Pick the numerically largest of w, x, y, z to divide by
+    candidates = np.stack((trace, m00, m11, m22), axis=-1)
+    largest = np.argmax(candidates, axis=-1)
+    q = np.empty(m.shape[:-2] + (4,))
+    for case in range(4):
+        sel = largest == case
+        if not np.any(sel):
+            continue
+        s = m[sel]
+        if case == 0:
+            r = np.sqrt(1.0 + s[:, 0, 0] + s[:, 1, 1] + s[:, 2, 2]) * 2
+            q[sel] = np.stack((0.25 * r, (s[:, 2, 1] - s[:, 1, 2]) / r, (s[:, 0, 2] - s[:, 2, 0]) / r, (s[:, 1, 0] - s[:, 0, 1]) / r), axis=-1)
+        elif case == 1:
+            r = np.sqrt(1.0 + s[:, 0, 0] - s[:, 1, 1] - s[:, 2, 2]) * 2
+            q[sel] = np.stack(((s[:, 2, 1] - s[:, 1, 2]) / r, 0.25 * r, (s[:, 0, 1] + s[:, 1, 0]) / r, (s[:, 0, 2] + s[:, 2, 0]) / r), axis=-1)
+        elif case == 2:
+            r = np.sqrt(1.0 + s[:, 1, 1] - s[:, 0, 0] - s[:, 2, 2]) * 2
+            q[sel] = np.stack(((s[:, 0, 2] - s[:, 2, 0]) / r, (s[:, 0, 1] + s[:, 1, 0]) / r, 0.25 * r, (s[:, 1, 2] + s[:, 2, 1]) / r), axis=-1)
+        else:
+            r = np.sqrt(1.0 + s[:, 2, 2] - s[:, 0, 0] - s[:, 1, 1]) * 2
+            q[sel] = np.stack(((s[:, 1, 0] - s[:, 0, 1]) / r, (s[:, 0, 2] + s[:, 2, 0]) / r, (s[:, 1, 2] + s[:, 2, 1]) / r, 0.25 * r), axis=-1)
+    return quat_normalize(q)
+
+
+def quat_to_matrix(q):
+    '''Converts (..., 4) unit quaternions to (..., 3, 3) rotation matrices'''
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis=-1),
+        np.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis=-1),
+        np.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+
+def quat_continuous(q, reference=IDENTITY):
+    '''Flips the sign of quaternions in an (N, 4) track so each is in the same hemisphere as the one before
+
+    The first quaternion is compared against reference. The rotations are unchanged, only
+    the interpolation between neighbouring keys stops taking the long way around. A stack
+    of tracks (..., N, 4) is made continuous along N, every track on its own.
+    '''
+    q = np.asarray(q, dtype=np.float64)
+    if q.ndim < 2:
+        q = q.reshape(-1, 4)
+    if not q.shape[-2]:
+        return q.copy()
+    reference = np.broadcast_to(np.asarray(reference, dtype=np.float64), q[..., :1, :].shape)
+    previous = np.concatenate((reference, q[..., :-1, :]), axis=-2)
+    flips = np.sum(q * previous, axis=-1) < 0
+    # A flip of one key also flips its relation to the next one, so the signs accumulate
+    signs = np.cumprod(np.where(flips, -1.0, 1.0), axis=-1)
+    return q * signs[..., None]
+
+
+def quat_rotate(q, v):
+    '''Rotates (..., 3) vectors by (..., 4) unit quaternions, same as q @ v in mathutils'''
+    q = np.asarray(q, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    w = q[..., :1]
+    xyz = q[..., 1:]
+    t = 2 * np.cross(xyz, v)
+    return v + w * t + np.cross(xyz, t)
+
+
+def quat_to_euler(q):
+    '''Converts (..., 4) unit quaternions to (..., 3) 'XYZ' euler angles
+
+    Always returns the solution with the Y angle within +-90 degrees, Quaternion.to_euler
+    can pick the equivalent other one.
+    '''
+    m = quat_to_matrix(q)
+    cy = np.hypot(m[..., 0, 0], m[..., 1, 0])
+    # Gimbal lock, Z is folded into X like mathutils does
+    locked = cy <= 16 * np.finfo(np.float32).eps
+    x = np.where(locked, np.arctan2(-m[..., 1, 2], m[..., 1, 1]), np.arctan2(m[..., 2, 1], m[..., 2, 2]))
+    y = np.arctan2(-m[..., 2, 0], cy)
+    z = np.where(locked, 0.0, np.arctan2(m[..., 1, 0], m[..., 0, 0]))
+    return np.stack((x, y, z), axis=-1)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Root motion sidecar files: the root bone track of every action in one flat binary file
+# that a game runtime can memory map, so locomotion does not need the skeletal tracks.
+#
+# Layout, all little endian:
+#   header   16 bytes   magic b"MXRM", version u32, action count u32, record size u32 (floats)
+#   index    32 bytes per action, see INDEX_DTYPE
+#   names    utf-8 action names, referenced by offset and length from the index
+#   records  per action, frame_count records of RECORD_FIELDS float32, 16 byte aligned
+#
+# Every record holds the root translation and yaw of one frame, the change since the
+# previous frame (zero on the first) and the distance travelled on the ground plane so far.
+import numpy as np
+
+
+MAGIC = b"MXRM"
+VERSION = 1
+ALIGNMENT = 16
+
+RECORD_FIELDS = ('x', 'y', 'z', 'yaw', 'dx', 'dy', 'dz', 'dyaw', 'distance')
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('count', '<u4'), ('record_size', '<u4')])
+INDEX_DTYPE = np.dtype([
+    ('name_offset', '<u8'),
+    ('name_length', '<u4'),
+    ('frame_count', '<u4'),
+    ('start_frame', '<f4'),
+    ('fps', '<f4'),
+    ('data_offset', '<u8'),
+])
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def root_records(location, rotation, up_axis=1):
+    '''Builds the (N, 9) float32 records of a root track
+
+    location is the (N, 3) root bone location and rotation the (N, 4) root bone
+    rotation_quaternion of N consecutive frames, both in the root bone's space. Yaw is
+    the angle around up_axis, the root bone's Y axis (up for the root that copyHips keys).
+    '''
+    location = np.asarray(location, dtype=np.float64).reshape(-1, 3)
+    rotation = np.asarray(rotation, dtype=np.float64).reshape(-1, 4)
+    # Angle of the rotation around the up axis, unwrapped so turning on the spot keeps counting
+    yaw = np.unwrap(2 * np.arctan2(rotation[:, 1 + up_axis], rotation[:, 0]))
+
+    records = np.zeros((len(location), len(RECORD_FIELDS)), dtype=np.float32)
+    records[:, 0:3] = location
+    records[:, 3] = yaw
+    records[1:, 4:7] = np.diff(location, axis=0)
+    records[1:, 7] = np.diff(yaw)
+    ground = [axis for axis in range(3) if axis != up_axis]
+    records[1:, 8] = np.cumsum(np.linalg.norm(np.diff(location[:, ground], axis=0), axis=1))
+    return records
+
+
+def write(filepath, tracks):
+    '''Writes a sidecar file, tracks is a list of (name, start_frame, fps, records)'''
+    names = [name.encode('utf-8') for name, _, _, _ in tracks]
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, VERSION, len(tracks), len(RECORD_FIELDS))
+    index = np.zeros(len(tracks), dtype=INDEX_DTYPE)
+
+    offset = HEADER_DTYPE.itemsize + INDEX_DTYPE.itemsize * len(tracks)
+    for i, name in enumerate(names):
+        index[i]['name_offset'] = offset
+        index[i]['name_length'] = len(name)
+        offset += len(name)
+    for i, (_, start_frame, fps, records) in enumerate(tracks):
+        offset = _align(offset)
+        index[i]['frame_count'] = len(records)
+        index[i]['start_frame'] = start_frame
+        index[i]['fps'] = fps
+        index[i]['data_offset'] = offset
+        offset += len(records) * len(RECORD_FIELDS) * 4
+
+    with open(filepath, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(index.tobytes())
+        for name in names:
+            f.write(name)
+        for entry, (_, _, _, records) in zip(index, tracks):
+            f.write(b"\0" * (int(entry['data_offset']) - f.tell()))
+            f.write(np.ascontiguousarray(records, dtype='<f4').tobytes())
+
+
+def read(filepath):
+    '''Memory maps a sidecar file, returns {name: (start_frame, fps, records)}'''
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+    if header['magic'] != MAGIC or header['version'] != VERSION:
+        raise ValueError("%s is not a version %d root motion file" % (filepath, VERSION))
+    record_size = int(header['record_size'])
+    end = HEADER_DTYPE.itemsize + INDEX_DTYPE.itemsize * int(header['count'])
+    index = data[HEADER_DTYPE.itemsize:end].view(INDEX_DTYPE)
+
+    tracks = {}
+    for entry in index:
+        name_offset = int(entry['name_offset'])
+        name = bytes(data[name_offset:name_offset + int(entry['name_length'])]).decode('utf-8')
+        offset = int(entry['data_offset'])
+        count = int(entry['frame_count'])
+        records = data[offset:offset + count * record_size * 4].view('<f4').reshape(count, record_size)
+        tracks[name] = (float(entry['start_frame']), float(entry['fps']), records)
+    return tracks
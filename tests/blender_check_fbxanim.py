@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Checks fbxanim.read_animation against the blender fbx importer in background blender:
+#   blender -b --factory-startup -P tests/blender_check_fbxanim.py -- [--src DIR]
+# Every file is imported with bpy.ops.import_scene.fbx (default settings, like the addon),
+# the pose bone fcurves are evaluated at the frames read_animation returns and compared
+# with its values. Without --src the test fixtures are written for every rotation order.
+# Exits with 1 when a file differs by more than the tolerance.
+import argparse
+import os
+import sys
+import tempfile
+
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fbxanim
+import fbxfixture
+
+
+def imported_values(obj, bone, attribute, size, frames):
+    # (N, size) values of a pose bone attribute, the rest value where a channel has no fcurve
+    default = {'location': 0.0, 'scale': 1.0}.get(attribute)
+    values = np.zeros((len(frames), size))
+    for index in range(size):
+        fcurve = obj.animation_data.action.fcurves.find('pose.bones["%s"].%s' % (bone, attribute), index=index)
+        if fcurve is None:
+            values[:, index] = default if default is not None else (1.0 if index == 0 else 0.0)
+        else:
+            values[:, index] = [fcurve.evaluate(frame) for frame in frames]
+    return values
+
+
+def compare(filepath):
+    '''Largest (location, rotation, scale) difference between the importer and fbxanim, and missing bones'''
+    bpy.ops.wm.read_homefile(use_empty=True)
+    bpy.ops.import_scene.fbx(filepath=filepath)
+    armature = next(obj for obj in bpy.context.scene.objects if obj.type == 'ARMATURE')
+    render = bpy.context.scene.render
+    bones = fbxanim.read_animation(filepath, render.fps / render.fps_base)
+    errors, missing = np.zeros(3), []
+    for bone, (frames, location, rotation, scale) in bones.items():
+        if bone not in armature.pose.bones:
+            missing.append(bone)
+            continue
+        errors[0] = max(errors[0], np.abs(imported_values(armature, bone, 'location', 3, frames) - location).max())
+        # q and -q are the same rotation
+        dots = np.abs(np.sum(imported_values(armature, bone, 'rotation_quaternion', 4, frames) * rotation, axis=1))
+        errors[1] = max(errors[1], np.abs(1.0 - dots).max())
+        errors[2] = max(errors[2], np.abs(imported_values(armature, bone, 'scale', 3, frames) - scale).max())
+    return errors, missing
+
+
+def fixture_files(directory):
+    files = []
+    for order_index, order in enumerate(fbxfixture.EULER_ORDERS):
+        files.append(fbxfixture.two_bone_file(os.path.join(directory, 'order_%s.fbx' % order), fbxfixture.HIPS_KEYS,
+                                              fbxfixture.SPINE_KEYS, rotation_order=order_index))
+    files.append(fbxfixture.two_bone_file(os.path.join(directory, 'compressed.fbx'), fbxfixture.HIPS_KEYS,
+                                          fbxfixture.SPINE_KEYS, compress=True))
+    return files
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Compares fbxanim.read_animation with the blender fbx importer")
+    parser.add_argument("--src", help="directory of fbx files to check, the test fixtures when not given")
+    parser.add_argument("--location-tolerance", type=float, default=1e-3, help="largest location difference")
+    parser.add_argument("--rotation-tolerance", type=float, default=1e-5, help="largest 1 - |dot| of the quaternions")
+    parser.add_argument("--scale-tolerance", type=float, default=1e-5, help="largest scale difference")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    tolerance = np.array([args.location_tolerance, args.rotation_tolerance, args.scale_tolerance])
+    with tempfile.TemporaryDirectory() as directory:
+        if args.src:
+            files = sorted(os.path.join(args.src, file) for file in os.listdir(args.src) if file.lower().endswith('.fbx'))
+        else:
+            files = fixture_files(directory)
+        failed = 0
+        for filepath in files:
+            errors, missing = compare(filepath)
+            ok = not missing and np.all(errors <= tolerance)
+            failed += not ok
+            print("[Mixamo Root] %s %s: location %.2e rotation %.2e scale %.2e%s" % (
+                "ok" if ok else "MISMATCH", os.path.basename(filepath), *errors,
+                " missing bones %s" % ", ".join(missing) if missing else ""))
+    print("[Mixamo Root] %d of %d files match the importer" % (len(files) - failed, len(files)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+# Writer of small binary FBX files for the fbxanim tests: a two bone armature with one take,
+# in the layout mixamo exports (LimbNode models, Lcl properties, one curve node per property
+# and one curve per channel). Only numpy is needed, the same file is imported by the blender
+# check in blender_check_fbxanim.py.
+import struct
+import zlib
+
+import numpy as np
+
+FBX_KTIME = 46186158000
+MAGIC = b'Kaydara FBX Binary  \x00\x1a\x00'
+EULER_ORDERS = ('XYZ', 'XZY', 'YZX', 'YXZ', 'ZXY', 'ZYX')
+
+HIPS, SPINE, STACK, LAYER = 1001, 1002, 2001, 2002
+
+# Hips walk 10 units along X in the first second and rise 10 in the next one, the spine
+# turns around X and Y with keys at other times than the hips
+HIPS_KEYS = {0: ([0.0, 1.0, 2.0], [0.0, 10.0, 10.0]),
+             1: ([0.0, 1.0, 2.0], [100.0, 100.0, 110.0])}
+SPINE_KEYS = {0: ([0.0, 0.5, 2.0], [0.0, 30.0, 30.0]),
+              1: ([0.0, 0.5, 2.0], [0.0, 45.0, 90.0]),
+              2: ([0.0, 0.5, 2.0], [0.0, 20.0, 0.0])}
+
+
+class Array:
+    '''An array property, code 'd', 'f', 'l' or 'i', zlib compressed with compress'''
+    def __init__(self, code, values, compress=False):
+        self.code = code
+        self.values = np.asarray(values, dtype={'d': '<f8', 'f': '<f4', 'l': '<i8', 'i': '<i4'}[code])
+        self.compress = compress
+
+
+def _prop(value):
+    if isinstance(value, Array):
+        data = value.values.tobytes()
+        if value.compress:
+            data = zlib.compress(data)
+        return value.code.encode() + struct.pack('<III', len(value.values), 1 if value.compress else 0, len(data)) + data
+    if isinstance(value, bytes):
+        return b'S' + struct.pack('<I', len(value)) + value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+        return b'S' + struct.pack('<I', len(value)) + value
+    if isinstance(value, float):
+        return b'D' + struct.pack('<d', value)
+    if isinstance(value, bool):
+        return b'C' + struct.pack('<?', value)
+    if -2 ** 31 <= value < 2 ** 31 and not isinstance(value, Id):
+        return b'I' + struct.pack('<i', value)
+    return b'L' + struct.pack('<q', value)
+
+
+class Id(int):
+    '''Object ids are written as 64 bit integers whatever their size'''
+
+
+def _record(name, props, children, offset, wide):
+    header = struct.Struct('<QQQ' if wide else '<III')
+    prop_data = b''.join(_prop(p) for p in props)
+    body_start = offset + header.size + 1 + len(name) + len(prop_data)
+    child_data = b''
+    for child in children:
+        child_data += _record(*child, body_start + len(child_data), wide)
+    if children:
+        child_data += b'\x00' * (header.size + 1)
+    end = body_start + len(child_data)
+    return header.pack(end, len(props), len(prop_data)) + bytes([len(name)]) + name + prop_data + child_data
+
+
+def write(filepath, nodes, version=7400):
+    '''Writes nodes, (name, props, children) tuples, as the top level records of a binary FBX'''
+    wide = version >= 7500
+    data = MAGIC + struct.pack('<I', version)
+    for node in nodes:
+        data += _record(*node, len(data), wide)
+    data += b'\x00' * ((25 if wide else 13) + 160)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return filepath
+
+
+def p70(name, *values, kind=b'Lcl Translation'):
+    return (b'P', [name, kind, b'', b'A'] + list(values), [])
+
+
+def model(model_id, name, translation=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), rotation_order=0, pre_rotation=None):
+    props = [p70(b'Lcl Translation', *map(float, translation)),
+             p70(b'Lcl Rotation', *map(float, rotation), kind=b'Lcl Rotation'),
+             p70(b'Lcl Scaling', 1.0, 1.0, 1.0, kind=b'Lcl Scaling')]
+    if rotation_order or pre_rotation is not None:
+        props += [p70(b'RotationActive', 1, kind=b'bool'), p70(b'RotationOrder', rotation_order, kind=b'enum')]
+    if pre_rotation is not None:
+        props.append(p70(b'PreRotation', *map(float, pre_rotation), kind=b'Vector3D'))
+    return (b'Model', [Id(model_id), name.encode() + b'\x00\x01Model', b'LimbNode'],
+            [(b'Version', [232], []), (b'Properties70', [], props)])
+
+
+def curve(curve_id, seconds, values, compress=False):
+    times = np.round(np.asarray(seconds, dtype=np.float64) * FBX_KTIME).astype(np.int64)
+    return (b'AnimationCurve', [Id(curve_id), b'\x00\x01AnimCurve', b''],
+            [(b'Default', [0.0], []), (b'KeyVer', [4009], []),
+             (b'KeyTime', [Array('l', times, compress)], []),
+             (b'KeyValueFloat', [Array('f', values, compress)], [])])
+
+
+def animated_property(objects, connections, model_id, prop, node_id, keys, compress=False):
+    '''Adds a curve node for prop of a model, keys maps channel 0-2 to (seconds, values)'''
+    objects.append((b'AnimationCurveNode', [Id(node_id), b'\x00\x01AnimCurveNode', b''], []))
+    connections.append((b'C', [b'OO', Id(node_id), Id(LAYER)], []))
+    connections.append((b'C', [b'OP', Id(node_id), Id(model_id), prop], []))
+    for channel, (seconds, values) in keys.items():
+        curve_id = node_id * 10 + channel
+        objects.append(curve(curve_id, seconds, values, compress))
+        connections.append((b'C', [b'OP', Id(curve_id), Id(node_id), (b'd|X', b'd|Y', b'd|Z')[channel]], []))
+
+
+def two_bone_file(filepath, hips_keys, spine_keys, rotation_order=0, version=7400, compress=False, prefix='mixamorig:'):
+    '''Hips at (0, 100, 0) with Spine 10 units above, hips_keys animate the hip translation and
+    spine_keys the spine rotation in degrees, both {channel: (seconds, values)}'''
+    objects = [model(HIPS, prefix + 'Hips', translation=(0, 100, 0)),
+               model(SPINE, prefix + 'Spine', translation=(0, 10, 0), rotation_order=rotation_order),
+               (b'AnimationStack', [Id(STACK), b'Take 001\x00\x01AnimStack', b''], []),
+               (b'AnimationLayer', [Id(LAYER), b'BaseLayer\x00\x01AnimLayer', b''], [])]
+    connections = [(b'C', [b'OO', Id(HIPS), Id(0)], []), (b'C', [b'OO', Id(SPINE), Id(HIPS)], []),
+                   (b'C', [b'OO', Id(LAYER), Id(STACK)], [])]
+    animated_property(objects, connections, HIPS, b'Lcl Translation', 3001, hips_keys, compress)
+    animated_property(objects, connections, SPINE, b'Lcl Rotation', 3002, spine_keys, compress)
+    # Y up, -Z forward and centimeters like mixamo, 30 fps
+    settings = [p70(b'UpAxis', 1, kind=b'int'), p70(b'UpAxisSign', 1, kind=b'int'),
+                p70(b'FrontAxis', 2, kind=b'int'), p70(b'FrontAxisSign', 1, kind=b'int'),
+                p70(b'CoordAxis', 0, kind=b'int'), p70(b'CoordAxisSign', 1, kind=b'int'),
+                p70(b'UnitScaleFactor', 1.0, kind=b'double'), p70(b'TimeMode', 6, kind=b'enum')]
+    nodes = [(b'FBXHeaderExtension', [], [(b'FBXVersion', [version], [])]),
+             (b'GlobalSettings', [], [(b'Version', [1000], []), (b'Properties70', [], settings)]),
+             (b'Objects', [], objects),
+             (b'Connections', [], connections)]
+    return write(filepath, nodes, version)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+
+import numpy as np
+
+import cache
+
+
+def curves(seed, count=4, keys=200):
+    rng = np.random.default_rng(seed)
+    return [{'data_path': 'pose.bones["Hips"].location', 'index': i, 'group': 'Hips',
+             'co': rng.normal(size=(keys, 2)), 'handle_left': rng.normal(size=(keys, 2)), 'handle_right': rng.normal(size=(keys, 2)),
+             'interpolation': np.zeros(keys, dtype=np.int32), 'handle_left_type': np.zeros(keys, dtype=np.int32),
+             'handle_right_type': np.zeros(keys, dtype=np.int32)} for i in range(count)]
+
+
+def test_store_and_load(tmp_path):
+    clip_cache = cache.ClipCache(str(tmp_path))
+    stored = curves(0)
+    clip_cache.store('a', stored)
+    loaded = clip_cache.load('a')
+    assert [(c['data_path'], c['index'], c['group']) for c in loaded] == [(c['data_path'], c['index'], c['group']) for c in stored]
+    for a, b in zip(stored, loaded):
+        np.testing.assert_array_equal(a['co'], b['co'])
+        np.testing.assert_array_equal(a['interpolation'], b['interpolation'])
+    assert clip_cache.load('missing') is None
+
+
+def test_size_is_tracked_and_the_directory_listed_only_to_evict(tmp_path, monkeypatch):
+    probe = cache.ClipCache(str(tmp_path / 'probe'))
+    probe.store('x', curves(0))
+    entry_size = os.path.getsize(probe.path('x'))
+
+    clip_cache = cache.ClipCache(str(tmp_path / 'cache'), max_size=int(entry_size * 5.5))
+    monkeypatch.setattr(cache, 'EVICT_RATIO', 0.5)
+    listings = []
+    listdir = os.listdir
+    monkeypatch.setattr(cache.os, 'listdir', lambda path: listings.append(path) or listdir(path))
+    for i in range(20):
+        clip_cache.store(str(i), curves(i))
+        # Oldest first, whatever the file system's time resolution
+        os.utime(clip_cache.path(str(i)), (i, i))
+    # One listing for the first store, then one per eviction, each freeing room for three entries
+    assert len(listings) <= 6
+    on_disk = sum(size for _, size, _ in clip_cache.entries())
+    assert on_disk <= clip_cache.max_size
+    assert clip_cache.size == on_disk
+    assert '19' in clip_cache and '0' not in clip_cache
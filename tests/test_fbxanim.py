@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+import pytest
+
+import dedup
+import fbxanim
+import prescan
+import rootmath
+
+import fbxfixture
+
+HIPS_KEYS, SPINE_KEYS = fbxfixture.HIPS_KEYS, fbxfixture.SPINE_KEYS
+
+
+def axis_angle(axis, degrees):
+    angle = np.radians(degrees)
+    return np.concatenate(([np.cos(angle / 2)], np.sin(angle / 2) * np.asarray(axis, dtype=np.float64)))
+
+
+def euler_quat(degrees, order):
+    # Order 'XYZ' turns around X first, the quaternion of the last axis is on the left
+    axes = {'X': (1, 0, 0), 'Y': (0, 1, 0), 'Z': (0, 0, 1)}
+    q = rootmath.IDENTITY
+    for axis in order:
+        q = rootmath.quat_multiply(axis_angle(axes[axis], degrees['XYZ'.index(axis)]), q)
+    return q
+
+
+def same_rotation(a, b, atol=1e-6):
+    np.testing.assert_allclose(np.abs(np.sum(a * b, axis=-1)), 1.0, atol=atol)
+
+
+@pytest.fixture
+def two_bone(tmp_path):
+    def write(name='clip.fbx', **kwargs):
+        return fbxfixture.two_bone_file(str(tmp_path / name), HIPS_KEYS, SPINE_KEYS, **kwargs)
+    return write
+
+
+def test_key_times_become_frames_after_the_offset(two_bone):
+    bones = fbxanim.read_animation(two_bone(), 30.0)
+    assert sorted(bones) == ['mixamorig:Hips', 'mixamorig:Spine']
+    # The importer puts the first key on frame 1
+    np.testing.assert_allclose(bones['mixamorig:Hips'][0], [1.0, 31.0, 61.0])
+    np.testing.assert_allclose(bones['mixamorig:Spine'][0], [1.0, 16.0, 61.0])
+    np.testing.assert_allclose(fbxanim.read_animation(two_bone(), 24.0)['mixamorig:Hips'][0], [1.0, 25.0, 49.0])
+    np.testing.assert_allclose(fbxanim.read_animation(two_bone(), 30.0, anim_offset=0.0)['mixamorig:Hips'][0], [0.0, 30.0, 60.0])
+
+
+def test_location_is_relative_to_the_rest_pose(two_bone):
+    frames, location, rotation, scale = fbxanim.read_animation(two_bone(), 30.0)['mixamorig:Hips']
+    np.testing.assert_allclose(location, [[0, 0, 0], [10, 0, 0], [10, 10, 0]], atol=1e-5)
+    np.testing.assert_allclose(rotation, np.tile(rootmath.IDENTITY, (3, 1)), atol=1e-9)
+    np.testing.assert_allclose(scale, np.ones((3, 3)))
+
+
+def test_channels_are_interpolated_linearly_between_keys(tmp_path):
+    # Y keyed at 0 and 2 seconds only, X adds a key at 1 second
+    path = fbxfixture.two_bone_file(str(tmp_path / 'clip.fbx'), {0: ([0.0, 1.0, 2.0], [0.0, 10.0, 10.0]),
+                                                                  1: ([0.0, 2.0], [100.0, 120.0])}, SPINE_KEYS)
+    frames, location, _, _ = fbxanim.read_animation(path, 30.0)['mixamorig:Hips']
+    np.testing.assert_allclose(frames, [1.0, 31.0, 61.0])
+    np.testing.assert_allclose(location[:, 1], [0.0, 10.0, 20.0], atol=1e-5)
+
+
+@pytest.mark.parametrize('order_index', range(6))
+def test_rotation_order(two_bone, order_index):
+    order = fbxfixture.EULER_ORDERS[order_index]
+    frames, _, rotation, _ = fbxanim.read_animation(two_bone(rotation_order=order_index), 30.0)['mixamorig:Spine']
+    for key, degrees in enumerate([(0, 0, 0), (30, 45, 20), (30, 90, 0)]):
+        same_rotation(rotation[key], euler_quat(degrees, order))
+
+
+def test_rotation_order_changes_the_pose(two_bone):
+    xyz = fbxanim.read_animation(two_bone('xyz.fbx'), 30.0)['mixamorig:Spine'][2]
+    zyx = fbxanim.read_animation(two_bone('zyx.fbx', rotation_order=5), 30.0)['mixamorig:Spine'][2]
+    assert np.abs(np.sum(xyz[1] * zyx[1])) < 0.999
+
+
+def test_compressed_arrays_and_7500_headers_read_the_same(two_bone):
+    plain = fbxanim.read_animation(two_bone(), 30.0)
+    for kwargs in ({'compress': True}, {'version': 7500}):
+        other = fbxanim.read_animation(two_bone('other.fbx', **kwargs), 30.0)
+        assert sorted(other) == sorted(plain)
+        for name in plain:
+            for a, b in zip(plain[name], other[name]):
+                np.testing.assert_allclose(a, b)
+
+
+def test_skeleton_animation_matches_read_animation(two_bone):
+    path = two_bone()
+    root, version = fbxanim.parse(path)
+    assert version == 7400
+    parsed = fbxanim.skeleton_animation(fbxanim.Skeleton(root), 30.0)
+    for name, values in fbxanim.read_animation(path, 30.0).items():
+        for a, b in zip(values, parsed[name]):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_not_binary_fbx(tmp_path):
+    path = tmp_path / 'ascii.fbx'
+    path.write_text('; FBX 7.4.0 project file\n')
+    with pytest.raises(fbxanim.FBXError):
+        fbxanim.parse(str(path))
+
+
+@pytest.mark.parametrize('keep', [30, 200, 0.5])
+def test_truncated_file(two_bone, keep):
+    path = two_bone()
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:int(len(data) * keep) if isinstance(keep, float) else keep])
+    with pytest.raises(fbxanim.FBXError):
+        fbxanim.read_animation(path, 30.0)
+
+
+def test_corrupt_compressed_array(two_bone):
+    path = two_bone(compress=True)
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    # Break the zlib stream of the first compressed array right after its header
+    start = data.index(b'x\x9c')
+    data[start:start + 8] = b'\xff' * 8
+    with open(path, 'wb') as f:
+        f.write(bytes(data))
+    with pytest.raises(fbxanim.FBXError):
+        fbxanim.read_animation(path, 30.0)
+
+
+def test_unreadable_files_are_reported_not_raised(tmp_path, two_bone):
+    path = two_bone('broken.fbx')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    assert dedup.fingerprint_file(path) is None
+    entry = prescan.scan_file(str(tmp_path), 'broken.fbx', fingerprint=True)
+    assert entry['error'].startswith('unreadable fbx')
+
+
+def test_prescan_reads_the_fixture(tmp_path, two_bone):
+    two_bone()
+    entry = prescan.scan_file(str(tmp_path), 'clip.fbx', fingerprint=True)
+    assert entry['error'] is None
+    assert entry['prefix'] == 'mixamorig:'
+    assert entry['animated_bones'] == 2
+    assert (entry['frame_start'], entry['frame_end']) == (1, 61)
+
+
+def test_missing_files_are_reported_not_raised(tmp_path):
+    assert dedup.fingerprint_file(str(tmp_path / 'gone.fbx')) is None
+    entry = prescan.scan_file(str(tmp_path), 'gone.fbx')
+    assert entry['error'].startswith('unreadable file')
+    assert entry['mtime'] is None
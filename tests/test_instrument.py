@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import pytest
+
+import instrument
+
+
+class Clock:
+    '''perf_counter that only moves when told to'''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(instrument.time, 'perf_counter', clock)
+    monkeypatch.setattr(instrument, '_rss', lambda: 0)
+    yield clock
+    while instrument.active():
+        instrument.stop()
+
+
+def test_nested_stages_record_exclusive_time(clock):
+    recorder = instrument.start("import")
+    with instrument.file("walk.fbx"):
+        with instrument.stage("import_animation"):
+            clock.now += 1.0
+            with instrument.stage("fixBones"):
+                clock.now += 2.0
+                with instrument.stage("scaleAll"):
+                    clock.now += 4.0
+            clock.now += 8.0
+    instrument.stop(recorder)
+    stages = recorder.files[0]['stages']
+    assert {name: stage['seconds'] for name, stage in stages.items()} == {'import_animation': 9.0, 'fixBones': 2.0, 'scaleAll': 4.0}
+    assert sum(stage['seconds'] for stage in stages.values()) == recorder.files[0]['seconds'] == 15.0
+
+
+def test_timed_functions_nest(clock):
+    @instrument.timed()
+    def inner():
+        clock.now += 1.0
+
+    @instrument.timed()
+    def outer():
+        clock.now += 1.0
+        inner()
+        inner()
+
+    recorder = instrument.start("import")
+    outer()
+    instrument.stop()
+    assert recorder.batch_stages['outer']['seconds'] == 1.0
+    assert recorder.batch_stages['inner'] == {'seconds': 2.0, 'rss_delta': 0, 'calls': 2}
+
+
+def test_a_batch_started_during_another_hands_back_when_it_stops(clock):
+    imported = instrument.start("import")
+    with instrument.stage("prescan"):
+        clock.now += 1.0
+    # An apply run between two steps of a modal import
+    applied = instrument.start("apply")
+    assert instrument.active() is applied
+    with instrument.stage("retarget_action"):
+        clock.now += 2.0
+    instrument.stop(applied)
+    assert instrument.active() is imported
+    with instrument.stage("dedup"):
+        clock.now += 4.0
+    instrument.stop(imported)
+    assert instrument.active() is None
+    assert list(imported.batch_stages) == ['prescan', 'dedup']
+    assert list(applied.batch_stages) == ['retarget_action']
+
+
+def test_stages_without_a_batch_do_nothing(clock):
+    with instrument.stage("prescan"):
+        clock.now += 1.0
+    assert instrument.stop() is None
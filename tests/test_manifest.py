@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import manifest
+
+
+class Action(dict):
+    '''Stands in for a bpy action, custom properties are item access'''
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+def test_linked_copies_are_exported_under_their_names():
+    walk, run = Action('Walk'), Action('Run')
+    manifest.link_duplicates(walk, ['Walk copy.fbx'])
+    manifest.link_duplicates(walk, ['sub/Walking.fbx'])
+    assert manifest.duplicate_names(walk) == ['Walk copy', 'Walking']
+    assert manifest.duplicate_names(run) == []
+    assert manifest.export_names([walk, run]) == [('Walk', walk), ('Walk copy', walk), ('Walking', walk), ('Run', run)]
+
+
+def test_plan_finds_removed_files_in_subdirectories(tmp_path):
+    source = tmp_path / 'clips'
+    (source / 'sub').mkdir(parents=True)
+    for file in ('kept.fbx', 'sub/kept.fbx'):
+        (source / file).write_bytes(b'fbx')
+    files = ['kept.fbx', 'sub/kept.fbx']
+    entries = {manifest.key(str(source), file): manifest.entry(str(source / file), []) for file in files}
+    for file in ('gone.fbx', 'sub/gone.fbx', 'sub/deeper/gone.fbx'):
+        entries[manifest.key(str(source), file)] = dict(entries[manifest.key(str(source), 'kept.fbx')])
+    # Entries of another directory, even one whose name starts the same, are not this import's
+    entries[str(tmp_path / 'clips2' / 'gone.fbx')] = {}
+    new, changed, unchanged, removed = manifest.plan(str(source), files, entries, [])
+    assert (new, changed, unchanged) == ([], [], files)
+    assert sorted(removed) == sorted(manifest.key(str(source), file) for file in ('gone.fbx', 'sub/gone.fbx', 'sub/deeper/gone.fbx'))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+
+import retarget
+import rootmath
+
+SOURCE = ['mixamorig:Hips', 'mixamorig:Spine', 'mixamorig:LeftArm', 'mixamorig:LeftHandIndex1']
+# Part of the mixamo control rig: control bones, FK and IK limb controls and the deform bones
+# the constraints drive, which keep their mixamo names
+CONTROL = ['Ctrl_Master', 'Ctrl_Hips', 'Ctrl_Spine', 'Ctrl_Arm_FK_Left', 'Ctrl_Arm_IK_Left', 'Ctrl_Hand_IK_Left',
+           'mixamorig:Hips', 'mixamorig:Spine', 'mixamorig:LeftArm', 'mixamorig:LeftHandIndex1']
+
+
+def test_map_bones_only_keys_control_bones():
+    mapping = retarget.map_bones(SOURCE, CONTROL)
+    assert mapping == {'Ctrl_Hips': 'mixamorig:Hips', 'Ctrl_Spine': 'mixamorig:Spine', 'Ctrl_Arm_FK_Left': 'mixamorig:LeftArm'}
+
+
+def test_map_bones_other_prefix():
+    source = [name.replace('mixamorig:', 'mixamorig1:') for name in SOURCE]
+    assert retarget.map_bones(source, CONTROL, source_prefix='mixamorig1:')['Ctrl_Hips'] == 'mixamorig1:Hips'
+    assert retarget.map_bones(source, CONTROL) == {}
+
+
+def test_control_bones_are_control_rig_bones():
+    for bone, control in retarget.CONTROL_BONES.items():
+        assert control.startswith(retarget.CONTROL_PREFIX)
+        assert ':' not in bone
+
+
+def chain_rig(names, rest):
+    return retarget.Rig(names, [None] + names[:-1], rest)
+
+
+def test_plan_same_rest_copies_rotations():
+    rng = np.random.default_rng(0)
+    rest = rootmath.quat_normalize(rng.normal(size=(2, 4)))
+    source = chain_rig(['mixamorig:Hips', 'mixamorig:Spine'], rest)
+    target = chain_rig(['Ctrl_Hips', 'Ctrl_Spine'], rest)
+    plan = retarget.RetargetPlan(source, target, retarget.map_bones(source.names, target.names))
+    rotations = rootmath.quat_normalize(rng.normal(size=(2, 5, 4)))
+    locations = rng.normal(size=(2, 5, 3))
+    target_rotations, target_locations, rotated, located = plan.apply(rotations, locations, np.array([True, False]))
+    assert rotated.tolist() == [True, True]
+    assert located.tolist() == [True, False]
+    # Same rotations up to sign
+    dots = np.abs(np.sum(target_rotations * rotations, axis=-1))
+    np.testing.assert_allclose(dots, 1.0, atol=1e-9)
+    np.testing.assert_allclose(target_locations[0], locations[0], atol=1e-9)
+
+
+def test_plan_unmapped_bones_are_not_keyed():
+    rest = np.tile(rootmath.IDENTITY, (3, 1))
+    source = chain_rig(['mixamorig:Hips', 'mixamorig:Spine', 'mixamorig:Spine1'], rest)
+    target = chain_rig(['Ctrl_Hips', 'mixamorig:Spine', 'Ctrl_Spine1'], rest)
+    plan = retarget.RetargetPlan(source, target, retarget.map_bones(source.names, target.names))
+    rotations = np.tile(rootmath.IDENTITY, (3, 2, 1))
+    _, _, rotated, located = plan.apply(rotations, np.zeros((3, 2, 3)), np.zeros(3, dtype=bool))
+    assert rotated.tolist() == [True, False, True]
+    assert not located.any()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+'''
+    Copyright (C) 2022  Richard Perry
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+import pytest
+
+import rootmath
+
+
+def random_quats(count, seed=0):
+    return rootmath.quat_normalize(np.random.default_rng(seed).normal(size=(count, 4)))
+
+
+def axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64)
+    return np.concatenate(([np.cos(angle / 2)], np.sin(angle / 2) * axis / np.linalg.norm(axis)))
+
+
+def same_rotation(a, b, atol=1e-9):
+    # q and -q are the same rotation
+    np.testing.assert_allclose(np.abs(np.sum(a * b, axis=-1)), 1.0, atol=atol)
+
+
+def test_multiply_identity_and_inverse():
+    q = random_quats(8)
+    np.testing.assert_allclose(rootmath.quat_multiply(rootmath.IDENTITY, q), q)
+    np.testing.assert_allclose(rootmath.quat_multiply(q, rootmath.quat_inverse(q)), np.tile(rootmath.IDENTITY, (8, 1)), atol=1e-12)
+
+
+def test_multiply_matches_matrices():
+    a, b = random_quats(5, 1), random_quats(5, 2)
+    np.testing.assert_allclose(rootmath.quat_to_matrix(rootmath.quat_multiply(a, b)),
+                               rootmath.quat_to_matrix(a) @ rootmath.quat_to_matrix(b), atol=1e-12)
+
+
+def test_inverse_of_non_unit_quaternion():
+    q = np.array([2.0, 0.0, 0.0, 0.0])
+    np.testing.assert_allclose(rootmath.quat_inverse(q), [0.5, 0.0, 0.0, 0.0])
+
+
+def test_normalize_zero_length_is_identity():
+    q = rootmath.quat_normalize(np.array([[0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 3.0, 0.0]]))
+    np.testing.assert_allclose(q, [[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]])
+
+
+def test_matrix_round_trip():
+    q = random_quats(50, 3)
+    same_rotation(rootmath.matrix_to_quat(rootmath.quat_to_matrix(q)), q)
+
+
+@pytest.mark.parametrize('axis', [(1, 0, 0), (0, 1, 0), (0, 0, 1)])
+def test_matrix_to_quat_half_turns(axis):
+    # w is 0, the other branches of the conversion are taken
+    q = axis_angle(axis, np.pi)
+    same_rotation(rootmath.matrix_to_quat(rootmath.quat_to_matrix(q)), q)
+
+
+def test_euler_to_quat_axes():
+    # The angles are around Z, X and Y, applied as X @ Y @ Z
+    same_rotation(rootmath.euler_to_quat([0.5, 0.0, 0.0]), axis_angle((0, 0, 1), 0.5))
+    same_rotation(rootmath.euler_to_quat([0.0, 0.5, 0.0]), axis_angle((1, 0, 0), 0.5))
+    same_rotation(rootmath.euler_to_quat([0.0, 0.0, 0.5]), axis_angle((0, 1, 0), 0.5))
+    z, x, y = 0.3, 0.5, 0.7
+    expected = rootmath.quat_multiply(rootmath.quat_multiply(axis_angle((1, 0, 0), x), axis_angle((0, 1, 0), y)), axis_angle((0, 0, 1), z))
+    same_rotation(rootmath.euler_to_quat([z, x, y]), expected)
+
+
+def test_quat_to_euler_round_trip():
+    # 'XYZ' euler angles are applied as Z @ Y @ X
+    for x, y, z in np.random.default_rng(4).uniform(-1.4, 1.4, size=(20, 3)):
+        q = rootmath.quat_multiply(rootmath.quat_multiply(axis_angle((0, 0, 1), z), axis_angle((0, 1, 0), y)), axis_angle((1, 0, 0), x))
+        np.testing.assert_allclose(rootmath.quat_to_euler(q), [x, y, z], atol=1e-9)
+
+
+def test_quat_to_euler_gimbal_lock():
+    angles = rootmath.quat_to_euler(axis_angle((0, 1, 0), np.pi / 2))
+    assert np.all(np.isfinite(angles))
+    np.testing.assert_allclose(angles[1], np.pi / 2)
+
+
+def test_rotate_matches_matrix():
+    q = random_quats(6, 5)
+    v = np.random.default_rng(6).normal(size=(6, 3))
+    np.testing.assert_allclose(rootmath.quat_rotate(q, v), np.einsum('nij,nj->ni', rootmath.quat_to_matrix(q), v), atol=1e-12)
+
+
+def test_rotate_zero_length_vector():
+    np.testing.assert_allclose(rootmath.quat_rotate(random_quats(3), np.zeros((3, 3))), np.zeros((3, 3)))
+
+
+def test_continuous_flips_signs():
+    q = random_quats(10, 7)
+    flipped = q * np.where(np.arange(10) % 3 == 0, -1.0, 1.0)[:, None]
+    continuous = rootmath.quat_continuous(flipped)
+    same_rotation(continuous, q)
+    assert np.all(np.sum(continuous[1:] * continuous[:-1], axis=-1) >= 0)
+    assert np.dot(continuous[0], rootmath.IDENTITY) >= 0
+
+
+def test_continuous_stack_and_empty():
+    q = random_quats(12, 8).reshape(3, 4, 4)
+    stacked = rootmath.quat_continuous(-q)
+    for track in range(3):
+        np.testing.assert_allclose(stacked[track], rootmath.quat_continuous(-q[track]))
+    assert rootmath.quat_continuous(np.zeros((0, 4))).shape == (0, 4)
+
+
+def test_decompose_keeps_axis_and_shrinks_angle():
+    q = random_quats(10, 9)
+    q = q * np.sign(q[:, :1])
+    part = rootmath.decompose_quaternion(q)
+    np.testing.assert_allclose(np.linalg.norm(part, axis=-1), 1.0)
+    axis = q[:, 1:] / np.linalg.norm(q[:, 1:], axis=-1, keepdims=True)
+    np.testing.assert_allclose(part[:, 1:] / np.linalg.norm(part[:, 1:], axis=-1, keepdims=True), axis, atol=1e-12)
+    assert np.all(part[:, 0] > q[:, 0])
+
+
+def test_decompose_identity_and_full_turn():
+    np.testing.assert_allclose(rootmath.decompose_quaternion(rootmath.IDENTITY), rootmath.IDENTITY)
+    # -identity is a full turn, its half has no defined axis
+    half = rootmath.decompose_quaternion(-rootmath.IDENTITY)
+    assert np.all(np.isfinite(half))
+    np.testing.assert_allclose(np.linalg.norm(half), 1.0)
+
+
+def test_split_root_rotation_recombines():
+    hips = random_quats(30, 10)
+    rest = axis_angle((1, 0, 0), np.pi / 2)
+    root, remainder = rootmath.split_root_rotation(hips, rest)
+    same_rotation(rootmath.quat_multiply(root, remainder), hips)
+
+
+def test_split_root_rotation_is_yaw_only():
+    root, _ = rootmath.split_root_rotation(random_quats(30, 11), rootmath.IDENTITY)
+    np.testing.assert_allclose(root[:, [1, 3]], 0.0, atol=1e-12)
+    same_rotation(root[0], rootmath.IDENTITY)
+
+
+def test_split_root_rotation_identity():
+    root, remainder = rootmath.split_root_rotation(np.tile(rootmath.IDENTITY, (4, 1)), rootmath.IDENTITY)
+    np.testing.assert_allclose(root, np.tile(rootmath.IDENTITY, (4, 1)))
+    np.testing.assert_allclose(remainder, np.tile(rootmath.IDENTITY, (4, 1)))
+
+
+def test_split_root_rotation_empty():
+    root, remainder = rootmath.split_root_rotation(np.zeros((0, 4)), rootmath.IDENTITY)
+    assert root.shape == (0, 4) and remainder.shape == (0, 4)
+
+
+def test_empty_arrays():
+    assert rootmath.quat_multiply(np.zeros((0, 4)), np.zeros((0, 4))).shape == (0, 4)
+    assert rootmath.matrix_to_quat(np.zeros((0, 3, 3))).shape == (0, 4)
+    assert rootmath.quat_to_euler(np.zeros((0, 4))).shape == (0, 3)
+    assert rootmath.euler_to_quat(np.zeros((0, 3))).shape == (0, 4)